@@ -1,10 +1,15 @@
 # agent.py
 
 import asyncio
+import os
+import sys
 import yaml
 from core.loop import AgentLoop
 from core.session import MultiMCP
-from core.context import MemoryItem, AgentContext
+from core.context import MemoryItem, AgentContext, PROFILE_PATH
+from core.tracing import tracer
+from core.metrics import registry
+from modules.action import shutdown_worker_pool
 import datetime
 from pathlib import Path
 import json
@@ -15,14 +20,89 @@ def log(stage: str, msg: str):
     now = datetime.datetime.now().strftime("%H:%M:%S")
     print(f"[{now}] [{stage}] {msg}")
 
+def load_mcp_servers(profile_path: str = PROFILE_PATH) -> dict:
+    """MCP server configs from the agent profile, keyed by server id."""
+    with open(profile_path, "r") as f:
+        profile = yaml.safe_load(f)
+    mcp_servers_list = profile.get("mcp_servers", [])
+    return {server["id"]: server for server in mcp_servers_list}
+
+
+async def run_query(user_input: str, multi_mcp: MultiMCP, mcp_servers: dict,
+                    session_id: str = None, model=None) -> dict:
+    """
+    Answer one user query, following FURTHER_PROCESSING_REQUIRED hand-offs.
+
+    Every call gets its own AgentContext/AgentLoop, so concurrent queries only
+    share the MCP dispatcher and the model client.
+
+    Returns:
+        {"session_id": str, "status": "final" | "raw" | "unexpected", "answer": str,
+         "timings": {stage: [ms, ...]}, "tool_trace": [tool call, ...]}
+        plus "trace": {"file", "breakdown"} when tracing is enabled
+    """
+    if not tracer.enabled:
+        return await _answer_query(user_input, multi_mcp, mcp_servers, session_id, model)
+
+    root_context = tracer.trace("session", query=user_input[:200])
+    root = root_context.span
+    try:
+        with root_context:
+            outcome = await _answer_query(user_input, multi_mcp, mcp_servers, session_id, model)
+            root.set(session_id=outcome["session_id"], status=outcome["status"])
+    finally:
+        spans = tracer.take_trace(root.trace_id)
+        trace_file = tracer.export(spans, label=str(root.attrs.get("session_id") or session_id or "session"))
+
+    outcome["trace"] = {"file": str(trace_file), "breakdown": tracer.breakdown(spans)}
+    log("trace", f"🧵 {len(spans)} spans → {trace_file}")
+    return outcome
+
+
+async def _answer_query(user_input: str, multi_mcp: MultiMCP, mcp_servers: dict,
+                        session_id: str = None, model=None) -> dict:
+    timings = {}
+    tool_trace = []
+
+    def outcome(status: str, answer: str) -> dict:
+        return {"session_id": session_id, "status": status, "answer": answer,
+                "timings": timings, "tool_trace": tool_trace}
+
+    while True:
+        context = AgentContext(
+            user_input=user_input,
+            session_id=session_id,
+            dispatcher=multi_mcp,
+            mcp_server_descriptions=mcp_servers,
+        )
+        agent = AgentLoop(context, model=model)
+        if not session_id:
+            session_id = context.session_id
+
+        result = await agent.run()
+        for stage, values in context.stage_timings.items():
+            timings.setdefault(stage, []).extend(values)
+        tool_trace.extend(context.tool_trace)
+
+        if isinstance(result, dict):
+            answer = result["result"]
+            if "FINAL_ANSWER:" in answer:
+                return outcome("final", answer.split("FINAL_ANSWER:")[1].strip())
+            elif "FURTHER_PROCESSING_REQUIRED:" in answer:
+                user_input = answer.split("FURTHER_PROCESSING_REQUIRED:")[1].strip()
+                print(f"\n🔁 Further Processing Required: {user_input}")
+                continue  # 🧠 Re-run agent with updated input
+            else:
+                return outcome("raw", answer)
+        else:
+            return outcome("unexpected", str(result))
+
+
 async def main():
     print("🧠 Cortex-R Agent Ready")
     current_session = None
 
-    with open("config/profiles.yaml", "r") as f:
-        profile = yaml.safe_load(f)
-        mcp_servers_list = profile.get("mcp_servers", [])
-        mcp_servers = {server["id"]: server for server in mcp_servers_list}
+    mcp_servers = load_mcp_servers()
 
     multi_mcp = MultiMCP(server_configs=list(mcp_servers.values()))
     await multi_mcp.initialize()
@@ -35,39 +115,27 @@ async def main():
             if user_input.lower() == 'new':
                 current_session = None
                 continue
+            if user_input.lower() == 'metrics':
+                print(registry.render())
+                continue
+
+            outcome = await run_query(user_input, multi_mcp, mcp_servers, session_id=current_session)
+            current_session = outcome["session_id"]
 
-            while True:
-                context = AgentContext(
-                    user_input=user_input,
-                    session_id=current_session,
-                    dispatcher=multi_mcp,
-                    mcp_server_descriptions=mcp_servers,
-                )
-                agent = AgentLoop(context)
-                if not current_session:
-                    current_session = context.session_id
-
-                result = await agent.run()
-
-                if isinstance(result, dict):
-                    answer = result["result"]
-                    if "FINAL_ANSWER:" in answer:
-                        print(f"\n💡 Final Answer: {answer.split('FINAL_ANSWER:')[1].strip()}")
-                        break
-                    elif "FURTHER_PROCESSING_REQUIRED:" in answer:
-                        user_input = answer.split("FURTHER_PROCESSING_REQUIRED:")[1].strip()
-                        print(f"\n🔁 Further Processing Required: {user_input}")
-                        continue  # 🧠 Re-run agent with updated input
-                    else:
-                        print(f"\n💡 Final Answer (raw): {answer}")
-                        break
-                else:
-                    print(f"\n💡 Final Answer (unexpected): {result}")
-                    break
+            if outcome["status"] == "final":
+                print(f"\n💡 Final Answer: {outcome['answer']}")
+            elif outcome["status"] == "raw":
+                print(f"\n💡 Final Answer (raw): {outcome['answer']}")
+            else:
+                print(f"\n💡 Final Answer (unexpected): {outcome['answer']}")
     except KeyboardInterrupt:
         print("\n👋 Received exit signal. Shutting down...")
+    finally:
+        await shutdown_worker_pool()
 
 if __name__ == "__main__":
+    if "--profile" in sys.argv[1:]:
+        os.environ["AGENT_PROFILER"] = "1"  # also forwarded to the MCP server processes
     asyncio.run(main())
 
 
@@ -0,0 +1,161 @@
+# batch.py
+#
+# Offline batch runner: queries from JSONL through AgentLoop with bounded
+# concurrency over one shared MultiMCP and ModelManager.
+#
+#   python batch.py queries.jsonl results.jsonl --concurrency 4
+#   python batch.py queries.jsonl results.jsonl --resume     (skip ids already answered, re-run failed ones)
+#
+# Input lines:  {"id": "q1", "query": "...", "session_id": "optional"}   (id defaults to the line number;
+#               session_id must be one an earlier run returned: YYYY/MM/DD/session-<ts>-<uid>)
+# Output lines: {"id", "query", "session_id", "status", "answer", "error",
+#                "latency_ms", "timings": {stage: [ms, ...]}, "tool_trace": [...]}
+
+import argparse
+import asyncio
+import json
+import os
+import time
+from pathlib import Path
+from typing import Any, Dict, Iterable, List
+
+from agent import log, load_mcp_servers, run_query
+from core.session import MultiMCP
+from modules.action import shutdown_worker_pool
+from modules.model_manager import ModelManager
+
+
+def load_queries(path: Path) -> List[Dict[str, Any]]:
+    queries = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line_number, line in enumerate(f, start=1):
+            line = line.strip()
+            if not line:
+                continue
+            item = json.loads(line)
+            item.setdefault("id", str(line_number))
+            item["id"] = str(item["id"])
+            queries.append(item)
+    return queries
+
+
+def load_results(path: Path) -> Dict[str, Dict[str, Any]]:
+    """Latest record per id in an existing output file (later lines supersede earlier ones)"""
+    records: Dict[str, Dict[str, Any]] = {}
+    if not path.exists():
+        return records
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue  # partially written last line of an interrupted run
+            records[str(record.get("id"))] = record
+    return records
+
+
+def rewrite_results(path: Path, records: Iterable[Dict[str, Any]]):
+    """Replace the output file atomically, so an interrupted rewrite loses nothing"""
+    staging = path.with_name(path.name + ".tmp")
+    with open(staging, "w", encoding="utf-8") as f:
+        for record in records:
+            f.write(json.dumps(record, default=str) + "\n")
+    os.replace(staging, path)
+
+
+def percentile(values: List[float], q: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))] if ordered else 0.0
+
+
+async def run_batch(input_path: Path, output_path: Path, concurrency: int = 4, resume: bool = False) -> Dict[str, Any]:
+    queries = load_queries(input_path)
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    if resume:
+        previous = load_results(output_path)
+        done = {record_id for record_id, record in previous.items() if record.get("error") is None}
+        queries = [item for item in queries if item["id"] not in done]
+        # Drop superseded lines and the failures about to be re-run, so each id appears once
+        rerun = {item["id"] for item in queries}
+        rewrite_results(output_path, [record for record_id, record in previous.items() if record_id not in rerun])
+        log("batch", f"⏭️ Resuming: {len(done)} already done, {len(queries)} left")
+
+    mcp_servers = load_mcp_servers()
+    multi_mcp = MultiMCP(server_configs=list(mcp_servers.values()))
+    await multi_mcp.initialize()
+    model = ModelManager()
+
+    slots = asyncio.Semaphore(concurrency)
+    write_lock = asyncio.Lock()
+    session_locks: Dict[str, asyncio.Lock] = {}
+    latencies: List[float] = []
+    failures = 0
+
+    out = open(output_path, "a" if resume else "w", encoding="utf-8")
+
+    async def process(item: Dict[str, Any]):
+        session_id = item.get("session_id")
+        if session_id is None:
+            return await answer(item)
+        # Lines sharing a session_id would race on its memory file: run them one at a
+        # time, in file order (the lock is FIFO), without holding a slot while waiting
+        async with session_locks.setdefault(session_id, asyncio.Lock()):
+            await answer(item)
+
+    async def answer(item: Dict[str, Any]):
+        nonlocal failures
+        async with slots:
+            start = time.perf_counter()
+            record = {"id": item["id"], "query": item["query"], "error": None}
+            try:
+                outcome = await run_query(item["query"], multi_mcp, mcp_servers,
+                                          session_id=item.get("session_id"), model=model)
+                record.update(outcome)
+            except Exception as e:
+                failures += 1
+                record["error"] = str(e)
+                log("batch", f"⚠️ Query {item['id']} failed: {e}")
+            record["latency_ms"] = round((time.perf_counter() - start) * 1000, 1)
+            latencies.append(record["latency_ms"])
+
+        async with write_lock:
+            out.write(json.dumps(record, default=str) + "\n")
+            out.flush()
+
+    batch_start = time.perf_counter()
+    try:
+        await asyncio.gather(*(process(item) for item in queries))
+    finally:
+        out.close()
+        await shutdown_worker_pool()
+
+    elapsed = time.perf_counter() - batch_start
+    summary = {
+        "queries": len(queries),
+        "failed": failures,
+        "concurrency": concurrency,
+        "elapsed_s": round(elapsed, 2),
+        "throughput_qps": round(len(queries) / elapsed, 3) if elapsed and queries else 0.0,
+        "latency_ms": {
+            "p50": percentile(latencies, 0.50),
+            "p95": percentile(latencies, 0.95),
+            "p99": percentile(latencies, 0.99),
+        },
+    }
+    log("batch", f"📊 Batch summary: {summary}")
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a JSONL file of queries through the agent")
+    parser.add_argument("input", type=Path, help="JSONL with one {\"id\", \"query\"} object per line")
+    parser.add_argument("output", type=Path, help="JSONL results file")
+    parser.add_argument("--concurrency", type=int, default=4, help="queries running at once")
+    parser.add_argument("--resume", action="store_true", help="skip ids already answered in the output file")
+    args = parser.parse_args()
+
+    asyncio.run(run_batch(args.input, args.output, concurrency=args.concurrency, resume=args.resume))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+# benchmarks/check_heuristics.py
+#
+# End-to-end smoke check of the heuristic pipelines (no network, no LLM):
+# every query in benchmarks/queries.jsonl goes through
+# HeuristicManager.process_query as a full pipeline and as the "rewrite" and
+# "analysis" stages. Each query runs twice, so deduplication and the result
+# caches are exercised. Then the stats are read back. This runs once with
+# config/heuristics_config.yaml as is and once with `cache: true` forced on
+# every heuristic.
+#
+#   python benchmarks/check_heuristics.py          (exit 1 on the first exception)
+#
+# Perception runs the analysis stage under gather(return_exceptions=True), so a
+# crashing heuristic only shows up there as a log line; this makes it fatal.
+
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import traceback
+from pathlib import Path
+from typing import Any, Dict, List
+
+import yaml
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+# The heuristics log through `agent`, whose import builds the configured LLM client;
+# the replay profile needs no API key
+os.environ.setdefault("AGENT_PROFILE_PATH", str(Path(__file__).resolve().parent / "profile.yaml"))
+
+from modules.heuristics.manager import HeuristicManager
+
+CONFIG_PATH = ROOT / "config" / "heuristics_config.yaml"
+QUERIES_PATH = Path(__file__).resolve().parent / "queries.jsonl"
+
+
+def load_queries() -> List[str]:
+    with open(QUERIES_PATH, "r", encoding="utf-8") as f:
+        return [json.loads(line)["query"] for line in f if line.strip()]
+
+
+def with_caching(config: Dict[str, Any]) -> Dict[str, Any]:
+    """Copy of the config with `cache: true` on every heuristic section"""
+    config = json.loads(json.dumps(config))
+    for group in ("query_heuristics", "tool_heuristics", "result_heuristics"):
+        for section in (config.get(group) or {}).values():
+            if isinstance(section, dict):
+                section["cache"] = True
+    return config
+
+
+async def exercise(manager: HeuristicManager, queries: List[str]):
+    for _ in range(2):
+        for query in queries:
+            processed, metadata = await manager.process_query(query, {})
+            assert isinstance(processed, str) and metadata["heuristics_run"] > 0, metadata
+            rewritten, _ = await manager.process_query(query, {}, stage="rewrite")
+            await manager.process_query(rewritten, {}, stage="analysis")
+            await manager.process_result(f"FINAL_ANSWER: [{query}]", {"query": query})
+    manager.get_stats()
+
+
+def main() -> int:
+    queries = load_queries()
+    base_config = yaml.safe_load(CONFIG_PATH.read_text(encoding="utf-8"))
+
+    with tempfile.TemporaryDirectory() as tmp:
+        cached_path = Path(tmp) / "heuristics_cached.yaml"
+        cached_path.write_text(yaml.safe_dump(with_caching(base_config)), encoding="utf-8")
+
+        for label, path in (("repo config", CONFIG_PATH), ("caching forced on", cached_path)):
+            try:
+                asyncio.run(exercise(HeuristicManager(str(path)), queries))
+            except Exception:
+                print(f"❌ Heuristic pipelines failed ({label}):")
+                traceback.print_exc()
+                return 1
+            print(f"✅ Heuristic pipelines OK ({label}, {len(queries)} queries)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
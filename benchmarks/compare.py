@@ -0,0 +1,95 @@
+# benchmarks/compare.py
+#
+# Diff two benchmark results (benchmarks/run_benchmark.py) and flag regressions.
+#
+#   python benchmarks/compare.py benchmarks/results/<base>.json benchmarks/results/<head>.json
+#   python benchmarks/compare.py 1a2b3c 4d5e6f          (commit prefixes, looked up in benchmarks/results/)
+#
+# A stage regresses when a percentile grows by more than --threshold (relative)
+# AND --min-delta-ms (absolute), so sub-millisecond noise is not reported.
+# More failed runs (no answer, left out of the percentiles) also count.
+# Exit code 1 when anything regressed.
+
+import argparse
+import json
+import sys
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+RESULTS_DIR = Path(__file__).resolve().parent / "results"
+
+
+def resolve(ref: str) -> Path:
+    """A results file path, or a commit prefix matching one in benchmarks/results/"""
+    path = Path(ref)
+    if path.exists():
+        return path
+    matches = sorted(RESULTS_DIR.glob(f"{ref}*.json"))
+    if len(matches) != 1:
+        raise SystemExit(f"{ref}: {'no' if not matches else 'ambiguous'} results file in {RESULTS_DIR}")
+    return matches[0]
+
+
+def load(ref: str) -> Dict[str, Any]:
+    return json.loads(resolve(ref).read_text(encoding="utf-8"))
+
+
+def compare(base: Dict[str, Any], head: Dict[str, Any], metrics: List[str],
+            threshold: float, min_delta_ms: float) -> List[Dict[str, Any]]:
+    """One row per (stage, metric) present in both runs"""
+    base_stages = {**base.get("stages", {}), "end_to_end": base.get("end_to_end", {})}
+    head_stages = {**head.get("stages", {}), "end_to_end": head.get("end_to_end", {})}
+
+    rows = []
+    for stage, head_stats in head_stages.items():
+        base_stats = base_stages.get(stage)
+        if not base_stats:
+            continue
+        for metric in metrics:
+            before, after = base_stats.get(metric), head_stats.get(metric)
+            if before is None or after is None:
+                continue
+            delta = after - before
+            change = delta / before if before else 0.0
+            rows.append({
+                "stage": stage,
+                "metric": metric,
+                "base": before,
+                "head": after,
+                "delta_ms": round(delta, 2),
+                "change": round(change, 4),
+                "regression": delta > min_delta_ms and change > threshold,
+            })
+    return rows
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Compare two benchmark result files")
+    parser.add_argument("base", help="results file or commit prefix")
+    parser.add_argument("head", help="results file or commit prefix")
+    parser.add_argument("--metrics", default="p50,p95,p99", help="comma-separated percentiles to compare")
+    parser.add_argument("--threshold", type=float, default=0.10, help="relative slowdown that counts as a regression")
+    parser.add_argument("--min-delta-ms", type=float, default=2.0, help="ignore slowdowns smaller than this")
+    args = parser.parse_args(argv)
+
+    base, head = load(args.base), load(args.head)
+    rows = compare(base, head, args.metrics.split(","), args.threshold, args.min_delta_ms)
+
+    print(f"base {base.get('commit', '?')[:12]}  →  head {head.get('commit', '?')[:12]}\n")
+    print(f"{'stage':<14}{'metric':>7}{'base':>10}{'head':>10}{'delta':>10}{'change':>9}")
+    for row in rows:
+        flag = "  ⚠️ regression" if row["regression"] else ""
+        print(f"{row['stage']:<14}{row['metric']:>7}{row['base']:>10.1f}{row['head']:>10.1f}"
+              f"{row['delta_ms']:>+10.1f}{row['change']:>+9.1%}{flag}")
+
+    regressions = [row for row in rows if row["regression"]]
+    base_failures, head_failures = base.get("failures", 0), head.get("failures", 0)
+    if head_failures > base_failures:
+        print(f"\n⚠️ failed runs: {base_failures} → {head_failures} (not in the percentiles above)")
+    failed = len(regressions) + (head_failures > base_failures)
+    print(f"\n{failed} regression(s)" if failed else "\nNo regressions")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
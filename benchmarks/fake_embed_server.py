@@ -0,0 +1,89 @@
+# benchmarks/fake_embed_server.py
+#
+# Deterministic stand-in for Ollama's /api/embeddings.
+#
+#   python benchmarks/fake_embed_server.py --port 11435
+#
+# A text's vector is a hashed bag of words, so equal texts get equal vectors
+# and texts sharing words get similar ones (routing and history search still
+# behave sensibly without a real embedding model).
+
+import argparse
+import hashlib
+import json
+import math
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import List, Optional
+
+DIMENSIONS = 768
+_WORD = re.compile(r"[a-z0-9]+")
+
+
+def embed(text: str, dimensions: int = DIMENSIONS) -> List[float]:
+    vector = [0.0] * dimensions
+    for word in _WORD.findall(text.lower()):
+        digest = hashlib.md5(word.encode("utf-8")).digest()
+        index = int.from_bytes(digest[:4], "little") % dimensions
+        vector[index] += 1.0 if digest[4] & 1 else -1.0
+    norm = math.sqrt(sum(value * value for value in vector))
+    return [value / norm for value in vector] if norm else vector
+
+
+class EmbedHandler(BaseHTTPRequestHandler):
+    latency_ms = 0.0
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        try:
+            payload = json.loads(self.rfile.read(length) or b"{}")
+        except ValueError:
+            self.send_error(400, "Body must be JSON")
+            return
+        if self.latency_ms:
+            time.sleep(self.latency_ms / 1000)
+
+        body = json.dumps({"embedding": embed(str(payload.get("prompt", "")))}).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass  # keep benchmark output readable
+
+
+def start_server(host: str = "127.0.0.1", port: int = 0, latency_ms: float = 0.0) -> ThreadingHTTPServer:
+    """Serve in a daemon thread; port 0 picks a free port (see server.server_address)"""
+    handler = type("Handler", (EmbedHandler,), {"latency_ms": latency_ms})
+    server = ThreadingHTTPServer((host, port), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def embed_url(server: ThreadingHTTPServer) -> str:
+    host, port = server.server_address[:2]
+    return f"http://{host}:{port}/api/embeddings"
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Deterministic fake embedding server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=11435)
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="delay added to every request")
+    args = parser.parse_args(argv)
+
+    handler = type("Handler", (EmbedHandler,), {"latency_ms": args.latency_ms})
+    server = ThreadingHTTPServer((args.host, args.port), handler)
+    print(f"Fake embeddings at http://{args.host}:{args.port}/api/embeddings")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
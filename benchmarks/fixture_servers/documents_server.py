@@ -0,0 +1,42 @@
+# benchmarks/fixture_servers/documents_server.py
+#
+# Fixture-backed stand-in for mcp_server_2.py (documents): same tool names,
+# inputs and outputs, answers from benchmarks/fixtures/tool_results.json.
+
+import sys
+
+from fixtures import lookup
+from mcp.server.fastmcp import FastMCP
+
+from models import SearchDocumentsInput, UrlInput, FilePathInput, MarkdownOutput
+from core.metrics import instrument_tool
+
+mcp = FastMCP("Calculator")
+
+
+@mcp.tool()
+@instrument_tool("documents")
+def search_stored_documents(input: SearchDocumentsInput) -> list[str]:
+    """Search documents to get relevant extracts. Usage: input={"input": {"query": "your query"}} result = await mcp.call_tool('search_stored_documents', input)"""
+    return lookup("search_stored_documents", input.query)
+
+
+@mcp.tool()
+@instrument_tool("documents")
+def convert_webpage_url_into_markdown(input: UrlInput) -> MarkdownOutput:
+    """Return clean webpage content without Ads, and clutter. Usage: input={{"input": {{"url": "https://example.com"}}}} result = await mcp.call_tool('convert_webpage_url_into_markdown', input)"""
+    return MarkdownOutput(markdown=lookup("convert_webpage_url_into_markdown", input.url))
+
+
+@mcp.tool()
+@instrument_tool("documents")
+def extract_pdf(input: FilePathInput) -> MarkdownOutput:
+    """Convert PDF to markdown. Usage: input={"input": {"file_path": "documents/sample.pdf"} } result = await mcp.call_tool('extract_pdf', input)"""
+    return MarkdownOutput(markdown=lookup("extract_pdf", input.file_path))
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == "dev":
+        mcp.run()
+    else:
+        mcp.run(transport="stdio")
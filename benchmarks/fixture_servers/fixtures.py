@@ -0,0 +1,35 @@
+# benchmarks/fixture_servers/fixtures.py
+#
+# Canned tool results for the fixture MCP servers (benchmarks/fixtures/tool_results.json):
+#
+#   {"latency_ms": 5,
+#    "tools": {"tool_name": {"default": ..., "responses": [{"match": "substring", "result": ...}]}}}
+#
+# The first response whose substring occurs in the tool's argument text wins.
+
+import json
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent.parent
+FIXTURE_PATH = ROOT / "benchmarks" / "fixtures" / "tool_results.json"
+
+# Fixture servers run as scripts from this directory; `models` lives at the repo root
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+_fixture = json.loads(FIXTURE_PATH.read_text(encoding="utf-8"))
+
+
+def lookup(tool_name: str, argument: str):
+    """Canned result for a tool call, after the fixture's simulated latency"""
+    latency_ms = _fixture.get("latency_ms", 0)
+    if latency_ms:
+        time.sleep(latency_ms / 1000)
+
+    entry = _fixture.get("tools", {}).get(tool_name, {})
+    for response in entry.get("responses", []):
+        if response["match"].lower() in argument.lower():
+            return response["result"]
+    return entry.get("default", "")
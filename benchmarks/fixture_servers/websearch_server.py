@@ -0,0 +1,36 @@
+# benchmarks/fixture_servers/websearch_server.py
+#
+# Fixture-backed stand-in for mcp_server_3.py (websearch): same tool names and
+# inputs, answers from benchmarks/fixtures/tool_results.json. Results are plain
+# str, as the tools declare (mcp rejects a model returned from a `-> str` tool).
+
+import sys
+
+from fixtures import lookup
+from mcp.server.fastmcp import FastMCP, Context
+
+from models import SearchInput, UrlInput
+from core.metrics import instrument_tool
+
+mcp = FastMCP("ddg-search")
+
+
+@mcp.tool()
+@instrument_tool("websearch")
+async def duckduckgo_search_results(input: SearchInput, ctx: Context) -> str:
+    """Search DuckDuckGo. Usage: input={"input": {"query": "latest AI developments", "max_results": 5} } result = await mcp.call_tool('duckduckgo_search_results', input)"""
+    return lookup("duckduckgo_search_results", input.query)
+
+
+@mcp.tool()
+@instrument_tool("websearch")
+async def download_raw_html_from_url(input: UrlInput, ctx: Context) -> str:
+    """Fetch webpage content. Usage: input={"input": {"url": "https://example.com"} } result = await mcp.call_tool('download_raw_html_from_url', input)"""
+    return lookup("download_raw_html_from_url", input.url)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == "dev":
+        mcp.run()
+    else:
+        mcp.run(transport="stdio")
@@ -0,0 +1,159 @@
+# benchmarks/import_time.py
+#
+# Import-time profile and cold-start check for each entry point.
+#
+#   python benchmarks/import_time.py                      (profile every entry point in import_budgets.yaml)
+#   python benchmarks/import_time.py mcp_server_2 --top 20
+#   python benchmarks/import_time.py --check              (exit 1 when a budget is exceeded)
+#
+# For every module: the median wall time of `python -c "import <module>"` over
+# --repeat fresh interpreters, the `-X importtime` self time grouped by top-level
+# package (where the import time goes), and the `lazy` modules from the budget
+# file that were loaded anyway, each with the import chain that pulled it in
+# (e.g. mcp_server_1 → core.profiling → agent → modules.memory → faiss).
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from collections import Counter
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+import yaml
+
+ROOT = Path(__file__).resolve().parent.parent
+BUDGETS_PATH = Path(__file__).resolve().parent / "import_budgets.yaml"
+
+
+def run_python(*args: str, env: Optional[Dict[str, str]] = None) -> subprocess.CompletedProcess:
+    return subprocess.run([sys.executable, *args], cwd=ROOT, capture_output=True, text=True,
+                          env={**os.environ, **(env or {})})
+
+
+def cold_start_ms(module: str, repeat: int, env: Optional[Dict[str, str]] = None) -> float:
+    """Median wall time of a fresh interpreter importing the module (one unmeasured warmup for the OS cache)"""
+    run_python("-c", f"import {module}", env=env)
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = run_python("-c", f"import {module}", env=env)
+        samples.append((time.perf_counter() - start) * 1000)
+        if result.returncode != 0:
+            raise RuntimeError(f"import {module} failed:\n{result.stderr.strip()[-2000:]}")
+    return statistics.median(samples)
+
+
+def import_chains(lines: List[Tuple[int, str]]) -> Dict[str, List[str]]:
+    """
+    Importer chain of every module, from (depth, name) in -X importtime order.
+    A module's line comes right after its own imports, so its importer is the
+    next line one level shallower.
+    """
+    chains: Dict[str, List[str]] = {}
+    for position, (depth, name) in enumerate(lines):
+        if name in chains:
+            continue
+        chain, wanted = [name], depth - 1
+        for later_depth, later_name in lines[position + 1:]:
+            if wanted < 0:
+                break
+            if later_depth == wanted:
+                chain.append(later_name)
+                wanted -= 1
+        chains[name] = list(reversed(chain))
+    return chains
+
+
+def import_profile(module: str, env: Optional[Dict[str, str]] = None) -> Dict[str, Any]:
+    """`-X importtime` self microseconds per top-level package, the loaded module names and their import chains"""
+    script = f"import sys, json, {module}; print(json.dumps(sorted(sys.modules)))"
+    result = run_python("-X", "importtime", "-c", script, env=env)
+    if result.returncode != 0:
+        raise RuntimeError(f"import {module} failed:\n{result.stderr.strip()[-2000:]}")
+
+    by_package: Counter = Counter()
+    lines: List[Tuple[int, str]] = []
+    for line in result.stderr.splitlines():
+        # "import time: self [us] | cumulative | imported package", nesting shown by indentation
+        if not line.startswith("import time:") or "imported package" in line:
+            continue
+        self_us, _, name = line[len("import time:"):].split("|", 2)
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        lines.append((depth, name.strip()))
+        by_package[name.strip().split(".")[0]] += int(self_us)
+
+    loaded = json.loads(result.stdout.strip().splitlines()[-1])
+    return {"total_ms": sum(by_package.values()) / 1000, "by_package": by_package, "modules": set(loaded),
+            "chains": import_chains(lines)}
+
+
+def profile(module: str, budget: Dict[str, Any], repeat: int, top: int, budget_scale: float) -> Dict[str, Any]:
+    env = {key: str(value) for key, value in (budget.get("env") or {}).items()}
+    try:
+        wall_ms = cold_start_ms(module, repeat, env)
+        details = import_profile(module, env)
+    except RuntimeError as e:
+        return {"module": module, "error": str(e)}
+    lazy = budget.get("lazy", [])
+    eager = [name for name in lazy if name in details["modules"]]
+    chains = {name: details["chains"].get(name, [name]) for name in eager}
+    max_ms = budget.get("max_ms")
+    limit = max_ms * budget_scale if max_ms else None
+    return {
+        "module": module,
+        "wall_ms": round(wall_ms, 1),
+        "import_ms": round(details["total_ms"], 1),
+        "budget_ms": limit,
+        "over_budget": limit is not None and wall_ms > limit,
+        "eager": eager,
+        "chains": chains,
+        "top": [(name, round(us / 1000, 1)) for name, us in details["by_package"].most_common(top)],
+    }
+
+
+def print_report(row: Dict[str, Any]):
+    if "error" in row:
+        print(f"\n{row['module']}: ❌ {row['error']}")
+        return
+    budget = f" / budget {row['budget_ms']:.0f} ms" if row["budget_ms"] else ""
+    flag = "  ⚠️ over budget" if row["over_budget"] else ""
+    print(f"\n{row['module']}: cold start {row['wall_ms']:.0f} ms{budget}{flag}  (imports {row['import_ms']:.0f} ms)")
+    for name, ms in row["top"]:
+        print(f"  {ms:>8.1f} ms  {name}")
+    for name in row["eager"]:
+        print(f"  ⚠️ {name} loaded at import but should be lazy: {' → '.join(row['chains'][name])}")
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Import-time profile and cold-start budget check")
+    parser.add_argument("modules", nargs="*", help="entry point modules (default: all in import_budgets.yaml)")
+    parser.add_argument("--budgets", type=Path, default=BUDGETS_PATH)
+    parser.add_argument("--repeat", type=int, default=5, help="fresh interpreters per module for the wall time")
+    parser.add_argument("--top", type=int, default=10, help="packages listed per module")
+    parser.add_argument("--budget-scale", type=float, default=1.0, help="multiply every max_ms (slow machines)")
+    parser.add_argument("--check", action="store_true", help="exit 1 when a module is over budget or imports a lazy module")
+    parser.add_argument("--json", action="store_true", help="print the results as JSON instead")
+    args = parser.parse_args(argv)
+
+    budgets = yaml.safe_load(args.budgets.read_text(encoding="utf-8")) or {}
+    modules = args.modules or list(budgets)
+
+    rows = [profile(module, budgets.get(module, {}), args.repeat, args.top, args.budget_scale) for module in modules]
+    if args.json:
+        print(json.dumps(rows, indent=2))
+    else:
+        for row in rows:
+            print_report(row)
+
+    failed = [row["module"] for row in rows if "error" in row or row["over_budget"] or row["eager"]]
+    if not args.json:
+        print(f"\n{len(failed)} entry point(s) failed: {', '.join(failed)}" if failed else "\nAll entry points within budget")
+    return 1 if args.check and failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,224 @@
+# benchmarks/run_benchmark.py
+#
+# Offline end-to-end benchmark: every query in benchmarks/queries.jsonl goes
+# through run_query → AgentLoop.run with no network dependencies:
+#
+#   LLM         replay model (config/models.json "replay", benchmarks/fixtures/llm_replay.json)
+#   embeddings  benchmarks/fake_embed_server.py, started in-process
+#   MCP         mcp_server_1.py (math, already offline) plus fixture-backed
+#               documents/websearch servers (benchmarks/fixture_servers/)
+#
+#   python benchmarks/run_benchmark.py                       (→ benchmarks/results/<commit>.json)
+#   python benchmarks/run_benchmark.py --iterations 20 --warmup 2
+#   python benchmarks/compare.py <base>.json <head>.json     (diff two runs)
+#
+# Reports p50/p95/p99 per stage (perception, planning, sandbox, heuristics,
+# memory_write) and end to end. Memory and indexes are written to a scratch
+# directory, so runs neither read nor pollute the repository's memory/.
+# Runs that end without an answer (errors, non-final status, the loop's
+# placeholder answers) count as failures and are left out of the percentiles.
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+ROOT = Path(__file__).resolve().parent.parent
+BENCH_DIR = ROOT / "benchmarks"
+RESULTS_DIR = BENCH_DIR / "results"
+STAGES = ["perception", "planning", "sandbox", "heuristics", "memory_write"]
+
+# Placeholder FINAL_ANSWERs from core/loop.py and modules/decision.py: the loop gave up
+NON_ANSWERS = {"[Max steps reached]", "[Execution failed]", "[unknown]", "[Could not generate valid solve()]"}
+
+sys.path.insert(0, str(ROOT))
+sys.path.insert(0, str(BENCH_DIR))
+
+from fake_embed_server import start_server, embed_url
+
+
+def git_revision() -> Dict[str, Any]:
+    def git(*args) -> str:
+        return subprocess.run(["git", *args], cwd=ROOT, capture_output=True, text=True).stdout.strip()
+    try:
+        return {"commit": git("rev-parse", "HEAD"), "dirty": bool(git("status", "--porcelain", "--untracked-files=no"))}
+    except OSError:
+        return {"commit": "unknown", "dirty": False}
+
+
+def summarize(values: List[float]) -> Dict[str, Any]:
+    from batch import percentile
+    if not values:
+        return {"count": 0, "p50": None, "p95": None, "p99": None, "mean": None}
+    return {
+        "count": len(values),
+        "p50": round(percentile(values, 0.50), 2),
+        "p95": round(percentile(values, 0.95), 2),
+        "p99": round(percentile(values, 0.99), 2),
+        "mean": round(sum(values) / len(values), 2),
+    }
+
+
+def prepare_workdir(profile_path: Path) -> Path:
+    """
+    Scratch cwd with config/ and prompts/ copied in, plus the profile with its
+    server cwds pointed at the repo (config/benchmark_profile.yaml)
+    """
+    import yaml
+
+    workdir = Path(tempfile.mkdtemp(prefix="agent-bench-"))
+    shutil.copytree(ROOT / "config", workdir / "config")
+    shutil.copytree(ROOT / "prompts", workdir / "prompts")
+
+    profile = yaml.safe_load(profile_path.read_text(encoding="utf-8"))
+    for server in profile.get("mcp_servers", []):
+        server["cwd"] = str(ROOT)
+    rendered = workdir / "config" / "benchmark_profile.yaml"
+    rendered.write_text(yaml.safe_dump(profile, sort_keys=False), encoding="utf-8")
+    return workdir
+
+
+async def run_suite(queries: List[Dict[str, Any]], iterations: int, warmup: int) -> Dict[str, Any]:
+    # Imported here: the modules read AGENT_PROFILE_PATH / AGENT_EMBED_URL at import time
+    from agent import log, load_mcp_servers, run_query
+    from core.session import MultiMCP
+    from modules.action import shutdown_worker_pool
+    from modules.model_manager import ModelManager
+
+    mcp_servers = load_mcp_servers()
+    multi_mcp = MultiMCP(server_configs=list(mcp_servers.values()))
+    await multi_mcp.initialize()
+    model = ModelManager()
+
+    stage_samples: Dict[str, List[float]] = {stage: [] for stage in STAGES}
+    end_to_end: List[float] = []
+    per_query: Dict[str, Dict[str, Any]] = {
+        item["id"]: {"query": item["query"], "latency_ms": [], "status": None, "answer": None, "errors": 0, "failures": 0}
+        for item in queries
+    }
+    failures = 0
+
+    try:
+        for iteration in range(warmup + iterations):
+            measured = iteration >= warmup
+            for item in queries:
+                record = per_query[item["id"]]
+                start = time.perf_counter()
+                try:
+                    outcome = await run_query(item["query"], multi_mcp, mcp_servers, model=model)
+                except Exception as e:
+                    record["errors"] += 1
+                    failures += measured
+                    log("bench", f"⚠️ {item['id']} failed: {e}")
+                    continue
+                elapsed_ms = (time.perf_counter() - start) * 1000
+
+                record["status"], record["answer"] = outcome["status"], outcome["answer"]  # last run's
+                if not measured:
+                    continue
+                if outcome["status"] != "final" or outcome["answer"].strip() in NON_ANSWERS:
+                    record["failures"] += 1  # a fast non-answer must not improve the percentiles
+                    failures += 1
+                    continue
+                end_to_end.append(elapsed_ms)
+                record["latency_ms"].append(elapsed_ms)
+                for stage, values in outcome["timings"].items():
+                    stage_samples.setdefault(stage, []).extend(values)
+            log("bench", f"⏱️ Iteration {iteration + 1}/{warmup + iterations}{'' if measured else ' (warmup)'} done")
+    finally:
+        await shutdown_worker_pool()
+
+    return {
+        "stages": {stage: summarize(values) for stage, values in stage_samples.items()},
+        "end_to_end": summarize(end_to_end),
+        "failures": failures,
+        "queries": {
+            query_id: {
+                "query": record["query"],
+                "status": record["status"],
+                "answer": record["answer"],
+                "errors": record["errors"],
+                "failures": record["failures"],
+                "latency_ms": summarize(record["latency_ms"]),
+            }
+            for query_id, record in per_query.items()
+        },
+    }
+
+
+def print_report(results: Dict[str, Any]):
+    print(f"\n{'stage':<14}{'count':>7}{'p50':>10}{'p95':>10}{'p99':>10}   (ms)")
+    rows = list(results["stages"].items()) + [("end_to_end", results["end_to_end"])]
+    for name, stats in rows:
+        cells = [f"{stats[key]:>10.1f}" if stats[key] is not None else f"{'-':>10}" for key in ("p50", "p95", "p99")]
+        print(f"{name:<14}{stats['count']:>7}{''.join(cells)}")
+    for query_id, record in results["queries"].items():
+        if record["failures"] or record["errors"]:
+            print(f"⚠️ {query_id}: status={record['status']} answer={record['answer']!r} "
+                  f"failures={record['failures']} errors={record['errors']}")
+    if results["failures"]:
+        print(f"⚠️ {results['failures']} measured run(s) failed and are not in the percentiles")
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Offline end-to-end agent benchmark")
+    parser.add_argument("--queries", type=Path, default=BENCH_DIR / "queries.jsonl")
+    parser.add_argument("--profile", type=Path, default=BENCH_DIR / "profile.yaml")
+    parser.add_argument("--iterations", type=int, default=10, help="measured passes over the query file")
+    parser.add_argument("--warmup", type=int, default=1, help="unmeasured passes first")
+    parser.add_argument("--embed-latency-ms", type=float, default=0.0, help="delay added by the fake embedder")
+    parser.add_argument("--output", type=Path, help="results file (default: benchmarks/results/<commit>.json)")
+    args = parser.parse_args(argv)
+
+    queries_path = args.queries.resolve()
+    output = args.output.resolve() if args.output else None  # before the chdir below
+    revision = git_revision()
+
+    embedder = start_server(latency_ms=args.embed_latency_ms)
+    workdir = prepare_workdir(args.profile.resolve())
+    os.environ["AGENT_EMBED_URL"] = embed_url(embedder)
+    os.environ["AGENT_PROFILE_PATH"] = str(workdir / "config" / "benchmark_profile.yaml")
+    os.environ["AGENT_METRICS_SPOOL"] = str(workdir / "metrics" / "mcp_events.jsonl")  # not the repo's metrics/
+    os.chdir(workdir)
+
+    from batch import load_queries  # only after the environment is set (see run_suite)
+    queries = load_queries(queries_path)
+
+    try:
+        started = time.time()
+        results = asyncio.run(run_suite(queries, args.iterations, args.warmup))
+    finally:
+        embedder.shutdown()
+        os.chdir(ROOT)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    report = {
+        **revision,
+        "timestamp": started,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "iterations": args.iterations,
+        "warmup": args.warmup,
+        "embed_latency_ms": args.embed_latency_ms,
+        **results,
+    }
+    print_report(report)
+
+    if output is None:
+        name = revision["commit"][:12] + ("-dirty" if revision["dirty"] else "")
+        output = RESULTS_DIR / f"{name}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(report, indent=2), encoding="utf-8")
+    print(f"\n📁 Results written to {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -4,6 +4,8 @@ from typing import List, Optional, Dict, Any
 from modules.memory import MemoryManager, MemoryItem
 from core.session import MultiMCP  # For dispatcher typing
 from pathlib import Path
+import os
+import re
 import yaml
 import time
 import uuid
@@ -18,17 +20,42 @@ except ImportError:
     HEURISTICS_AVAILABLE = False
     HeuristicManager = None
 
+# AGENT_PROFILE_PATH selects another profile (e.g. benchmarks/profile.yaml)
+PROFILE_PATH = os.getenv("AGENT_PROFILE_PATH", "config/profiles.yaml")
+
+# Format of generated session ids (YYYY/MM/DD/session-<ts>-<uid>); MemoryManager builds
+# file paths from them, so ids from clients (server, batch input) must match it exactly
+SESSION_ID_PATTERN = re.compile(r"\d{4}/\d{2}/\d{2}/session-\d+-[0-9a-f]{6}")
+
+
+def is_valid_session_id(session_id: Any) -> bool:
+    return isinstance(session_id, str) and SESSION_ID_PATTERN.fullmatch(session_id) is not None
+
 class StrategyProfile(BaseModel):
     planning_mode: str
     exploration_mode: Optional[str] = None
     memory_fallback_enabled: bool
     max_steps: int
     max_lifelines_per_step: int
+    speculative_plans: int = 3                                # candidates in exploratory/parallel mode
+    speculative_temperatures: List[float] = [0.2, 0.7, 1.0]
+    speculative_models: List[str] = []                        # models.json keys; empty = default model
+
+
+class SandboxProfile(BaseModel):
+    plan_timeout_seconds: float = 120
+    tool_call_timeout_seconds: float = 60
+    max_concurrent_tool_calls: int = 3
+    isolation: str = "inprocess"  # [inprocess, process, pool]
+    cpu_seconds: Optional[float] = 30
+    memory_mb: Optional[int] = 512
+    pool_size: int = 2
+    max_plans_per_worker: int = 50
 
 
 class AgentProfile:
     def __init__(self):
-        with open("config/profiles.yaml", "r") as f:
+        with open(PROFILE_PATH, "r") as f:
             config = yaml.safe_load(f)
 
         self.name = config["agent"]["name"]
@@ -39,6 +66,10 @@ class AgentProfile:
         self.memory_config = config["memory"]
         self.llm_config = config["llm"]
         self.persona = config["persona"]
+        self.sandbox = SandboxProfile(**(config.get("sandbox") or {}))
+        self.routing_config = config.get("routing") or {}
+        self.tool_selection_config = config.get("tool_selection") or {}
+        self.prompt_budget_config = config.get("prompt_budget") or {}
 
 
     def __repr__(self):
@@ -60,6 +91,8 @@ class AgentContext:
             ts = int(time.time())
             uid = uuid.uuid4().hex[:6]
             session_id = f"{today.year}/{today.month:02}/{today.day:02}/session-{ts}-{uid}"
+        elif not is_valid_session_id(session_id):
+            raise ValueError(f"Invalid session_id {session_id!r}: expected YYYY/MM/DD/session-<ts>-<uid>")
 
         self.user_input = user_input
         self.agent_profile = AgentProfile()
@@ -70,6 +103,9 @@ class AgentContext:
         self.step = 0
         self.task_progress = []  # 🆕 Will track tool executions
         self.final_answer = None
+        self.perception_timings = {}  # Per-stage perception latency (ms) of the last run
+        self.stage_timings: Dict[str, List[float]] = {}  # stage → latencies (ms) across steps/lifelines
+        self.tool_trace: List[Dict[str, Any]] = []  # every MCP call made by solve() plans
 
         # Initialize heuristics manager (optional)
         self.heuristics = None
@@ -93,6 +129,10 @@ class AgentContext:
             }
         ))
 
+    def record_timing(self, stage: str, start: float):
+        """Record elapsed ms since `start` (time.perf_counter()) for a stage"""
+        self.stage_timings.setdefault(stage, []).append(round((time.perf_counter() - start) * 1000, 1))
+
     def add_memory(self, item: MemoryItem):
         """Add item to memory"""
         self.memory.add(item)
@@ -0,0 +1,94 @@
+# core/extract_cache.py
+
+import hashlib
+import os
+from pathlib import Path
+from typing import Dict, Optional
+
+from core.metrics import publish
+
+
+ROOT = Path(__file__).resolve().parent.parent
+
+# Bump when extraction output changes (new extractor options, captioning prompt, link rewriting)
+EXTRACTOR_VERSION = "2"
+
+
+class ExtractionCache:
+    """
+    Content-addressed store of extracted markdown.
+
+    Keys hash the source bytes (a whole file, one PDF page's content streams and
+    images, or fetched HTML) together with the extractor kind and version, so a
+    hit is valid by construction: no invalidation, and renamed or copied files
+    hit too. Entries are plain .md files under <root>/<key[:2]>/; reads refresh
+    the mtime and prune() evicts the least recently used past a size limit.
+    Shared by mcp_server_2 (tools) and indexer.py.
+    """
+
+    def __init__(self, root: Path, version: str = EXTRACTOR_VERSION):
+        self.root = root
+        self.version = version
+        self.stats = {"hits": 0, "misses": 0, "writes": 0}
+
+    def key(self, kind: str, *parts: bytes) -> str:
+        digest = hashlib.sha256(f"{kind}:{self.version}".encode())
+        for part in parts:
+            digest.update(len(part).to_bytes(8, "little"))  # unambiguous concatenation
+            digest.update(part)
+        return digest.hexdigest()
+
+    def _path(self, key: str) -> Path:
+        return self.root / key[:2] / f"{key}.md"
+
+    def get(self, key: str, kind: str = "file") -> Optional[str]:
+        path = self._path(key)
+        try:
+            markdown = path.read_text(encoding="utf-8")
+            os.utime(path)  # recency for prune()
+        except OSError:
+            self.stats["misses"] += 1
+            publish("counter", "agent_extract_cache_total", documentation="Extraction cache lookups", source=kind, outcome="miss")
+            return None
+        self.stats["hits"] += 1
+        publish("counter", "agent_extract_cache_total", documentation="Extraction cache lookups", source=kind, outcome="hit")
+        return markdown
+
+    def put(self, key: str, markdown: str):
+        path = self._path(key)
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            staging = path.with_suffix(f".{os.getpid()}.tmp")
+            staging.write_text(markdown, encoding="utf-8")
+            os.replace(staging, path)  # concurrent servers may write the same key; last rename wins
+            self.stats["writes"] += 1
+        except OSError:
+            pass  # a cache write must never fail an extraction
+
+    def prune(self, max_bytes: int) -> int:
+        """Delete least recently used entries until the cache fits; returns entries removed"""
+        entries = []
+        for path in self.root.glob("*/*.md"):
+            try:
+                stat = path.stat()
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+        total = sum(size for _, size, _ in entries)
+        removed = 0
+        for _, size, path in sorted(entries):
+            if total <= max_bytes:
+                break
+            try:
+                path.unlink()
+            except OSError:
+                continue
+            total -= size
+            removed += 1
+        return removed
+
+    def get_stats(self) -> Dict[str, int]:
+        return dict(self.stats)
+
+
+extract_cache = ExtractionCache(Path(os.getenv("AGENT_EXTRACT_CACHE") or ROOT / "faiss_index" / "extract_cache"))
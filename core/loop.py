@@ -2,13 +2,16 @@
 
 import asyncio
 import time
+from typing import Any
 from modules.perception import run_perception
 from modules.decision import generate_plan
 from modules.action import run_python_sandbox
 from modules.model_manager import ModelManager
 from core.session import MultiMCP
-from core.strategy import select_decision_prompt_path
+from core.strategy import select_decision_prompt_path, SpeculativePlanner
 from core.context import AgentContext
+from core.tracing import tracer
+from core.profiling import profile_run
 from modules.tools import summarize_tools
 from modules.memory import ConversationTurn, ToolExecution
 import re
@@ -21,15 +24,39 @@ except ImportError:
         now = datetime.datetime.now().strftime("%H:%M:%S")
         print(f"[{now}] [{stage}] {msg}")
 
+# Sandbox errors that mean perception picked the wrong servers/tools
+TOOL_SELECTION_FAILURE_MARKERS = ("not found on any server",)
+
+
 class AgentLoop:
-    def __init__(self, context: AgentContext):
+    def __init__(self, context: AgentContext, model: ModelManager = None):
         self.context = context
         self.mcp = self.context.dispatcher
-        self.model = ModelManager()
+        self.model = model or ModelManager()  # pass a shared one when running many loops
         self.current_turn_tools = []  # Track tools executed in current turn
+        self._perception_memo = None  # Per-step reuse of perception across lifelines
+
+        # Exploratory/parallel mode: concurrent candidate plans, spares kept for lifelines
+        strategy = self.context.agent_profile.strategy
+        self.planner = SpeculativePlanner(strategy) if SpeculativePlanner.enabled_for(strategy) else None
+        self._plan_batch = None
+
+    async def _save_tool_output(self, plan: str, result: Any, success: bool):
+        """Persist the sandbox run to session memory (file write runs in a thread)"""
+        stage_start = time.perf_counter()
+        await asyncio.to_thread(
+            self.context.memory.add_tool_output,
+            tool_name="solve_sandbox",
+            tool_args={"plan": plan},
+            tool_result={"result": result},
+            success=success,
+            tags=["sandbox"],
+        )
+        self.context.record_timing("memory_write", stage_start)
 
-    def _capture_conversation_turn(self, step: int, plan: str, result: str):
-        """Capture the full conversation turn and add to history index."""
+    async def _capture_conversation_turn(self, step: int, plan: str, result: str):
+        """Capture the full conversation turn and add to history index (embedding, FAISS add and save run in a thread)."""
+        stage_start = time.perf_counter()
         try:
             turn = ConversationTurn(
                 turn_id=ConversationTurn.create_turn_id(self.context.session_id, step),
@@ -48,41 +75,125 @@ class AgentLoop:
             )
 
             # Add to conversation history index
-            self.context.memory.add_conversation_turn(turn)
+            await asyncio.to_thread(self.context.memory.add_conversation_turn, turn)
             log("loop", f"📝 Captured conversation turn for step {step}")
 
         except Exception as e:
             log("loop", f"⚠️ Failed to capture conversation turn: {e}")
+        finally:
+            self.context.record_timing("memory_write", stage_start)
+
+    async def _describe_tools(self, query: str, tools: list, perception) -> str:
+        """Prompt block with the most relevant tools for the query, within the token budget"""
+        registry = getattr(self.mcp, "tool_registry", None)
+        if registry is None:
+            return summarize_tools(tools)
+
+        config = self.context.agent_profile.tool_selection_config
+        relevant = await registry.select(
+            query,
+            tools,
+            top_k=config.get("top_k", 8),
+            token_budget=config.get("token_budget", 800),
+            hint=getattr(perception, "tool_hint", None),
+        )
+        log("loop", f"🧰 {len(relevant)}/{len(tools)} tools in planning prompt: {[tool.name for tool in relevant]}")
+        return registry.summarize(relevant)
+
+    def _reset_plan_batch(self):
+        """Drop speculative plans made for an input that no longer applies"""
+        if self._plan_batch is not None:
+            self._plan_batch.cancel()
+            self._plan_batch = None
+
+    async def _next_speculative_plan(self, plan_kwargs: dict) -> str:
+        """First valid candidate, or a ready fallback on a lifeline retry"""
+        if self._plan_batch is None:
+            self._plan_batch = self.planner.start(**plan_kwargs)
+        else:
+            log("loop", "♻️ Using a speculative fallback plan")
+
+        plan = await self._plan_batch.next_valid()
+        if plan is None:
+            # Candidates used up (or none valid): start a fresh round
+            log("loop", f"🔀 Speculative candidates exhausted: {self._plan_batch.stats}")
+            self._plan_batch = self.planner.start(**plan_kwargs)
+            plan = await self._plan_batch.next_valid()
+            if plan is None:
+                return self._plan_batch.last_raw or "FINAL_ANSWER: [Could not generate valid solve()]"
+        return plan
 
     async def run(self):
+        # Sampling profiler (AGENT_PROFILER=1 / profiles.yaml `profiling:`); a no-op otherwise
+        with profile_run(f"agent-{self.context.session_id.rsplit('/', 1)[-1]}"):
+            try:
+                return await self._run_steps()
+            finally:
+                self._reset_plan_batch()
+
+    async def _run_steps(self):
         max_steps = self.context.agent_profile.strategy.max_steps
 
         for step in range(max_steps):
-            print(f"🔁 Step {step+1}/{max_steps} starting...")
-            self.context.step = step
-            lifelines_left = self.context.agent_profile.strategy.max_lifelines_per_step
+            with tracer.span("step", step=step + 1):
+                outcome = await self._run_step(step, max_steps)
+            if outcome is not None:
+                return outcome
+
+        log("loop", "⚠️ Max steps reached without finding final answer.")
+        self.context.final_answer = "FINAL_ANSWER: [Max steps reached]"
+        return {"status": "done", "result": self.context.final_answer}
 
-            while lifelines_left >= 0:
+    async def _run_step(self, step: int, max_steps: int):
+        """One step, retried while lifelines last; None moves on to the next step"""
+        print(f"🔁 Step {step+1}/{max_steps} starting...")
+        self.context.step = step
+        lifelines_left = self.context.agent_profile.strategy.max_lifelines_per_step
+        self._perception_memo = None
+        self._reset_plan_batch()
+
+        while lifelines_left >= 0:
+            with tracer.span("lifeline", lifelines_left=lifelines_left):
                 # === Perception ===
                 user_input_override = getattr(self.context, "user_input_override", None)
-                perception = await run_perception(context=self.context, user_input=user_input_override or self.context.user_input)
+                effective_input = user_input_override or self.context.user_input
+                memo = self._perception_memo
+
+                if memo is not None and memo["input"] == effective_input:
+                    # Same input as the previous attempt: only re-plan
+                    log("loop", "♻️ Reusing perception, history and tool selection from previous attempt")
+                    perception = memo["perception"]
+                    self.context.relevant_conversation_history = memo["history"]
+                    selected_tools = memo["selected_tools"]
+                else:
+                    self._reset_plan_batch()
+                    stage_start = time.perf_counter()
+                    perception = await run_perception(context=self.context, user_input=effective_input)
+                    self.context.record_timing("perception", stage_start)
+
+                    print(f"[perception] {perception}")
 
-                print(f"[perception] {perception}")
+                    selected_servers = perception.selected_servers
+                    selected_tools = self.mcp.get_tools_from_servers(selected_servers)
 
-                selected_servers = perception.selected_servers
-                selected_tools = self.mcp.get_tools_from_servers(selected_servers)
+                    # Apply tool heuristics if available
+                    if self.context.heuristics and selected_tools:
+                        tool_context = {
+                            "session_id": self.context.session_id,
+                            "step": step,
+                            "query_intent": perception.intent if hasattr(perception, 'intent') else "general"
+                        }
+                        selected_tools, tool_metadata = await self.context.heuristics.process_tools(
+                            selected_tools, tool_context
+                        )
+                        log("loop", f"Tool heuristics applied: {tool_metadata}")
 
-                # Apply tool heuristics if available
-                if self.context.heuristics and selected_tools:
-                    tool_context = {
-                        "session_id": self.context.session_id,
-                        "step": step,
-                        "query_intent": perception.intent if hasattr(perception, 'intent') else "general"
+                    self._perception_memo = {
+                        "input": effective_input,
+                        "perception": perception,
+                        "history": getattr(self.context, "relevant_conversation_history", []),
+                        "selected_tools": selected_tools,
                     }
-                    selected_tools, tool_metadata = await self.context.heuristics.process_tools(
-                        selected_tools, tool_context
-                    )
-                    log("loop", f"Tool heuristics applied: {tool_metadata}")
 
                 # If no tools selected but we have previous data to synthesize, allow synthesis mode
                 if not selected_tools:
@@ -93,7 +204,7 @@ class AgentLoop:
                         log("loop", "⚠️ No tools selected — aborting step.")
                         break
                 else:
-                    tool_descriptions = summarize_tools(selected_tools)
+                    tool_descriptions = await self._describe_tools(effective_input, selected_tools, perception)
 
                 # === Planning ===
                 prompt_path = select_decision_prompt_path(
@@ -101,7 +212,7 @@ class AgentLoop:
                     exploration_mode=self.context.agent_profile.strategy.exploration_mode,
                 )
 
-                plan = await generate_plan(
+                plan_kwargs = dict(
                     user_input=user_input_override or self.context.user_input,
                     perception=perception,
                     memory_items=self.context.memory.get_session_items(),
@@ -111,6 +222,12 @@ class AgentLoop:
                     max_steps=max_steps,
                     context=self.context,  # Pass context for conversation history
                 )
+                stage_start = time.perf_counter()
+                if self.planner is not None:
+                    plan = await self._next_speculative_plan(plan_kwargs)
+                else:
+                    plan = await generate_plan(**plan_kwargs)
+                self.context.record_timing("planning", stage_start)
                 print(f"[plan] {plan}")
 
                 # === Execution ===
@@ -120,12 +237,20 @@ class AgentLoop:
                     # Track tool execution for conversation history
                     tool_exec_start = time.time()
                     self.context.log_subtask(tool_name="solve_sandbox", status="pending")
-                    sandbox_output = await run_python_sandbox(plan, dispatcher=self.mcp)
+                    stage_start = time.perf_counter()
+                    sandbox_output = await run_python_sandbox(
+                        plan,
+                        dispatcher=self.mcp,
+                        session_id=self.context.session_id,
+                        limits=self.context.agent_profile.sandbox
+                    )
+                    self.context.record_timing("sandbox", stage_start)
 
                     # Extract result and tool outputs from sandbox
                     if isinstance(sandbox_output, dict):
                         result = sandbox_output.get("result", str(sandbox_output))
                         tool_outputs = sandbox_output.get("tool_outputs", [])
+                        self.context.tool_trace.extend(sandbox_output.get("tool_calls", []))
                     else:
                         result = str(sandbox_output)
                         tool_outputs = []
@@ -137,9 +262,11 @@ class AgentLoop:
                             "step": step,
                             "tool_outputs": tool_outputs  # Now properly tracked!
                         }
+                        stage_start = time.perf_counter()
                         validated_result, result_metadata = await self.context.heuristics.process_result(
                             result, result_context
                         )
+                        self.context.record_timing("heuristics", stage_start)
                         if result_metadata.get("failed", 0) > 0:
                             log("loop", f"⚠️ Result validation failed: {result_metadata}")
                         result = validated_result
@@ -162,16 +289,10 @@ class AgentLoop:
                             )
                             self.current_turn_tools.append(tool_execution)
 
-                            self.context.memory.add_tool_output(
-                                tool_name="solve_sandbox",
-                                tool_args={"plan": plan},
-                                tool_result={"result": result},
-                                success=True,
-                                tags=["sandbox"],
-                            )
+                            await self._save_tool_output(plan, result, success=True)
 
                             # 🆕 Capture full conversation turn for history
-                            self._capture_conversation_turn(step, plan, result)
+                            await self._capture_conversation_turn(step, plan, result)
 
                             return {"status": "done", "result": self.context.final_answer}
                         elif result.startswith("FURTHER_PROCESSING_REQUIRED:"):
@@ -204,13 +325,7 @@ class AgentLoop:
                     else:
                         self.context.update_subtask_status("solve_sandbox", "failure")
 
-                    self.context.memory.add_tool_output(
-                        tool_name="solve_sandbox",
-                        tool_args={"plan": plan},
-                        tool_result={"result": result},
-                        success=success,
-                        tags=["sandbox"],
-                    )
+                    await self._save_tool_output(plan, result, success=success)
 
                     if success and "FURTHER_PROCESSING_REQUIRED:" not in result:
                         # Track tool execution
@@ -224,10 +339,14 @@ class AgentLoop:
                         self.current_turn_tools.append(tool_execution)
 
                         # 🆕 Capture full conversation turn for history
-                        self._capture_conversation_turn(step, plan, self.context.final_answer)
+                        await self._capture_conversation_turn(step, plan, self.context.final_answer)
 
                         return {"status": "done", "result": self.context.final_answer}
                     else:
+                        if isinstance(result, str) and any(marker in result for marker in TOOL_SELECTION_FAILURE_MARKERS):
+                            log("loop", "🔄 Failure caused by tool selection — perception will be re-run")
+                            self._perception_memo = None
+                            self._reset_plan_batch()
                         lifelines_left -= 1
                         log("loop", f"🛠 Retrying... Lifelines left: {lifelines_left}")
                         continue
@@ -236,6 +355,3 @@ class AgentLoop:
                     lifelines_left -= 1
                     continue
 
-        log("loop", "⚠️ Max steps reached without finding final answer.")
-        self.context.final_answer = "FINAL_ANSWER: [Max steps reached]"
-        return {"status": "done", "result": self.context.final_answer}
@@ -0,0 +1,345 @@
+# core/metrics.py
+
+import atexit
+import functools
+import inspect
+import json
+import math
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+
+ROOT = Path(__file__).resolve().parent.parent
+
+# MCP server processes append metric events here; the agent process folds them in
+# when metrics are read. Each agent process spools into a file of its own (MultiMCP
+# hands it to the servers it spawns as AGENT_METRICS_SPOOL), so concurrent agents
+# never count each other's events; servers started without it publish nothing.
+SPOOL_PATH = Path(os.getenv("AGENT_METRICS_SPOOL") or ROOT / "metrics" / f"mcp_events-{os.getpid()}.jsonl")
+SPOOL_ROTATE_BYTES = 8 * 1024 * 1024
+SPOOL_MAX_BYTES = 4 * SPOOL_ROTATE_BYTES  # writers truncate beyond this: nobody is reading (REPL, batch, indexer)
+_SPOOL_GIVEN = bool(os.getenv("AGENT_METRICS_SPOOL"))
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+def _escape(value: Any) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(labelnames: Tuple[str, ...], values: Tuple[str, ...], extra: str = "") -> str:
+    parts = [f'{name}="{_escape(value)}"' for name, value in zip(labelnames, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class Metric:
+    """Base for labelled metrics; one value slot per label combination"""
+
+    type = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[Tuple[str, ...], Any] = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, Any]) -> Tuple[str, ...]:
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    def clear(self):
+        with self._lock:
+            self._values.clear()
+
+
+class Counter(Metric):
+    type = "counter"
+
+    def inc(self, amount: float = 1.0, **labels: Any):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def samples(self) -> List[Tuple[str, str, float]]:
+        with self._lock:
+            return [(self.name, _format_labels(self.labelnames, key), value) for key, value in self._values.items()]
+
+
+class Gauge(Metric):
+    type = "gauge"
+
+    def set(self, value: float, **labels: Any):
+        with self._lock:
+            self._values[self._key(labels)] = float(value)
+
+    def inc(self, amount: float = 1.0, **labels: Any):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def dec(self, amount: float = 1.0, **labels: Any):
+        self.inc(-amount, **labels)
+
+    def samples(self) -> List[Tuple[str, str, float]]:
+        with self._lock:
+            return [(self.name, _format_labels(self.labelnames, key), value) for key, value in self._values.items()]
+
+
+class Histogram(Metric):
+    type = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = (),
+                 buckets: Iterable[float] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+
+    def observe(self, value: float, **labels: Any):
+        key = self._key(labels)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = self._values[key] = {"counts": [0] * len(self.buckets), "sum": 0.0, "count": 0}
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    entry["counts"][index] += 1
+                    break
+            entry["sum"] += value
+            entry["count"] += 1
+
+    def time(self, **labels: Any) -> "_Timer":
+        """Context manager observing the elapsed seconds"""
+        return _Timer(self, labels)
+
+    def samples(self) -> List[Tuple[str, str, float]]:
+        rows = []
+        with self._lock:
+            for key, entry in self._values.items():
+                cumulative = 0
+                for bound, count in zip(self.buckets, entry["counts"]):
+                    cumulative += count
+                    le = f'le="{_format_value(bound)}"'
+                    rows.append((f"{self.name}_bucket", _format_labels(self.labelnames, key, le), cumulative))
+                rows.append((f"{self.name}_sum", _format_labels(self.labelnames, key), entry["sum"]))
+                rows.append((f"{self.name}_count", _format_labels(self.labelnames, key), entry["count"]))
+        return rows
+
+
+class _Timer:
+    __slots__ = ("histogram", "labels", "start")
+
+    def __init__(self, histogram: Histogram, labels: Dict[str, Any]):
+        self.histogram = histogram
+        self.labels = labels
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.histogram.observe(time.perf_counter() - self.start, **self.labels)
+        return False
+
+
+class MetricsRegistry:
+    """
+    Process-wide counters, gauges and histograms.
+
+    Modules declare their metrics once at import (get-or-create, so repeated
+    declarations share one metric). Collectors refresh gauges from existing
+    get_stats() methods right before metrics are read; events spooled by MCP
+    server processes are folded in at the same time. render() produces the
+    Prometheus text exposition format.
+    """
+
+    def __init__(self, spool_path: Path = SPOOL_PATH):
+        self._metrics: Dict[str, Metric] = {}
+        self._collectors: List[Callable[[], None]] = []
+        self._lock = threading.Lock()
+        self.spool_path = spool_path
+        # Start at the current end: counters cover this process's lifetime
+        self._spool_offset = spool_path.stat().st_size if spool_path.exists() else 0
+
+    def _get_or_create(self, cls, name: str, documentation: str, labelnames: Iterable[str], **kwargs) -> Any:
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = cls(name, documentation, labelnames, **kwargs)
+            elif not isinstance(metric, cls):
+                raise ValueError(f"Metric {name} already registered as {metric.type}")
+            return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Iterable[str] = ()) -> Counter:
+        return self._get_or_create(Counter, name, documentation, labelnames)
+
+    def gauge(self, name: str, documentation: str, labelnames: Iterable[str] = ()) -> Gauge:
+        return self._get_or_create(Gauge, name, documentation, labelnames)
+
+    def histogram(self, name: str, documentation: str, labelnames: Iterable[str] = (),
+                  buckets: Iterable[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self._get_or_create(Histogram, name, documentation, labelnames, buckets=buckets)
+
+    def add_collector(self, collector: Callable[[], None]):
+        """collector() runs before every read; it should only set gauges/counters"""
+        self._collectors.append(collector)
+
+    def collect(self):
+        self.ingest_spool()
+        for collector in list(self._collectors):
+            try:
+                collector()
+            except Exception:
+                pass  # a broken stats source must not take down /metrics
+
+    # === Cross-process events (MCP servers) ===
+
+    def apply_event(self, event: Dict[str, Any]):
+        labels = event.get("labels") or {}
+        kind, name, value = event.get("kind"), event.get("name"), event.get("value", 1)
+        help_text = event.get("help") or "Reported by MCP server processes"
+        if kind == "counter":
+            self.counter(name, help_text, sorted(labels)).inc(value, **labels)
+        elif kind == "histogram":
+            self.histogram(name, help_text, sorted(labels)).observe(value, **labels)
+
+    def ingest_spool(self):
+        path = self.spool_path
+        try:
+            if not path.exists():
+                return
+            if path.stat().st_size < self._spool_offset:
+                self._spool_offset = 0  # replaced or truncated by someone else
+            with open(path, "rb") as f:
+                f.seek(self._spool_offset)
+                data = f.read()
+        except OSError:
+            return
+
+        complete = data.rfind(b"\n") + 1  # a writer may be mid-line
+        for line in data[:complete].splitlines():
+            try:
+                self.apply_event(json.loads(line))
+            except (ValueError, TypeError):
+                continue
+        self._spool_offset += complete
+
+        if self._spool_offset >= SPOOL_ROTATE_BYTES:
+            self._rotate_spool()
+
+    def _rotate_spool(self):
+        """Move the consumed spool aside; late appends to it are read before it is removed"""
+        consumed = self.spool_path.with_suffix(".consumed")
+        try:
+            os.replace(self.spool_path, consumed)
+            with open(consumed, "rb") as f:
+                f.seek(self._spool_offset)
+                tail = f.read()
+            consumed.unlink()
+        except OSError:
+            return
+        self._spool_offset = 0
+        for line in tail.splitlines():
+            try:
+                self.apply_event(json.loads(line))
+            except (ValueError, TypeError):
+                continue
+
+    # === Export ===
+
+    def render(self) -> str:
+        """Prometheus text exposition format (version 0.0.4)"""
+        self.collect()
+        with self._lock:
+            metrics = sorted(self._metrics.values(), key=lambda metric: metric.name)
+        lines = []
+        for metric in metrics:
+            samples = metric.samples()
+            if not samples:
+                continue
+            lines.append(f"# HELP {metric.name} {_escape(metric.documentation)}")
+            lines.append(f"# TYPE {metric.name} {metric.type}")
+            for name, labels, value in samples:
+                lines.append(f"{name}{labels} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
+
+
+@atexit.register
+def _remove_own_spool():
+    if not _SPOOL_GIVEN:  # the per-process default spool dies with its agent process
+        for path in (SPOOL_PATH, SPOOL_PATH.with_suffix(".consumed")):
+            try:
+                path.unlink()
+            except OSError:
+                pass
+
+
+# === MCP server side ===
+
+def publish(kind: str, name: str, value: float = 1.0, documentation: Optional[str] = None, **labels: Any):
+    """Append one metric event to the spool (called from MCP server processes)"""
+    if not _SPOOL_GIVEN:
+        return
+    event = {"kind": kind, "name": name, "value": value, "labels": {key: str(val) for key, val in labels.items()}}
+    if documentation:
+        event["help"] = documentation
+    try:
+        SPOOL_PATH.parent.mkdir(parents=True, exist_ok=True)
+        # One short write per event in append mode, so concurrent servers do not interleave lines
+        with open(SPOOL_PATH, "ab") as f:
+            f.write((json.dumps(event) + "\n").encode("utf-8"))
+            if f.tell() > SPOOL_MAX_BYTES:
+                f.truncate(0)  # the agent rotates at SPOOL_ROTATE_BYTES when it reads; it never did
+    except OSError:
+        pass  # metrics must never fail a tool call
+
+
+def instrument_tool(server: str):
+    """
+    Decorator for MCP tool functions (below @mcp.tool()): publishes call count,
+    errors and latency for the agent process to collect.
+    """
+    def record(tool: str, start: float, status: str):
+        publish("counter", "agent_mcp_server_tool_calls_total", 1,
+                documentation="Tool calls handled by MCP server processes", server=server, tool=tool, status=status)
+        publish("histogram", "agent_mcp_server_tool_seconds", time.perf_counter() - start,
+                documentation="Tool execution time inside MCP server processes", server=server, tool=tool)
+
+    def decorator(func):
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                start = time.perf_counter()
+                try:
+                    result = await func(*args, **kwargs)
+                except Exception:
+                    record(func.__name__, start, "error")
+                    raise
+                record(func.__name__, start, "ok")
+                return result
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                result = func(*args, **kwargs)
+            except Exception:
+                record(func.__name__, start, "error")
+                raise
+            record(func.__name__, start, "ok")
+            return result
+        return wrapper
+    return decorator
@@ -0,0 +1,208 @@
+# core/profiling.py
+
+import datetime
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import yaml
+
+
+# MCP servers import this module: no `from agent import log` (it would load the whole
+# agent into every server process), and stderr only (stdout is their protocol channel)
+def log(stage: str, msg: str):
+    now = datetime.datetime.now().strftime("%H:%M:%S")
+    sys.stderr.write(f"[{now}] [{stage}] {msg}\n")
+    sys.stderr.flush()
+
+
+ROOT = Path(__file__).resolve().parent.parent
+
+DEFAULT_PROFILING_CONFIG = {
+    "enabled": False,
+    "interval_ms": 5,          # time between samples
+    "output_dir": "profiles",  # <timestamp>-<label>.folded (flamegraph input) + .top.txt
+    "top_n": 25,
+    "include_idle": False,     # keep samples of threads parked in select()/wait()/queue.get()
+    "max_depth": 128,
+}
+
+# Leaf frames in these files mean the thread is waiting, not computing
+IDLE_FILES = {"selectors.py", "threading.py", "queue.py", "socket.py", "ssl.py"}
+
+Frame = Tuple[str, str, int]  # (filename, function, first line)
+
+
+class SamplingProfiler:
+    """
+    Statistical profiler: a daemon thread snapshots every thread's Python
+    stack (sys._current_frames) at a fixed interval.
+
+    Cost is one stack walk per thread per interval and nothing on the
+    profiled code itself. Counts are wall-clock samples of threads that were
+    running (idle waits are dropped unless include_idle), so they approximate
+    where CPU time goes. The sampler needs the GIL, so against CPU-bound
+    Python the effective rate is capped by sys.getswitchinterval().
+    """
+
+    def __init__(self, interval: float = 0.005, include_idle: bool = False, max_depth: int = 128):
+        self.interval = interval
+        self.include_idle = include_idle
+        self.max_depth = max_depth
+        self.stacks: Counter = Counter()  # root-first tuple of frames → samples
+        self.samples = 0
+        self.idle_samples = 0
+        self.started_at = 0.0
+        self.elapsed = 0.0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        self.started_at = time.perf_counter()
+        self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        self.elapsed = time.perf_counter() - self.started_at
+
+    def _run(self):
+        own_id = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            self.sample(skip_thread=own_id)
+
+    def sample(self, skip_thread: Optional[int] = None):
+        for thread_id, frame in sys._current_frames().items():
+            if thread_id == skip_thread:
+                continue
+            stack: List[Frame] = []
+            while frame is not None and len(stack) < self.max_depth:
+                code = frame.f_code
+                stack.append((code.co_filename, code.co_name, code.co_firstlineno))
+                frame = frame.f_back
+            if not stack:
+                continue
+            if not self.include_idle and os.path.basename(stack[0][0]) in IDLE_FILES:
+                self.idle_samples += 1
+                continue
+            stack.reverse()
+            self.stacks[tuple(stack)] += 1
+            self.samples += 1
+
+    # === Reports ===
+
+    @staticmethod
+    def frame_label(frame: Frame) -> str:
+        filename, function, line = frame
+        path = Path(filename)
+        try:
+            short = path.resolve().relative_to(ROOT).as_posix()
+        except (ValueError, OSError):
+            short = "/".join(path.parts[-2:])
+        return f"{function} ({short}:{line})".replace(";", ":")
+
+    def folded(self) -> str:
+        """Folded stacks ("root;child;leaf count"), the input format of flamegraph.pl and speedscope"""
+        lines = [
+            ";".join(self.frame_label(frame) for frame in stack) + f" {count}"
+            for stack, count in self.stacks.most_common()
+        ]
+        return "\n".join(lines) + "\n"
+
+    def top(self, n: int = 25) -> List[Dict[str, Any]]:
+        """Hottest functions by self samples (leaf) with cumulative samples alongside"""
+        own: Counter = Counter()
+        cumulative: Counter = Counter()
+        for stack, count in self.stacks.items():
+            own[stack[-1]] += count
+            for frame in set(stack):
+                cumulative[frame] += count
+
+        total = self.samples or 1
+        ranked = sorted(cumulative, key=lambda frame: (own[frame], cumulative[frame]), reverse=True)
+        return [
+            {
+                "function": self.frame_label(frame),
+                "self": own[frame],
+                "self_pct": round(100 * own[frame] / total, 1),
+                "total": cumulative[frame],
+                "total_pct": round(100 * cumulative[frame] / total, 1),
+            }
+            for frame in ranked[:n]
+        ]
+
+    def report(self, n: int = 25) -> str:
+        lines = [
+            f"{self.samples} samples ({self.idle_samples} idle dropped) over {self.elapsed:.2f}s "
+            f"at {self.interval * 1000:.1f}ms intervals",
+            "",
+            f"{'self%':>7} {'total%':>7} {'self':>7} {'total':>7}  function",
+        ]
+        for row in self.top(n):
+            lines.append(f"{row['self_pct']:>7.1f} {row['total_pct']:>7.1f} {row['self']:>7} {row['total']:>7}  {row['function']}")
+        return "\n".join(lines) + "\n"
+
+    def write(self, output_dir: Path, label: str, top_n: int = 25) -> Tuple[Path, Path]:
+        output_dir.mkdir(parents=True, exist_ok=True)
+        safe_label = "".join(ch if ch.isalnum() or ch in "-_" else "_" for ch in label)
+        stem = output_dir / f"{time.strftime('%Y%m%d-%H%M%S')}-{safe_label}"
+        folded_path = stem.with_suffix(".folded")
+        top_path = stem.with_suffix(".top.txt")
+        folded_path.write_text(self.folded(), encoding="utf-8")
+        top_path.write_text(self.report(top_n), encoding="utf-8")
+        return folded_path, top_path
+
+
+def get_profiling_config() -> Dict[str, Any]:
+    """profiles.yaml `profiling:`; AGENT_PROFILER=1/0 overrides `enabled`"""
+    config = dict(DEFAULT_PROFILING_CONFIG)
+    try:
+        with open(os.getenv("AGENT_PROFILE_PATH") or ROOT / "config" / "profiles.yaml", "r") as f:
+            config.update((yaml.safe_load(f) or {}).get("profiling") or {})
+    except OSError:
+        pass
+    override = os.getenv("AGENT_PROFILER")
+    if override is not None:
+        config["enabled"] = override.strip().lower() in ("1", "true", "yes", "on")
+    return config
+
+
+_active = threading.Lock()  # one profiled region at a time per process
+
+
+@contextmanager
+def profile_run(label: str) -> Iterator[Optional[SamplingProfiler]]:
+    """
+    Sample everything while the block runs, then write <label>.folded and
+    <label>.top.txt. A no-op when profiling is off, or when another region is
+    already being profiled (samples cover all threads, so overlapping runs
+    could not be told apart).
+    """
+    config = get_profiling_config()
+    if not config["enabled"] or not _active.acquire(blocking=False):
+        yield None
+        return
+
+    profiler = SamplingProfiler(
+        interval=config["interval_ms"] / 1000,
+        include_idle=config["include_idle"],
+        max_depth=config["max_depth"],
+    )
+    profiler.start()
+    try:
+        yield profiler
+    finally:
+        profiler.stop()
+        _active.release()
+        try:
+            folded_path, top_path = profiler.write(Path(config["output_dir"]), label, config["top_n"])
+            log("profile", f"🔥 Profile: {profiler.samples} samples → {folded_path} (top functions: {top_path})")
+        except OSError as e:
+            log("profile", f"⚠️ Could not write profile: {e}")
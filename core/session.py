@@ -2,9 +2,23 @@
 
 import os
 import sys
+import asyncio
+import time
+import weakref
 from typing import Optional, Any, List, Dict
 from mcp import ClientSession, StdioServerParameters
-from mcp.client.stdio import stdio_client
+from mcp.client.stdio import stdio_client, get_default_environment
+from core.tool_cache import ToolResultCache
+from core.tool_registry import ToolRegistry
+from core.tracing import tracer, traced
+from core.metrics import registry
+
+TOOL_CALLS = registry.counter("agent_mcp_tool_calls_total", "MultiMCP tool calls by cache outcome", ["tool", "server", "cache"])
+TOOL_ERRORS = registry.counter("agent_mcp_tool_errors_total", "MultiMCP tool calls that raised or returned isError", ["tool", "server"])
+TOOL_SECONDS = registry.histogram("agent_mcp_tool_call_seconds", "MultiMCP tool call latency, cache hits included", ["server"])
+SUBPROCESS_SPAWNS = registry.counter("agent_mcp_subprocess_spawns_total", "MCP server processes started", ["server", "purpose"])
+TOOL_CACHE_ENTRIES = registry.gauge("agent_tool_cache_entries", "Cached tool results across sessions")
+TOOL_CACHE_SESSIONS = registry.gauge("agent_tool_cache_sessions", "Sessions with cached tool results")
 
 
 class MCP:
@@ -52,13 +66,32 @@ class MultiMCP:
     """
     Stateless version: discovers tools from multiple MCP servers, but reconnects per tool call.
     Each call_tool() uses a fresh session based on tool-to-server mapping.
+    Results of idempotent tools are cached per agent session (see ToolResultCache).
     """
 
     def __init__(self, server_configs: List[dict]):
         self.server_configs = server_configs
         self.tool_map: Dict[str, Dict[str, Any]] = {}  # tool_name → {config, tool}
         self.server_tools: Dict[str, List[Any]] = {}  # server_name -> list of tools
-
+        self.tool_cache = ToolResultCache.from_server_configs(server_configs)
+        self._inflight: Dict[str, asyncio.Future] = {}  # cache key → pending call (coalesces duplicates)
+        self.tool_registry = ToolRegistry({})  # rebuilt by initialize()
+        self_ref = weakref.ref(self)
+        registry.add_collector(lambda: self_ref() and self_ref()._collect_metrics())
+
+    def _collect_metrics(self):
+        stats = self.tool_cache.get_stats()
+        TOOL_CACHE_ENTRIES.set(stats["entries"])
+        TOOL_CACHE_SESSIONS.set(stats["sessions"])
+
+
+    @staticmethod
+    def _server_env() -> Dict[str, str]:
+        """stdio_client only passes a minimal environment; forward the AGENT_* switches too"""
+        env = get_default_environment()
+        env.update({key: value for key, value in os.environ.items() if key.startswith("AGENT_")})
+        env["AGENT_METRICS_SPOOL"] = str(registry.spool_path)  # this process's spool (core/metrics.py)
+        return env
 
     async def initialize(self):
         print("in MultiMCP initialize")
@@ -67,9 +100,11 @@ class MultiMCP:
                 params = StdioServerParameters(
                     command=sys.executable,
                     args=[config["script"]],
-                    cwd=config.get("cwd", os.getcwd())
+                    cwd=config.get("cwd", os.getcwd()),
+                    env=self._server_env()
                 )
                 print(f"→ Scanning tools from: {config['script']} in {params.cwd}")
+                SUBPROCESS_SPAWNS.inc(server=config["id"], purpose="list_tools")
                 async with stdio_client(params) as (read, write):
                     print("Connection established, creating session...")
                     try:
@@ -93,16 +128,91 @@ class MultiMCP:
             except Exception as e:
                 print(f"❌ Error initializing MCP server {config['script']}: {e}")
 
-    async def call_tool(self, tool_name: str, arguments: dict) -> Any:
+        # Precompute tool summaries and description embeddings once
+        self.tool_registry = ToolRegistry(self.server_tools)
+        try:
+            await self.tool_registry.build_embeddings()
+        except Exception as e:
+            print(f"⚠️ Tool embeddings unavailable, tool selection falls back to catalog order: {e}")
+
+    async def call_tool(self, tool_name: str, arguments: dict, session_id: Optional[str] = None) -> Any:
+        server = self.tool_map[tool_name]["config"]["id"] if tool_name in self.tool_map else "unknown"
+        start = time.perf_counter()
+        failed = True
+        try:
+            with tracer.span("mcp.call_tool", tool=tool_name):
+                result = await self._call_tool(tool_name, arguments, session_id)
+            failed = bool(getattr(result, "isError", False))
+            return result
+        finally:
+            TOOL_SECONDS.observe(time.perf_counter() - start, server=server)
+            if failed:
+                TOOL_ERRORS.inc(tool=tool_name, server=server)
+
+    async def _call_tool(self, tool_name: str, arguments: dict, session_id: Optional[str]) -> Any:
         entry = self.tool_map.get(tool_name)
         if not entry:
             raise ValueError(f"Tool '{tool_name}' not found on any server.")
 
+        server = entry["config"]["id"]
+        if session_id is None or not self.tool_cache.is_cacheable(tool_name):
+            TOOL_CALLS.inc(tool=tool_name, server=server, cache="uncached")
+            return await self._call_server(entry, tool_name, arguments)
+
+        hit, cached = self.tool_cache.get(session_id, tool_name, arguments)
+        if hit:
+            TOOL_CALLS.inc(tool=tool_name, server=server, cache="hit")
+            self._mark_span(cache="hit")
+            return cached
+
+        # Identical call already running in this session: share its result
+        inflight_key = f"{session_id}|{ToolResultCache.canonical_key(tool_name, arguments)}"
+        pending = self._inflight.get(inflight_key)
+        if pending is not None:
+            TOOL_CALLS.inc(tool=tool_name, server=server, cache="coalesced")
+            self._mark_span(cache="coalesced")
+            try:
+                return await asyncio.shield(pending)
+            except asyncio.CancelledError:
+                if not pending.cancelled() or asyncio.current_task().cancelling():
+                    raise  # this caller was cancelled
+            # The leader was cancelled (e.g. its plan hit a deadline); issue the call ourselves
+            return await self._call_tool(tool_name, arguments, session_id)
+
+        TOOL_CALLS.inc(tool=tool_name, server=server, cache="miss")
+        pending = asyncio.get_running_loop().create_future()
+        self._inflight[inflight_key] = pending
+        try:
+            result = await self._call_server(entry, tool_name, arguments)
+            if not self.tool_cache.is_failure(tool_name, result):
+                self.tool_cache.put(session_id, tool_name, arguments, result)
+            pending.set_result(result)
+            return result
+        except asyncio.CancelledError:
+            pending.cancel()
+            raise
+        except Exception as e:
+            pending.set_exception(e)
+            pending.exception()  # mark retrieved when nobody else is waiting
+            raise
+        finally:
+            self._inflight.pop(inflight_key, None)
+
+    @staticmethod
+    def _mark_span(**attrs: Any):
+        span = tracer.current()
+        if span is not None:
+            span.set(**attrs)
+
+    @traced("mcp.server_call")
+    async def _call_server(self, entry: Dict[str, Any], tool_name: str, arguments: dict) -> Any:
         config = entry["config"]
+        SUBPROCESS_SPAWNS.inc(server=config["id"], purpose="call_tool")
         params = StdioServerParameters(
             command=sys.executable,
             args=[config["script"]],
-            cwd=config.get("cwd", os.getcwd())
+            cwd=config.get("cwd", os.getcwd()),
+            env=self._server_env()
         )
 
         async with stdio_client(params) as (read, write):
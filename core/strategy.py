@@ -1,11 +1,16 @@
 # modules/strategy.py
 
-from typing import List, Optional, Any
+import asyncio
+import re
+from typing import Any, Callable, Dict, List, Optional
 from modules.perception import PerceptionResult
 from modules.memory import MemoryItem
 from modules.model_manager import ModelManager
 from core.context import AgentContext
 from modules.tools import filter_tools_by_hint, summarize_tools, load_prompt
+from modules import decision
+from modules.action import plan_compiler
+from modules.plan_compiler import PlanValidationError
 
 # Optional fallback logger
 try:
@@ -210,3 +215,119 @@ def find_recent_successful_tools(memory_items: List[MemoryItem], limit: int = 5)
             break
 
     return successful_tools
+
+
+# === SPECULATIVE PLANNING ===
+SOLVE_PATTERN = re.compile(r"^\s*(async\s+)?def\s+solve\s*\(", re.MULTILINE)
+
+
+def is_valid_plan(plan: str) -> bool:
+    """Static check: a solve() that passes plan validation (no tool I/O)"""
+    if not isinstance(plan, str) or not SOLVE_PATTERN.search(plan):
+        return False
+    try:
+        plan_compiler.compile(plan)
+        return True
+    except PlanValidationError:
+        return False
+
+
+class SpeculativePlanBatch:
+    """
+    Candidate plans generated concurrently for one planning input.
+
+    next_valid() hands out valid plans in completion order: the first call
+    returns as soon as any candidate passes validation, later calls (lifeline
+    retries) get the remaining candidates, usually already finished.
+    """
+
+    def __init__(self, coros: List[Any], validate: Callable[[str], bool] = is_valid_plan):
+        self._validate = validate
+        self._queue: asyncio.Queue = asyncio.Queue()
+        self._seen = set()
+        self._pending = len(coros)
+        self._exhausted = False
+        self.last_raw: Optional[str] = None
+        self.stats = {"candidates": len(coros), "valid": 0, "invalid": 0, "duplicates": 0, "errors": 0}
+
+        self._tasks = [asyncio.ensure_future(coro) for coro in coros]
+        for task in self._tasks:
+            task.add_done_callback(self._on_done)
+        if not self._tasks:
+            self._queue.put_nowait(None)
+
+    def _on_done(self, task: asyncio.Future):
+        self._pending -= 1
+        if not task.cancelled():
+            if task.exception() is not None:
+                self.stats["errors"] += 1
+            else:
+                plan = task.result()
+                self.last_raw = plan
+                if not self._validate(plan):
+                    self.stats["invalid"] += 1
+                elif plan.strip() in self._seen:
+                    self.stats["duplicates"] += 1  # an identical plan would fail the same way
+                else:
+                    self._seen.add(plan.strip())
+                    self.stats["valid"] += 1
+                    self._queue.put_nowait(plan)
+        if self._pending == 0:
+            self._queue.put_nowait(None)
+
+    async def next_valid(self) -> Optional[str]:
+        """Next valid plan, or None when no candidate is left"""
+        if self._exhausted:
+            return None
+        plan = await self._queue.get()
+        if plan is None:
+            self._exhausted = True
+        return plan
+
+    def cancel(self):
+        for task in self._tasks:
+            task.cancel()
+
+
+class SpeculativePlanner:
+    """
+    Exploratory/parallel planning: N candidate plans at once, across the
+    configured temperatures and models; the first valid one runs and the rest
+    are kept as ready fallbacks for later lifelines.
+    """
+
+    def __init__(self, strategy: Any):
+        self.candidates = max(1, strategy.speculative_plans)
+        self.temperatures = strategy.speculative_temperatures or [None]
+        self.model_keys = strategy.speculative_models or [None]
+        self._models: Dict[Optional[str], Any] = {}
+
+    @staticmethod
+    def enabled_for(strategy: Any) -> bool:
+        return (
+            strategy.planning_mode == "exploratory"
+            and strategy.exploration_mode == "parallel"
+            and strategy.speculative_plans > 1
+        )
+
+    def _model(self, key: Optional[str]) -> Any:
+        if key is None:
+            return None  # decision module's default model
+        if key not in self._models:
+            self._models[key] = ModelManager(model_key=key)
+        return self._models[key]
+
+    def start(self, **plan_kwargs) -> SpeculativePlanBatch:
+        """Launch all candidates; plan_kwargs are passed to modules.decision.generate_plan"""
+        coros = []
+        for index in range(self.candidates):
+            temperature = self.temperatures[index % len(self.temperatures)]
+            model_key = self.model_keys[index % len(self.model_keys)]
+            coros.append(decision.generate_plan(
+                **plan_kwargs,
+                model_manager=self._model(model_key),
+                temperature=temperature,
+            ))
+        log("strategy", f"🔀 Speculative planning: {self.candidates} candidates "
+                        f"(temperatures={self.temperatures}, models={self.model_keys})")
+        return SpeculativePlanBatch(coros)
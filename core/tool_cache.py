@@ -0,0 +1,121 @@
+# core/tool_cache.py
+
+import json
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+
+class ToolResultCache:
+    """
+    Session-scoped cache of idempotent tool results.
+
+    Keyed on (session_id, tool_name, canonicalized arguments). Only tools that
+    declare themselves idempotent in profiles.yaml (`idempotent_tools`, with an
+    optional TTL in seconds) are cached; everything else always goes to the server.
+    Servers that report failures as ordinary text list those texts' prefixes in
+    `failure_markers`; such results are never cached, so a retry reaches the server.
+    """
+
+    def __init__(
+        self,
+        policies: Optional[Dict[str, Optional[float]]] = None,
+        max_entries_per_session: int = 256,
+        max_sessions: int = 64,
+        failure_markers: Optional[Dict[str, List[str]]] = None,
+    ):
+        self.policies = policies or {}  # tool_name → ttl seconds (None = whole session)
+        self.failure_markers = failure_markers or {}  # tool_name → prefixes of failure payloads
+        self.max_entries_per_session = max_entries_per_session
+        self.max_sessions = max_sessions
+        self._sessions: "OrderedDict[str, OrderedDict[str, Tuple[float, Any]]]" = OrderedDict()
+        self.stats = {"hits": 0, "misses": 0, "expired": 0, "evictions": 0}
+
+    @classmethod
+    def from_server_configs(cls, server_configs: List[dict], **kwargs) -> "ToolResultCache":
+        """Collect `idempotent_tools` declarations from every MCP server config"""
+        policies = {}
+        failure_markers = {}
+        for config in server_configs:
+            for tool_name, ttl in (config.get("idempotent_tools") or {}).items():
+                policies[tool_name] = ttl
+                failure_markers[tool_name] = list(config.get("failure_markers") or [])
+        return cls(policies, failure_markers=failure_markers, **kwargs)
+
+    @staticmethod
+    def canonical_key(tool_name: str, arguments: Any) -> str:
+        """Stable key: argument order and whitespace do not matter"""
+        return f"{tool_name}:{json.dumps(arguments, sort_keys=True, separators=(',', ':'), default=str)}"
+
+    def is_cacheable(self, tool_name: str) -> bool:
+        return tool_name in self.policies
+
+    @staticmethod
+    def _payload_texts(result: Any) -> List[str]:
+        """Text of each content item, unwrapped from the JSON of structured outputs ({"result": ...})"""
+        texts = []
+        for item in getattr(result, "content", None) or []:
+            text = getattr(item, "text", None)
+            if not isinstance(text, str):
+                continue
+            try:
+                value = json.loads(text)
+            except ValueError:
+                value = text
+            if isinstance(value, dict):
+                texts.extend(v for v in value.values() if isinstance(v, str))
+            elif isinstance(value, str):
+                texts.append(value)
+        return texts
+
+    def is_failure(self, tool_name: str, result: Any) -> bool:
+        """isError, or a payload starting with one of the tool's failure markers"""
+        if getattr(result, "isError", False):
+            return True
+        markers = tuple(self.failure_markers.get(tool_name) or ())
+        return bool(markers) and any(text.lstrip().startswith(markers) for text in self._payload_texts(result))
+
+    def get(self, session_id: str, tool_name: str, arguments: Any) -> Tuple[bool, Any]:
+        """Return (hit, result)"""
+        entries = self._sessions.get(session_id)
+        key = self.canonical_key(tool_name, arguments)
+        if entries is None or key not in entries:
+            self.stats["misses"] += 1
+            return False, None
+
+        stored_at, result = entries[key]
+        ttl = self.policies.get(tool_name)
+        if ttl is not None and time.time() - stored_at > ttl:
+            del entries[key]
+            self.stats["expired"] += 1
+            self.stats["misses"] += 1
+            return False, None
+
+        entries.move_to_end(key)
+        self._sessions.move_to_end(session_id)
+        self.stats["hits"] += 1
+        return True, result
+
+    def put(self, session_id: str, tool_name: str, arguments: Any, result: Any):
+        entries = self._sessions.get(session_id)
+        if entries is None:
+            entries = OrderedDict()
+            self._sessions[session_id] = entries
+            while len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+        self._sessions.move_to_end(session_id)
+
+        entries[self.canonical_key(tool_name, arguments)] = (time.time(), result)
+        while len(entries) > self.max_entries_per_session:
+            entries.popitem(last=False)
+            self.stats["evictions"] += 1
+
+    def clear_session(self, session_id: str):
+        self._sessions.pop(session_id, None)
+
+    def get_stats(self) -> Dict[str, int]:
+        return {
+            **self.stats,
+            "sessions": len(self._sessions),
+            "entries": sum(len(entries) for entries in self._sessions.values())
+        }
@@ -0,0 +1,206 @@
+# core/tool_registry.py
+
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional
+
+import numpy as np
+
+from modules.prompts import estimate_tokens
+
+
+# Optional logging fallback
+try:
+    from agent import log
+except ImportError:
+    import datetime
+    def log(stage: str, msg: str):
+        now = datetime.datetime.now().strftime("%H:%M:%S")
+        print(f"[{now}] [{stage}] {msg}")
+
+
+QUERY_EMBEDDING_CACHE_SIZE = 128
+EMBEDDING_RETRY_SECONDS = 30  # minimum gap between attempts to embed tools that failed
+
+
+class ToolRegistry:
+    """
+    Tool catalog built once when MultiMCP initializes.
+
+    Holds each tool's prompt summary line and description embedding, so planning
+    prompts can include only the tools most relevant to the query, within a
+    token budget, instead of re-summarizing the whole catalog every step.
+    """
+
+    def __init__(self, server_tools: Dict[str, List[Any]], embed_fn: Optional[Callable[[str], Any]] = None):
+        self._embed_fn = embed_fn
+        self.tools: Dict[str, Any] = {}
+        self.tool_servers: Dict[str, str] = {}
+        self.summary_lines: Dict[str, str] = {}
+        self.token_costs: Dict[str, int] = {}
+        self.embeddings: Dict[str, np.ndarray] = {}  # tool name → unit vector (only successful embeddings)
+        self._query_cache: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self._build_lock = asyncio.Lock()
+        self._last_build: Optional[float] = None
+
+        for server_id, tools in server_tools.items():
+            for tool in tools:
+                line = f"- {tool.name}: {getattr(tool, 'description', 'No description provided.')}"
+                self.tools[tool.name] = tool
+                self.tool_servers[tool.name] = server_id
+                self.summary_lines[tool.name] = line
+                self.token_costs[tool.name] = estimate_tokens(line)
+
+    def _get_embed_fn(self) -> Callable[[str], Any]:
+        if self._embed_fn is None:
+            from modules.memory import get_embedding
+            self._embed_fn = get_embedding
+        return self._embed_fn
+
+    @staticmethod
+    def _unit(vector: Any) -> np.ndarray:
+        vector = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    @classmethod
+    def _usable(cls, vector: Any) -> Optional[np.ndarray]:
+        """Unit vector, or None for a failed embedding (get_embedding returns zeros when the embedder is down)"""
+        if vector is None:
+            return None
+        vector = np.asarray(vector, dtype=np.float32)
+        if vector.size == 0 or not np.all(np.isfinite(vector)) or not np.any(vector):
+            return None
+        return cls._unit(vector)
+
+    @property
+    def complete(self) -> bool:
+        return len(self.embeddings) == len(self.tools)
+
+    @staticmethod
+    def document_text(tool: Any) -> str:
+        return f"{tool.name}: {getattr(tool, 'description', '') or ''}"
+
+    async def build_embeddings(self):
+        """
+        Embed the tool descriptions that have no embedding yet (blocking calls run
+        in a thread). Failed embeddings are not stored, so they are retried by
+        ensure_embeddings() instead of ranking those tools as unrelated forever.
+        """
+        async with self._build_lock:
+            embed = self._get_embed_fn()
+            names = [name for name in self.tools if name not in self.embeddings]
+            self._last_build = time.monotonic()
+
+            def embed_all():
+                vectors = []
+                for name in names:
+                    try:
+                        vectors.append(embed(self.document_text(self.tools[name])))
+                    except Exception:
+                        vectors.append(None)
+                return vectors
+
+            vectors = await asyncio.to_thread(embed_all)
+            for name, vector in zip(names, vectors):
+                vector = self._usable(vector)
+                if vector is not None:
+                    self.embeddings[name] = vector
+
+            missing = len(self.tools) - len(self.embeddings)
+            if missing:
+                log("registry", f"⚠️ Indexed {len(self.embeddings)} tool descriptions, {missing} failed (will retry)")
+            else:
+                log("registry", f"📇 Indexed {len(self.embeddings)} tool descriptions")
+
+    async def ensure_embeddings(self):
+        """Retry tools whose embedding failed, at most every EMBEDDING_RETRY_SECONDS"""
+        if self.complete or self._build_lock.locked():
+            return
+        if self._last_build is not None and time.monotonic() - self._last_build < EMBEDDING_RETRY_SECONDS:
+            return
+        await self.build_embeddings()
+
+    def embed_query_sync(self, query: str) -> np.ndarray:
+        """
+        Query embedding, cached so routing and tool selection share one call.
+        A failed embedding comes back as zeros (callers treat that as "no
+        embedding") and is not cached, so the next call tries again.
+        """
+        cached = self._query_cache.get(query)
+        if cached is not None:
+            self._query_cache.move_to_end(query)
+            return cached
+
+        vector = self._usable(self._get_embed_fn()(query))
+        if vector is None:
+            return np.zeros(1, dtype=np.float32)
+        self._query_cache[query] = vector
+        while len(self._query_cache) > QUERY_EMBEDDING_CACHE_SIZE:
+            self._query_cache.popitem(last=False)
+        return vector
+
+    async def embed_query(self, query: str) -> np.ndarray:
+        if query in self._query_cache:
+            return self.embed_query_sync(query)
+        return await asyncio.to_thread(self.embed_query_sync, query)
+
+    def rank(self, query_vec: np.ndarray, tools: List[Any]) -> List[tuple]:
+        """(tool, similarity) sorted best first; unknown/unembedded tools score 0"""
+        scored = []
+        for tool in tools:
+            vector = self.embeddings.get(tool.name)
+            similarity = float(vector @ query_vec) if vector is not None and np.any(query_vec) else 0.0
+            scored.append((tool, similarity))
+        # Stable sort keeps catalog order when embeddings are unavailable
+        return sorted(scored, key=lambda item: item[1], reverse=True)
+
+    async def select(
+        self,
+        query: str,
+        tools: List[Any],
+        top_k: int = 8,
+        token_budget: int = 800,
+        hint: Optional[str] = None,
+    ) -> List[Any]:
+        """
+        Most relevant tools for the query, at most top_k, within token_budget.
+
+        Tools whose name matches the perception hint always come first.
+        """
+        try:
+            await self.ensure_embeddings()
+        except Exception as e:
+            log("registry", f"⚠️ Tool embedding retry failed: {e}")
+        try:
+            query_vec = await self.embed_query(query)
+        except Exception as e:
+            log("registry", f"⚠️ Query embedding failed, keeping catalog order: {e}")
+            query_vec = np.zeros(1, dtype=np.float32)
+
+        ranked = [tool for tool, _ in self.rank(query_vec, tools)]
+        if hint:
+            hint_lower = hint.lower()
+            hinted = [tool for tool in ranked if hint_lower in tool.name.lower()]
+            ranked = hinted + [tool for tool in ranked if tool not in hinted]
+
+        selected = []
+        used = 0
+        for tool in ranked:
+            if len(selected) >= top_k:
+                break
+            cost = self.token_costs.get(tool.name) or estimate_tokens(self.document_text(tool))
+            if selected and used + cost > token_budget:
+                continue
+            selected.append(tool)
+            used += cost
+        return selected
+
+    def summarize(self, tools: List[Any]) -> str:
+        """Prompt block for the tools, from precomputed summary lines"""
+        return "\n".join(
+            self.summary_lines.get(tool.name)
+            or f"- {tool.name}: {getattr(tool, 'description', 'No description provided.')}"
+            for tool in tools
+        )
@@ -0,0 +1,252 @@
+# core/tracing.py
+
+import contextvars
+import functools
+import inspect
+import itertools
+import json
+import os
+import threading
+import time
+from collections import deque
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import yaml
+
+
+DEFAULT_TRACING_CONFIG = {
+    "enabled": False,
+    "output_dir": "traces",          # one Chrome trace-event JSON file per query
+    "max_spans_per_trace": 5000,     # spans beyond this are counted in the summary but not exported
+    "summary_window": 1000,          # durations kept per span name for the in-process percentiles
+}
+
+_current_span: contextvars.ContextVar = contextvars.ContextVar("agent_current_span", default=None)
+_span_ids = itertools.count(1)
+
+
+class Span:
+    """One timed operation; children inherit its trace_id"""
+
+    __slots__ = ("name", "trace_id", "span_id", "parent_id", "attrs", "start_ns", "end_ns", "thread_id", "_token")
+
+    def __init__(self, name: str, parent: Optional["Span"], attrs: Dict[str, Any]):
+        self.name = name
+        self.span_id = next(_span_ids)
+        self.parent_id = parent.span_id if parent else None
+        self.trace_id = parent.trace_id if parent else self.span_id
+        self.attrs = attrs
+        self.start_ns = 0
+        self.end_ns = 0
+        self.thread_id = threading.get_ident()
+        self._token = None
+
+    def set(self, **attrs: Any):
+        self.attrs.update(attrs)
+
+    @property
+    def duration_ms(self) -> float:
+        return (self.end_ns - self.start_ns) / 1e6
+
+
+class _SpanContext:
+    """Context manager for a live span (works inside coroutines and threads alike)"""
+
+    __slots__ = ("tracer", "span")
+
+    def __init__(self, tracer: "Tracer", span: Span):
+        self.tracer = tracer
+        self.span = span
+
+    def __enter__(self) -> Span:
+        self.span._token = _current_span.set(self.span)
+        self.span.start_ns = time.perf_counter_ns()
+        return self.span
+
+    def __exit__(self, exc_type, exc, tb):
+        self.span.end_ns = time.perf_counter_ns()
+        if exc_type is not None:
+            self.span.attrs["error"] = exc_type.__name__
+        _current_span.reset(self.span._token)
+        self.tracer._finish(self.span)
+        return False
+
+
+class _NoopSpan:
+    """Shared stand-in when tracing is off: no allocation, no clock reads"""
+
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+    def set(self, **attrs: Any):
+        pass
+
+
+_NOOP = _NoopSpan()
+
+
+class Tracer:
+    """
+    Nested timing spans for the agent loop.
+
+    Spans nest through a contextvar (session → step → lifeline → perception /
+    plan / sandbox → tool calls, embeddings, FAISS, memory saves), so
+    concurrent queries keep separate trees. Finished traces are exported as
+    Chrome trace-event JSON (chrome://tracing, Perfetto); durations per span
+    name feed an in-process summary. When disabled, span() returns a shared
+    no-op and costs one attribute check.
+    """
+
+    def __init__(self, config: Optional[Dict[str, Any]] = None):
+        self.configure(config)
+
+    def configure(self, config: Optional[Dict[str, Any]] = None):
+        config = {**DEFAULT_TRACING_CONFIG, **(config or {})}
+        self.enabled = bool(config["enabled"])
+        self.output_dir = Path(config["output_dir"])
+        self.max_spans_per_trace = config["max_spans_per_trace"]
+        self._lock = threading.Lock()
+        self._traces: Dict[int, List[Span]] = {}  # trace_id → finished spans
+        self._durations: Dict[str, deque] = {}
+        self._totals: Dict[str, List[float]] = {}  # name → [count, total_ms]
+        self._window = config["summary_window"]
+
+    def span(self, name: str, **attrs: Any):
+        """Child of the current span; outside any trace it only feeds the summary"""
+        if not self.enabled:
+            return _NOOP
+        return _SpanContext(self, Span(name, _current_span.get(), attrs))
+
+    def trace(self, name: str, **attrs: Any):
+        """Root span whose subtree is kept until take_trace()"""
+        if not self.enabled:
+            return _NOOP
+        root = Span(name, None, attrs)
+        with self._lock:
+            self._traces[root.trace_id] = []
+        return _SpanContext(self, root)
+
+    def current(self) -> Optional[Span]:
+        return _current_span.get() if self.enabled else None
+
+    def _finish(self, span: Span):
+        duration = span.duration_ms
+        with self._lock:
+            spans = self._traces.get(span.trace_id)  # None once taken, or outside any trace
+            if spans is not None and len(spans) < self.max_spans_per_trace:
+                spans.append(span)
+            samples = self._durations.get(span.name)
+            if samples is None:
+                samples = self._durations[span.name] = deque(maxlen=self._window)
+                self._totals[span.name] = [0, 0.0]
+            samples.append(duration)
+            self._totals[span.name][0] += 1
+            self._totals[span.name][1] += duration
+
+    # === Export ===
+
+    def take_trace(self, trace_id: int) -> List[Span]:
+        """Remove and return a finished trace's spans"""
+        with self._lock:
+            return self._traces.pop(trace_id, [])
+
+    @staticmethod
+    def to_chrome_events(spans: List[Span]) -> List[Dict[str, Any]]:
+        pid = os.getpid()
+        origin = min((span.start_ns for span in spans), default=0)
+        return [
+            {
+                "name": span.name,
+                "cat": "agent",
+                "ph": "X",
+                "ts": (span.start_ns - origin) / 1000,   # microseconds
+                "dur": (span.end_ns - span.start_ns) / 1000,
+                "pid": pid,
+                "tid": span.thread_id,
+                "args": {"span_id": span.span_id, "parent_id": span.parent_id,
+                         **{key: str(value)[:200] for key, value in span.attrs.items()}},
+            }
+            for span in sorted(spans, key=lambda span: span.start_ns)
+        ]
+
+    def export(self, spans: List[Span], label: str = "trace") -> Optional[Path]:
+        """Write spans (see take_trace) as Chrome trace-event JSON; returns the file path"""
+        if not spans:
+            return None
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        safe_label = "".join(ch if ch.isalnum() or ch in "-_" else "_" for ch in label)
+        path = self.output_dir / f"{time.strftime('%Y%m%d-%H%M%S')}-{safe_label}.json"
+        path.write_text(json.dumps({"traceEvents": self.to_chrome_events(spans), "displayTimeUnit": "ms"}))
+        return path
+
+    @staticmethod
+    def breakdown(spans: List[Span]) -> Dict[str, Dict[str, float]]:
+        """Count and total milliseconds per span name within one trace"""
+        result: Dict[str, Dict[str, float]] = {}
+        for span in spans:
+            entry = result.setdefault(span.name, {"count": 0, "total_ms": 0.0})
+            entry["count"] += 1
+            entry["total_ms"] = round(entry["total_ms"] + span.duration_ms, 2)
+        return result
+
+    def summary(self) -> Dict[str, Dict[str, Any]]:
+        """Per span name: count and total since start, percentiles over the recent window"""
+        with self._lock:
+            snapshot = {name: (list(samples), *self._totals[name]) for name, samples in self._durations.items()}
+        result = {}
+        for name, (samples, count, total) in snapshot.items():
+            ordered = sorted(samples)
+            pick = lambda q: round(ordered[min(len(ordered) - 1, int(q * len(ordered)))], 2)
+            result[name] = {
+                "count": count,
+                "total_ms": round(total, 2),
+                "p50_ms": pick(0.50),
+                "p95_ms": pick(0.95),
+                "max_ms": round(ordered[-1], 2),
+            }
+        return result
+
+
+def traced(name: str):
+    """Decorator: run the function (sync or async) inside a span"""
+    def decorator(func):
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                if not tracer.enabled:
+                    return await func(*args, **kwargs)
+                with tracer.span(name):
+                    return await func(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not tracer.enabled:
+                return func(*args, **kwargs)
+            with tracer.span(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def _load_config() -> Dict[str, Any]:
+    """profiles.yaml `tracing:`; AGENT_TRACE=1/0 overrides `enabled`"""
+    config: Dict[str, Any] = {}
+    try:
+        with open(os.getenv("AGENT_PROFILE_PATH", "config/profiles.yaml"), "r") as f:
+            config = dict((yaml.safe_load(f) or {}).get("tracing") or {})
+    except OSError:
+        pass
+    override = os.getenv("AGENT_TRACE")
+    if override is not None:
+        config["enabled"] = override.strip().lower() in ("1", "true", "yes", "on")
+    return config
+
+
+tracer = Tracer(_load_config())
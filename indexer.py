@@ -0,0 +1,413 @@
+# indexer.py
+#
+# Builds the document index searched by mcp_server_2.py, outside the server process.
+#
+#   python indexer.py                    (index documents/ → faiss_index/snapshots/<version>/)
+#   python indexer.py --rebuild          (re-extract and re-embed everything)
+#   python indexer.py --keep 5           (snapshots kept on disk, newest first)
+#   python indexer.py --watch            (stay running; re-index changed files as they change)
+#
+# Every run that changes something writes a complete, immutable snapshot
+# (index.bin, metadata.json, manifest.json) and then swaps faiss_index/LATEST to
+# point at it, so a server never sees a half-written index. Unchanged documents
+# reuse their vectors from the previous snapshot; changed documents have their
+# chunks replaced and deleted documents are dropped.
+#
+# Watch mode uses watchdog (inotify/FSEvents/ReadDirectoryChangesW) when it is
+# installed and falls back to polling file sizes and mtimes. Bursts of events are
+# debounced, and only the affected files are re-checked.
+#
+# Extracted markdown is kept in a content-addressed cache (core/extract_cache.py):
+# a re-indexed PDF only re-extracts and re-captions the pages that changed.
+#
+# Before the first snapshot exists the server keeps reading the legacy
+# faiss_index/index.bin + metadata.json, and the first run starts from them.
+
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import sys
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from core.extract_cache import extract_cache
+
+ROOT = Path(__file__).parent.resolve()
+DOC_PATH = ROOT / "documents"
+INDEX_DIR = ROOT / "faiss_index"
+SNAPSHOT_DIR = INDEX_DIR / "snapshots"
+LATEST_FILE = INDEX_DIR / "LATEST"
+LEGACY_CACHE_FILE = INDEX_DIR / "doc_index_cache.json"
+
+
+def log(level: str, message: str) -> None:
+    sys.stderr.write(f"{level}: {message}\n")
+    sys.stderr.flush()
+
+
+# === Snapshot layout (shared with mcp_server_2) ===
+
+def latest_snapshot(index_dir: Path = INDEX_DIR) -> Optional[Path]:
+    """Directory of the current snapshot, or None when only the legacy layout (or nothing) exists"""
+    try:
+        version = (index_dir / "LATEST").read_text(encoding="utf-8").strip()
+    except OSError:
+        return None
+    path = index_dir / "snapshots" / version
+    return path if version and (path / "index.bin").exists() else None
+
+
+def index_files(index_dir: Path = INDEX_DIR) -> Tuple[Path, Path]:
+    """(index.bin, metadata.json) to serve: the latest snapshot, else the legacy files"""
+    folder = latest_snapshot(index_dir) or index_dir
+    return folder / "index.bin", folder / "metadata.json"
+
+
+def file_hash(path: Path) -> str:
+    return hashlib.md5(path.read_bytes()).hexdigest()
+
+
+# === Building ===
+
+def load_base(rebuild: bool = False):
+    """(faiss index or None, metadata rows, manifest documents) of the index being updated"""
+    import faiss
+
+    if rebuild:
+        return None, [], {}
+    snapshot = latest_snapshot()
+    if snapshot is not None:
+        manifest = json.loads((snapshot / "manifest.json").read_text(encoding="utf-8"))
+        metadata = json.loads((snapshot / "metadata.json").read_text(encoding="utf-8"))
+        return faiss.read_index(str(snapshot / "index.bin")), metadata, manifest["documents"]
+
+    # Legacy layout: hashes from doc_index_cache.json, chunk counts from the metadata
+    index_path, meta_path = INDEX_DIR / "index.bin", INDEX_DIR / "metadata.json"
+    if not (index_path.exists() and meta_path.exists()):
+        return None, [], {}
+    metadata = json.loads(meta_path.read_text(encoding="utf-8"))
+    hashes = json.loads(LEGACY_CACHE_FILE.read_text(encoding="utf-8")) if LEGACY_CACHE_FILE.exists() else {}
+    return faiss.read_index(str(index_path)), metadata, {name: {"hash": value} for name, value in hashes.items()}
+
+
+def extract_markdown(file: Path) -> str:
+    import mcp_server_2 as documents
+
+    ext = file.suffix.lower()
+    if ext == ".pdf":
+        log("INFO", f"Using MuPDF4LLM to extract {file.name}")
+        return documents.pdf_to_markdown(str(file))
+    if ext == ".url":
+        log("INFO", f"Using Trafilatura to fetch {file.name}")
+        return documents.webpage_to_markdown(file.read_text(encoding="utf-8").strip())
+    if ext in (".html", ".htm"):
+        log("INFO", f"Using Trafilatura to extract {file.name}")
+        return documents.html_to_markdown(file.read_text(encoding="utf-8", errors="replace"))
+
+    # Fallback to MarkItDown for other formats
+    key = extract_cache.key("markitdown", file.read_bytes())
+    cached = extract_cache.get(key, kind="markitdown")
+    if cached is not None:
+        return cached
+    from markitdown import MarkItDown
+    log("INFO", f"Using MarkItDown fallback for {file.name}")
+    markdown = MarkItDown().convert(str(file)).text_content
+    extract_cache.put(key, markdown)
+    return markdown
+
+
+def embed_document(file: Path) -> Tuple[List[Any], List[Dict[str, Any]]]:
+    """Extract, chunk and embed one document: (vectors, metadata rows)"""
+    import mcp_server_2 as documents
+    from tqdm import tqdm
+
+    markdown = extract_markdown(file)
+    if not markdown.strip():
+        log("WARN", f"No content extracted from {file.name}")
+        return [], []
+
+    if len(markdown.split()) < 10:
+        log("WARN", f"Content too short for semantic merge in {file.name} → Skipping chunking.")
+        chunks = [markdown.strip()]
+    else:
+        log("INFO", f"Running semantic merge on {file.name} with {len(markdown.split())} words")
+        chunks = documents.semantic_merge(markdown)
+
+    vectors, rows = [], []
+    for i, chunk in enumerate(tqdm(chunks, desc=f"Embedding {file.name}")):
+        vectors.append(documents.get_embedding(chunk))
+        rows.append({"doc": file.name, "chunk": chunk, "chunk_id": f"{file.stem}_{i}"})
+    return vectors, rows
+
+
+def build_snapshot(rebuild: bool = False, only: Optional[Set[str]] = None) -> Optional[Path]:
+    """
+    Index documents/ into a new snapshot; None when nothing changed.
+
+    A document whose size and mtime match the manifest counts as unchanged
+    without being read; otherwise it is hashed, and re-extracted only when the
+    hash differs. `only` restricts the check to those file names (watch mode);
+    every other indexed document is carried over as is.
+    """
+    import faiss
+    import numpy as np
+
+    base_index, base_metadata, base_documents = load_base(rebuild)
+    base_vectors = base_index.reconstruct_n(0, base_index.ntotal) if base_index is not None and base_index.ntotal else []
+    rows_by_doc: Dict[str, List[int]] = {}
+    for position, row in enumerate(base_metadata[:len(base_vectors)]):
+        rows_by_doc.setdefault(row["doc"], []).append(position)
+
+    files = sorted(path for path in DOC_PATH.glob("*.*") if path.is_file())
+    documents: Dict[str, Dict[str, Any]] = {}
+    parts: Dict[str, Tuple[List[Any], List[Dict[str, Any]]]] = {}
+    changed = False
+    refreshed = False  # content unchanged but size/mtime moved (touch, copy): only the manifest needs updating
+
+    def reuse(name: str, previous: Dict[str, Any], stat: Optional[os.stat_result] = None):
+        positions = rows_by_doc.get(name, [])
+        parts[name] = ([base_vectors[p] for p in positions], [base_metadata[p] for p in positions])
+        documents[name] = {
+            "hash": previous["hash"],
+            "size": stat.st_size if stat else previous.get("size"),
+            "mtime_ns": stat.st_mtime_ns if stat else previous.get("mtime_ns"),
+            "chunks": len(positions),
+        }
+
+    for file in files:
+        name = file.name
+        previous = base_documents.get(name)
+        if previous and only is not None and name not in only:
+            reuse(name, previous)
+            continue
+
+        stat = file.stat()  # before reading, so an edit during extraction is picked up next time
+        if previous and (previous.get("size"), previous.get("mtime_ns")) == (stat.st_size, stat.st_mtime_ns):
+            reuse(name, previous)
+            continue
+
+        fhash = file_hash(file)
+        if previous and previous.get("hash") == fhash:
+            log("SKIP", f"Skipping unchanged file: {name}")
+            reuse(name, previous, stat)
+            refreshed = True
+            continue
+
+        log("PROC", f"Processing: {name}")
+        try:
+            parts[name] = embed_document(file)
+            documents[name] = {"hash": fhash, "size": stat.st_size, "mtime_ns": stat.st_mtime_ns,
+                               "chunks": len(parts[name][1])}
+            changed = True
+        except Exception as e:
+            log("ERROR", f"Failed to process {name}: {e}")
+            if previous:  # keep serving the old chunks; retried on the next run
+                reuse(name, previous)
+
+    removed = set(base_documents) - {file.name for file in files}
+    if removed:
+        log("INFO", f"Dropping deleted documents: {', '.join(sorted(removed))}")
+        changed = True
+    if not changed:
+        current = latest_snapshot()
+        if refreshed and current is not None:
+            refresh_manifest(current, documents)
+            return None
+        if not refreshed:
+            log("INFO", "Index is up to date — no new snapshot written.")
+            return None
+        # Legacy layout has nowhere to keep sizes/mtimes: migrate it into a first snapshot
+
+    vectors = [vector for name in parts for vector in parts[name][0]]
+    metadata = [row for name in parts for row in parts[name][1]]
+    if not vectors:
+        log("WARN", "Nothing to index — no snapshot written.")
+        return None
+
+    matrix = np.stack(vectors).astype(np.float32)
+    index = faiss.IndexFlatL2(matrix.shape[1])
+    index.add(matrix)
+    manifest = {"created": time.time(), "dim": int(matrix.shape[1]), "chunks": len(metadata), "documents": documents}
+    return write_snapshot(index, metadata, manifest)
+
+
+def refresh_manifest(snapshot: Path, documents: Dict[str, Dict[str, Any]]):
+    """Record new sizes/mtimes in place; servers never read manifest.json"""
+    path = snapshot / "manifest.json"
+    manifest = json.loads(path.read_text(encoding="utf-8"))
+    manifest["documents"] = documents
+    staging = path.with_suffix(".tmp")
+    staging.write_text(json.dumps(manifest, indent=2), encoding="utf-8")
+    os.replace(staging, path)
+    log("INFO", f"Snapshot {snapshot.name}: file timestamps refreshed, content unchanged")
+
+
+def write_snapshot(index: Any, metadata: List[Dict[str, Any]], manifest: Dict[str, Any]) -> Path:
+    """Write into a temp dir, rename it into place, then atomically repoint LATEST"""
+    import faiss
+
+    SNAPSHOT_DIR.mkdir(parents=True, exist_ok=True)
+    version = time.strftime("%Y%m%d-%H%M%S")
+    suffix = 1
+    while (SNAPSHOT_DIR / version).exists():
+        version = f"{time.strftime('%Y%m%d-%H%M%S')}-{suffix}"
+        suffix += 1
+    manifest["version"] = version
+
+    staging = SNAPSHOT_DIR / f".{version}.tmp"
+    staging.mkdir()
+    faiss.write_index(index, str(staging / "index.bin"))
+    (staging / "metadata.json").write_text(json.dumps(metadata, indent=2), encoding="utf-8")
+    (staging / "manifest.json").write_text(json.dumps(manifest, indent=2), encoding="utf-8")
+    target = SNAPSHOT_DIR / version
+    os.replace(staging, target)
+
+    pointer = INDEX_DIR / "LATEST.tmp"
+    pointer.write_text(version, encoding="utf-8")
+    os.replace(pointer, LATEST_FILE)
+    log("SAVE", f"Snapshot {version}: {manifest['chunks']} chunks from {len(manifest['documents'])} documents")
+    return target
+
+
+def prune_snapshots(keep: int):
+    """Remove all but the newest `keep` snapshots (never the one LATEST points at)"""
+    current = latest_snapshot()
+    snapshots = sorted((path for path in SNAPSHOT_DIR.glob("*") if path.is_dir() and not path.name.startswith(".")),
+                       reverse=True)
+    for path in snapshots[max(keep, 1):]:
+        if path != current:
+            shutil.rmtree(path, ignore_errors=True)
+            log("INFO", f"Removed old snapshot {path.name}")
+
+
+# === Watch mode ===
+
+class ChangeQueue:
+    """File names reported changed, released once no new change arrived for `debounce` seconds"""
+
+    def __init__(self, debounce: float):
+        self.debounce = debounce
+        self._pending: Set[str] = set()
+        self._last_change = 0.0
+        self._lock = threading.Lock()
+
+    def add(self, name: str):
+        with self._lock:
+            self._pending.add(name)
+            self._last_change = time.monotonic()
+
+    def drain(self) -> Set[str]:
+        with self._lock:
+            if not self._pending or time.monotonic() - self._last_change < self.debounce:
+                return set()
+            batch, self._pending = self._pending, set()
+            return batch
+
+
+def start_observer(queue: ChangeQueue):
+    """watchdog observer feeding the queue, or None when watchdog is not installed"""
+    try:
+        from watchdog.events import FileSystemEventHandler
+        from watchdog.observers import Observer
+    except ImportError:
+        return None
+
+    class Handler(FileSystemEventHandler):
+        def on_any_event(self, event):
+            if event.is_directory:
+                return
+            for path in (event.src_path, getattr(event, "dest_path", "")):
+                # Only top-level files: documents/images/ churns while PDFs are extracted
+                if path and Path(path).parent == DOC_PATH:
+                    queue.add(Path(path).name)
+
+    observer = Observer()
+    observer.schedule(Handler(), str(DOC_PATH), recursive=False)
+    observer.start()
+    return observer
+
+
+def scan_stats() -> Dict[str, Tuple[int, int]]:
+    """(size, mtime_ns) per top-level document: the polling fallback's change signal"""
+    stats = {}
+    for path in DOC_PATH.glob("*.*"):
+        try:
+            if path.is_file():
+                stat = path.stat()
+                stats[path.name] = (stat.st_size, stat.st_mtime_ns)
+        except OSError:
+            continue  # removed between glob and stat
+    return stats
+
+
+def prune_extract_cache(max_mb: float):
+    removed = extract_cache.prune(int(max_mb * 1024 * 1024))
+    if removed:
+        log("INFO", f"Evicted {removed} extraction cache entries (limit {max_mb:g} MB)")
+
+
+def watch(keep: int, debounce: float, poll_interval: float, force_polling: bool = False,
+          rebuild: bool = False, extract_cache_mb: float = 1024):
+    build_snapshot(rebuild=rebuild)
+    prune_snapshots(keep)
+    prune_extract_cache(extract_cache_mb)
+
+    queue = ChangeQueue(debounce)
+    observer = None if force_polling else start_observer(queue)
+    log("INFO", f"Watching {DOC_PATH} " + ("with watchdog" if observer else f"by polling every {poll_interval:g}s"))
+
+    seen = scan_stats()
+    next_poll = time.monotonic() + poll_interval
+    try:
+        while True:
+            time.sleep(min(0.5, debounce, poll_interval))
+            if observer is None and time.monotonic() >= next_poll:
+                current = scan_stats()
+                for name in set(seen) | set(current):
+                    if seen.get(name) != current.get(name):
+                        queue.add(name)
+                seen = current
+                next_poll = time.monotonic() + poll_interval
+
+            batch = queue.drain()
+            if batch:
+                log("INFO", f"Changed: {', '.join(sorted(batch))}")
+                if build_snapshot(only=batch) is not None:
+                    prune_snapshots(keep)
+                    prune_extract_cache(extract_cache_mb)
+    except KeyboardInterrupt:
+        log("INFO", "Stopped watching.")
+    finally:
+        if observer is not None:
+            observer.stop()
+            observer.join()
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Index documents/ into versioned FAISS snapshots for mcp_server_2")
+    parser.add_argument("--rebuild", action="store_true", help="ignore the previous snapshot and re-embed everything")
+    parser.add_argument("--keep", type=int, default=3, help="snapshots to keep on disk")
+    parser.add_argument("--watch", action="store_true", help="keep running and index changes incrementally")
+    parser.add_argument("--debounce", type=float, default=2.0, help="seconds of quiet before a burst of changes is indexed")
+    parser.add_argument("--poll-interval", type=float, default=5.0, help="scan interval when watchdog is unavailable")
+    parser.add_argument("--polling", action="store_true", help="poll even if watchdog is installed (network drives)")
+    parser.add_argument("--extract-cache-mb", type=float, default=1024, help="size limit of the extracted-markdown cache")
+    args = parser.parse_args(argv)
+
+    if args.watch:
+        watch(args.keep, args.debounce, args.poll_interval, force_polling=args.polling,
+              rebuild=args.rebuild, extract_cache_mb=args.extract_cache_mb)
+        return
+
+    build_snapshot(rebuild=args.rebuild)
+    if SNAPSHOT_DIR.exists():
+        prune_snapshots(args.keep)
+    prune_extract_cache(args.extract_cache_mb)
+
+
+if __name__ == "__main__":
+    main()
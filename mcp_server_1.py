@@ -2,20 +2,12 @@ from mcp.server.fastmcp import FastMCP, Image
 from mcp.server.fastmcp.prompts import base
 from mcp.types import TextContent
 from mcp import types
-from PIL import Image as PILImage
 import math
 import sys
 import os
 import json
-import faiss
-import numpy as np
 from pathlib import Path
-import requests
-import subprocess
-import sqlite3
-from io import StringIO
-from tqdm import tqdm
-import hashlib
+from core.profiling import profile_run
 
 # Models
 from models import (
@@ -119,6 +111,7 @@ def mine(input: MineInput) -> MineOutput:
 def create_thumbnail(input: CreateThumbnailInput) -> ImageOutput:
     """Create a 100x100 thumbnail from image. Usage: input={"input": {"image_path": "example.jpg"}} result = await mcp.call_tool('create_thumbnail', input)"""
     print("CALLED: create_thumbnail(CreateThumbnailInput) -> ImageOutput")
+    from PIL import Image as PILImage  # only this tool needs Pillow; keeps cold start light
     img = PILImage.open(input.image_path)
     img.thumbnail((100, 100))
     return ImageOutput(data=img.tobytes(), format="png")
@@ -238,5 +231,6 @@ if __name__ == "__main__":
     if len(sys.argv) > 1 and sys.argv[1] == "dev":
         mcp.run()  # Run without transport for dev server
     else:
-        mcp.run(transport="stdio")  # Run with stdio for direct execution
+        with profile_run("mcp_server_1"):
+            mcp.run(transport="stdio")  # Run with stdio for direct execution
         print("\nShutting down...")
@@ -2,32 +2,29 @@ from mcp.server.fastmcp import FastMCP, Image
 from mcp.server.fastmcp.prompts import base
 from mcp.types import TextContent
 from mcp import types
-from PIL import Image as PILImage
 import math
 import sys
 import os
 import json
-import faiss
-import numpy as np
 from pathlib import Path
 import requests
-from markitdown import MarkItDown
 import time
 from models import AddInput, AddOutput, SqrtInput, SqrtOutput, StringsToIntsInput, StringsToIntsOutput, ExpSumInput, ExpSumOutput, PythonCodeInput, PythonCodeOutput, UrlInput, FilePathInput, MarkdownInput, MarkdownOutput, ChunkListOutput, SearchDocumentsInput
-from tqdm import tqdm
 import hashlib
-from pydantic import BaseModel
-import subprocess
-import sqlite3
-import trafilatura
-import pymupdf4llm
 import re
 import base64 # ollama needs base64-encoded-image
+# faiss, numpy, trafilatura and pymupdf4llm are imported inside the
+# functions that use them: the server is spawned per tool call, so module-level imports
+# are paid on every call (budgets: benchmarks/import_budgets.yaml)
+from core.metrics import instrument_tool
+from core.profiling import profile_run
+from indexer import index_files
+from core.extract_cache import extract_cache
 
 
 mcp = FastMCP("Calculator")
 
-EMBED_URL = "http://localhost:11434/api/embeddings"
+EMBED_URL = os.getenv("AGENT_EMBED_URL", "http://localhost:11434/api/embeddings")
 OLLAMA_CHAT_URL = "http://localhost:11434/api/chat"
 OLLAMA_URL = "http://localhost:11434/api/generate"
 EMBED_MODEL = "nomic-embed-text"
@@ -41,7 +38,8 @@ TOP_K = 3  # FAISS top-K matches
 ROOT = Path(__file__).parent.resolve()
 
 
-def get_embedding(text: str) -> np.ndarray:
+def get_embedding(text: str) -> "np.ndarray":
+    import numpy as np
     result = requests.post(EMBED_URL, json={"model": EMBED_MODEL, "prompt": text})
     result.raise_for_status()
     return np.array(result.json()["embedding"], dtype=np.float32)
@@ -97,19 +95,22 @@ Just respond in one word (Yes or No), and do not provide any further explanation
 
 
 @mcp.tool()
+@instrument_tool("documents")
 def search_stored_documents(input: SearchDocumentsInput) -> list[str]:
     """Search documents to get relevant extracts. Usage: input={"input": {"query": "your query"}} result = await mcp.call_tool('search_stored_documents', input)"""
 
-    ensure_faiss_ready()
     query = input.query
     mcp_log("SEARCH", f"Query: {query}")
     try:
-        index = faiss.read_index(str(ROOT / "faiss_index" / "index.bin"))
-        metadata = json.loads((ROOT / "faiss_index" / "metadata.json").read_text())
+        index, metadata = load_index()
+        if index is None:
+            return ["ERROR: No document index yet — run `python indexer.py`"]
         query_vec = get_embedding(query ).reshape(1, -1)
         D, I = index.search(query_vec, k=5)
         results = []
         for idx in I[0]:
+            if idx < 0:
+                continue  # fewer than k chunks indexed
             data = metadata[idx]
             results.append(f"{data['chunk']}\n[Source: {data['doc']}, ID: {data['chunk_id']}]")
         return results
@@ -187,52 +188,129 @@ def replace_images_with_captions(markdown: str) -> str:
 
 
 @mcp.tool()
+@instrument_tool("documents")
 def convert_webpage_url_into_markdown(input: UrlInput) -> MarkdownOutput:
     """Return clean webpage content without Ads, and clutter. Usage: input={{"input": {{"url": "https://example.com"}}}} result = await mcp.call_tool('convert_webpage_url_into_markdown', input)"""
 
+    import trafilatura
     downloaded = trafilatura.fetch_url(input.url)
     if not downloaded:
         return MarkdownOutput(markdown="Failed to download the webpage.")
+    return MarkdownOutput(markdown=html_to_markdown(downloaded))
 
+
+def html_to_markdown(html: str) -> str:
+    key = extract_cache.key("html", html.encode("utf-8", errors="replace"))
+    cached = extract_cache.get(key, kind="html")
+    if cached is not None:
+        return cached
+
+    import trafilatura
     markdown = trafilatura.extract(
-        downloaded,
+        html,
         include_comments=False,
         include_tables=True,
         include_images=True,
         output_format='markdown'
     ) or ""
-
     markdown = replace_images_with_captions(markdown)
-    return MarkdownOutput(markdown=markdown)
+    if is_cacheable(markdown):
+        extract_cache.put(key, markdown)
+    return markdown
+
+
+def webpage_to_markdown(url: str) -> str:
+    """convert_webpage_url_into_markdown for callers outside the tool layer (indexer.py)"""
+    import trafilatura
+    downloaded = trafilatura.fetch_url(url)
+    return html_to_markdown(downloaded) if downloaded else ""
+
 
 @mcp.tool()
+@instrument_tool("documents")
 def extract_pdf(input: FilePathInput) -> MarkdownOutput:
     """Convert PDF to markdown. Usage: input={"input": {"file_path": "documents/sample.pdf"} } result = await mcp.call_tool('extract_pdf', input)"""
 
 
     if not os.path.exists(input.file_path):
         return MarkdownOutput(markdown=f"File not found: {input.file_path}")
+    return MarkdownOutput(markdown=pdf_to_markdown(input.file_path))
 
-    ROOT = Path(__file__).parent.resolve()
-    global_image_dir = ROOT / "documents" / "images"
-    global_image_dir.mkdir(parents=True, exist_ok=True)
 
-    # Actual markdown with relative image paths
-    markdown = pymupdf4llm.to_markdown(
-        input.file_path,
-        write_images=True,
-        image_path=str(global_image_dir)
-    )
+def pdf_to_markdown(file_path: str) -> str:
+    """
+    An identical file returns its cached markdown without being opened; otherwise
+    only pages whose content changed are extracted and captioned again.
+    """
+    data = Path(file_path).read_bytes()
+    file_key = extract_cache.key("pdf", data)
+    cached = extract_cache.get(file_key, kind="pdf")
+    if cached is not None:
+        return cached
 
-    # Re-point image links in the markdown
-    markdown = re.sub(
-        r'!\[\]\((.*?/images/)([^)]+)\)',
-        r'![](images/\2)',
-        markdown.replace("\\", "/")
-    )
+    import pymupdf
+    import pymupdf4llm
 
-    markdown = replace_images_with_captions(markdown)
-    return MarkdownOutput(markdown=markdown)
+    global_image_dir = ROOT / "documents" / "images"
+    global_image_dir.mkdir(parents=True, exist_ok=True)
+
+    pages = []
+    with pymupdf.open(file_path) as doc:
+        # Heading levels come from font sizes across the whole document; scanned once
+        # (to_markdown would rescan per call) and part of every page key, since
+        # editing one page can shift the levels on the others
+        hdr_info = pymupdf4llm.IdentifyHeaders(doc)
+        headers = repr((hdr_info.body_limit, sorted(hdr_info.header_id.items()))).encode()
+
+        for number, page in enumerate(doc):
+            page_key = extract_cache.key("pdf-page", headers, *page_fingerprint(doc, page))
+            markdown = extract_cache.get(page_key, kind="pdf-page")
+            if markdown is None:
+                # Actual markdown with relative image paths
+                markdown = pymupdf4llm.to_markdown(
+                    doc,
+                    pages=[number],
+                    hdr_info=hdr_info,
+                    write_images=True,
+                    image_path=str(global_image_dir)
+                )
+
+                # Re-point image links in the markdown
+                markdown = re.sub(
+                    r'!\[\]\((.*?/images/)([^)]+)\)',
+                    r'![](images/\2)',
+                    markdown.replace("\\", "/")
+                )
+                markdown = replace_images_with_captions(markdown)
+                if is_cacheable(markdown):
+                    extract_cache.put(page_key, markdown)
+            pages.append(markdown)
+
+    markdown = "".join(pages)  # to_markdown's own per-page output is concatenated the same way
+    if is_cacheable(markdown):
+        extract_cache.put(file_key, markdown)
+    return markdown
+
+
+def page_fingerprint(doc, page) -> list[bytes]:
+    """
+    What a page's markdown depends on: its content streams, size, images and form
+    XObjects, external links (rendered as markdown links) and annotation rects
+    (graphics under annotations are skipped). Heading levels are document-wide and
+    keyed separately.
+    """
+    links = [(tuple(link["from"]), link["uri"]) for link in page.get_links() if link.get("uri")]
+    annots = [tuple(annot.rect) for annot in page.annots()]
+    parts = [page.read_contents(), repr(tuple(page.rect)).encode(), repr((links, annots)).encode()]
+    for xref, *_ in page.get_images(full=True) + page.get_xobjects():
+        parts.append(doc.xref_stream_raw(xref) or b"")
+    return parts
+
+
+def is_cacheable(markdown: str) -> bool:
+    """Captioning failures (Ollama down, image missing) must be retried, not cached"""
+    return not any(marker in markdown for marker in (
+        "[Image could not be processed", "[Image file not found", "[No caption returned]"))
 
 
 def semantic_merge(text: str) -> list[str]:
@@ -305,100 +383,25 @@ Keep markdown formatting intact.
 
 
 
-def process_documents():
-    """Process documents and create FAISS index using unified multimodal strategy."""
-    mcp_log("INFO", "Indexing documents with unified RAG pipeline...")
-    ROOT = Path(__file__).parent.resolve()
-    DOC_PATH = ROOT / "documents"
-    INDEX_CACHE = ROOT / "faiss_index"
-    INDEX_CACHE.mkdir(exist_ok=True)
-    INDEX_FILE = INDEX_CACHE / "index.bin"
-    METADATA_FILE = INDEX_CACHE / "metadata.json"
-    CACHE_FILE = INDEX_CACHE / "doc_index_cache.json"
-
-    def file_hash(path):
-        return hashlib.md5(Path(path).read_bytes()).hexdigest()
-
-    CACHE_META = json.loads(CACHE_FILE.read_text()) if CACHE_FILE.exists() else {}
-    metadata = json.loads(METADATA_FILE.read_text()) if METADATA_FILE.exists() else []
-    index = faiss.read_index(str(INDEX_FILE)) if INDEX_FILE.exists() else None
+_loaded_index = {"path": None, "mtime": None, "index": None, "metadata": []}
 
-    for file in DOC_PATH.glob("*.*"):
-        fhash = file_hash(file)
-        if file.name in CACHE_META and CACHE_META[file.name] == fhash:
-            mcp_log("SKIP", f"Skipping unchanged file: {file.name}")
-            continue
 
-        mcp_log("PROC", f"Processing: {file.name}")
-        try:
-            ext = file.suffix.lower()
-            markdown = ""
-
-            if ext == ".pdf":
-                mcp_log("INFO", f"Using MuPDF4LLM to extract {file.name}")
-                markdown = extract_pdf(FilePathInput(file_path=str(file))).markdown
-
-            elif ext in [".html", ".htm", ".url"]:
-                mcp_log("INFO", f"Using Trafilatura to extract {file.name}")
-                markdown = extract_webpage(UrlInput(url=file.read_text().strip())).markdown
-
-            else:
-                # Fallback to MarkItDown for other formats
-                converter = MarkItDown()
-                mcp_log("INFO", f"Using MarkItDown fallback for {file.name}")
-                markdown = converter.convert(str(file)).text_content
-
-            if not markdown.strip():
-                mcp_log("WARN", f"No content extracted from {file.name}")
-                continue
-
-            if len(markdown.split()) < 10:
-                mcp_log("WARN", f"Content too short for semantic merge in {file.name} → Skipping chunking.")
-                chunks = [markdown.strip()]
-            else:
-                mcp_log("INFO", f"Running semantic merge on {file.name} with {len(markdown.split())} words")
-                chunks = semantic_merge(markdown)
-
-
-            embeddings_for_file = []
-            new_metadata = []
-            for i, chunk in enumerate(tqdm(chunks, desc=f"Embedding {file.name}")):
-                embedding = get_embedding(chunk)
-                embeddings_for_file.append(embedding)
-                new_metadata.append({
-                    "doc": file.name,
-                    "chunk": chunk,
-                    "chunk_id": f"{file.stem}_{i}"
-                })
-
-            if embeddings_for_file:
-                if index is None:
-                    dim = len(embeddings_for_file[0])
-                    index = faiss.IndexFlatL2(dim)
-                index.add(np.stack(embeddings_for_file))
-                metadata.extend(new_metadata)
-                CACHE_META[file.name] = fhash
-
-                # ✅ Immediately save index and metadata
-                CACHE_FILE.write_text(json.dumps(CACHE_META, indent=2))
-                METADATA_FILE.write_text(json.dumps(metadata, indent=2))
-                faiss.write_index(index, str(INDEX_FILE))
-                mcp_log("SAVE", f"Saved FAISS index and metadata after processing {file.name}")
-
-        except Exception as e:
-            mcp_log("ERROR", f"Failed to process {file.name}: {e}")
-
-
-
-def ensure_faiss_ready():
-    from pathlib import Path
-    index_path = ROOT / "faiss_index" / "index.bin"
-    meta_path = ROOT / "faiss_index" / "metadata.json"
+def load_index():
+    """(faiss index, metadata) of the latest snapshot written by indexer.py (legacy files before the first one).
+    Never builds or modifies the index; reloads only when the snapshot changes (long-running dev server)."""
+    import faiss
+    index_path, meta_path = index_files()
     if not (index_path.exists() and meta_path.exists()):
-        mcp_log("INFO", "Index not found — running process_documents()...")
-        process_documents()
-    else:
-        mcp_log("INFO", "Index already exists. Skipping regeneration.")
+        return None, []
+    mtime = index_path.stat().st_mtime
+    if _loaded_index["path"] != index_path or _loaded_index["mtime"] != mtime:
+        _loaded_index.update(
+            path=index_path,
+            mtime=mtime,
+            index=faiss.read_index(str(index_path)),
+            metadata=json.loads(meta_path.read_text()),
+        )
+    return _loaded_index["index"], _loaded_index["metadata"]
 
 
 if __name__ == "__main__":
@@ -407,21 +410,7 @@ if __name__ == "__main__":
     if len(sys.argv) > 1 and sys.argv[1] == "dev":
         mcp.run() # Run without transport for dev server
     else:
-        # Start the server in a separate thread
-        import threading
-        server_thread = threading.Thread(target=lambda: mcp.run(transport="stdio"))
-        server_thread.daemon = True
-        server_thread.start()
-        
-        # Wait a moment for the server to start
-        time.sleep(2)
-        
-        # Process documents after server is running
-        process_documents()
-        
-        # Keep the main thread alive
-        try:
-            while True:
-                time.sleep(1)
-        except KeyboardInterrupt:
-            print("\nShutting down...")
+        # Indexing runs separately (python indexer.py); this process only serves snapshots
+        with profile_run("mcp_server_2"):
+            mcp.run(transport="stdio")  # Run with stdio for direct execution
+        print("\nShutting down...")
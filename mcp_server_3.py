@@ -13,6 +13,8 @@ import re
 from pydantic import BaseModel, Field
 from models import SearchInput, UrlInput
 from models import PythonCodeOutput  # Import the models we need
+from core.metrics import instrument_tool
+from core.profiling import profile_run
 
 
 @dataclass
@@ -215,6 +217,7 @@ fetcher = WebContentFetcher()
 
 
 @mcp.tool()
+@instrument_tool("websearch")
 async def duckduckgo_search_results(input: SearchInput, ctx: Context) -> str:
     """Search DuckDuckGo. Usage: input={"input": {"query": "latest AI developments", "max_results": 5} } result = await mcp.call_tool('duckduckgo_search_results', input)"""
     try:
@@ -226,6 +229,7 @@ async def duckduckgo_search_results(input: SearchInput, ctx: Context) -> str:
 
 
 @mcp.tool()
+@instrument_tool("websearch")
 async def download_raw_html_from_url(input: UrlInput, ctx: Context) -> str:
     """Fetch webpage content. Usage: input={"input": {"url": "https://example.com"} } result = await mcp.call_tool('download_raw_html_from_url', input)"""
     return PythonCodeOutput(result=await fetcher.fetch_and_parse(input.url, ctx))
@@ -236,5 +240,6 @@ if __name__ == "__main__":
     if len(sys.argv) > 1 and sys.argv[1] == "dev":
             mcp.run()  # Run without transport for dev server
     else:
-        mcp.run(transport="stdio")  # Run with stdio for direct execution
+        with profile_run("mcp_server_3"):
+            mcp.run(transport="stdio")  # Run with stdio for direct execution
         print("\nShutting down...")
\ No newline at end of file
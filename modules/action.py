@@ -1,10 +1,16 @@
 # modules/action.py
 
-from typing import Dict, Any, Union
+from typing import Dict, Any, List, Optional, Union
 from pydantic import BaseModel
 import asyncio
 import types
 import json
+import re
+import time
+from modules.plan_compiler import PlanCompiler, PlanValidationError
+from modules.sandbox_worker import SandboxWorker, SandboxWorkerPool, format_solve_result
+from core.tracing import traced
+from core.metrics import registry
 
 
 # Optional logging fallback
@@ -23,88 +29,271 @@ class ToolCallResult(BaseModel):
     raw_response: Any
 
 MAX_TOOL_CALLS_PER_PLAN = 5
+MAX_CONCURRENT_TOOL_CALLS_PER_PLAN = 3
+TOOL_CALL_TIMEOUT_SECONDS = 60
+PLAN_TIMEOUT_SECONDS = 120
 
-async def run_python_sandbox(code: str, dispatcher: Any) -> Dict[str, Any]:
+plan_compiler = PlanCompiler(max_tool_calls=MAX_TOOL_CALLS_PER_PLAN)
+
+# Shared pool of pre-warmed workers for isolation: pool (created on first use)
+_worker_pool: Optional[SandboxWorkerPool] = None
+
+
+class ToolCallTimeout(RuntimeError):
+    """A single tool call exceeded its deadline.
+
+    Deliberately not a TimeoutError: since Python 3.11 asyncio.TimeoutError is the
+    builtin, so run_python_sandbox would report it as the whole plan's deadline.
+    """
+
+
+class SandboxMCP:
+    """MCP client exposed to solve() plans as `mcp`; counts and records tool calls."""
+
+    def __init__(
+        self,
+        dispatcher,
+        tool_outputs_tracker,
+        max_concurrency: int = MAX_CONCURRENT_TOOL_CALLS_PER_PLAN,
+        call_timeout: float = TOOL_CALL_TIMEOUT_SECONDS,
+        session_id: Optional[str] = None,
+    ):
+        self.dispatcher = dispatcher
+        self.session_id = session_id
+        self.call_count = 0
+        self.tool_outputs_tracker = tool_outputs_tracker
+        self.call_timeout = call_timeout
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self.tool_calls: List[Dict[str, Any]] = []  # trace: tool, arguments, duration, outcome
+
+    async def call_tool(self, tool_name: str, input_dict: dict):
+        self.call_count += 1
+        if self.call_count > MAX_TOOL_CALLS_PER_PLAN:
+            raise RuntimeError(f"Exceeded max tool calls ({MAX_TOOL_CALLS_PER_PLAN}) in solve() plan.")
+
+        # REAL tool call now (bounded per plan, with a per-call deadline)
+        async with self._semaphore:
+            trace = {"tool": tool_name, "arguments": input_dict, "ok": False}
+            self.tool_calls.append(trace)
+            start = time.perf_counter()
+            try:
+                result = await asyncio.wait_for(
+                    self._dispatch(tool_name, input_dict),
+                    timeout=self.call_timeout
+                )
+                trace["ok"] = not getattr(result, "isError", False)
+            except asyncio.TimeoutError:
+                trace["error"] = "timeout"
+                raise ToolCallTimeout(f"Tool call '{tool_name}' timed out after {self.call_timeout}s")
+            except Exception as e:
+                trace["error"] = str(e)
+                raise
+            finally:
+                trace["duration_ms"] = round((time.perf_counter() - start) * 1000, 1)
+
+        # Track tool output for heuristics
+        try:
+            if hasattr(result, 'content') and result.content:
+                # MCP result format
+                output_text = str(result.content[0].text if result.content else "")
+                self.tool_outputs_tracker.append(output_text)
+            else:
+                self.tool_outputs_tracker.append(str(result))
+        except Exception:
+            pass  # Silently fail if we can't extract output
+
+        return result
+
+    def _dispatch(self, tool_name: str, input_dict: dict):
+        # Pass the session so the dispatcher can serve idempotent tools from its cache
+        if self.session_id is not None:
+            return self.dispatcher.call_tool(tool_name, input_dict, session_id=self.session_id)
+        return self.dispatcher.call_tool(tool_name, input_dict)
+
+    async def call_tools(self, calls: List[Any], return_exceptions: bool = False) -> List[Any]:
+        """
+        Run independent tool calls concurrently.
+
+        Args:
+            calls: List of (tool_name, input_dict) tuples or {"tool": ..., "input": ...} dicts
+            return_exceptions: If True, failed calls return their exception instead of raising
+
+        Returns:
+            Results in the same order as calls
+        """
+        normalized = []
+        for call in calls:
+            if isinstance(call, dict):
+                normalized.append((call["tool"], call.get("input", {})))
+            else:
+                tool_name, input_dict = call
+                normalized.append((tool_name, input_dict))
+
+        if self.call_count + len(normalized) > MAX_TOOL_CALLS_PER_PLAN:
+            raise RuntimeError(f"Exceeded max tool calls ({MAX_TOOL_CALLS_PER_PLAN}) in solve() plan.")
+
+        return await asyncio.gather(
+            *(self.call_tool(tool_name, input_dict) for tool_name, input_dict in normalized),
+            return_exceptions=return_exceptions
+        )
+
+
+@traced("sandbox")
+async def run_python_sandbox(
+    code: str,
+    dispatcher: Any,
+    session_id: Optional[str] = None,
+    limits: Optional[Any] = None,
+) -> Dict[str, Any]:
+    """
+    Run a solve() plan and return its result and tool outputs.
+
+    limits: SandboxProfile (profiles.yaml `sandbox:`) with the plan deadline,
+    per-tool-call timeout, concurrency and isolation/resource settings.
+    """
     print("[action] 🔍 Entered run_python_sandbox()")
 
-    # Create a fresh module scope
-    sandbox = types.ModuleType("sandbox")
+    plan_timeout = getattr(limits, "plan_timeout_seconds", PLAN_TIMEOUT_SECONDS)
+    isolation = getattr(limits, "isolation", "inprocess")
 
     # Track tool outputs for heuristics validation
     tool_outputs = []
 
+    # Parse, validate and compile before any sandbox setup or tool I/O
     try:
-        # Patch MCP client with real dispatcher
-        class SandboxMCP:
-            def __init__(self, dispatcher, tool_outputs_tracker):
-                self.dispatcher = dispatcher
-                self.call_count = 0
-                self.tool_outputs_tracker = tool_outputs_tracker
-
-            async def call_tool(self, tool_name: str, input_dict: dict):
-                self.call_count += 1
-                if self.call_count > MAX_TOOL_CALLS_PER_PLAN:
-                    raise RuntimeError(f"Exceeded max tool calls ({MAX_TOOL_CALLS_PER_PLAN}) in solve() plan.")
-                # REAL tool call now
-                result = await self.dispatcher.call_tool(tool_name, input_dict)
-
-                # Track tool output for heuristics
-                try:
-                    if hasattr(result, 'content') and result.content:
-                        # MCP result format
-                        output_text = str(result.content[0].text if result.content else "")
-                        self.tool_outputs_tracker.append(output_text)
-                    else:
-                        self.tool_outputs_tracker.append(str(result))
-                except Exception:
-                    pass  # Silently fail if we can't extract output
-
-                return result
-
-        sandbox.mcp = SandboxMCP(dispatcher, tool_outputs)
-
-        # Preload safe built-ins into the sandbox
-        import json, re
-        sandbox.__dict__["json"] = json
-        sandbox.__dict__["re"] = re
-
-        # Execute solve fn dynamically
-        exec(compile(code, "<solve_plan>", "exec"), sandbox.__dict__)
-
-        solve_fn = sandbox.__dict__.get("solve")
-        if solve_fn is None:
-            raise ValueError("No solve() function found in plan.")
-
-        if asyncio.iscoroutinefunction(solve_fn):
-            result = await solve_fn()
-        else:
-            result = solve_fn()
-
-        # Clean result formatting
-        formatted_result = ""
-        if isinstance(result, dict) and "result" in result:
-            formatted_result = f"{result['result']}"
-        elif isinstance(result, dict):
-            formatted_result = f"{json.dumps(result)}"
-        elif isinstance(result, list):
-            formatted_result = f"{' '.join(str(r) for r in result)}"
+        compiled = plan_compiler.compile(code)
+    except PlanValidationError as e:
+        log("sandbox", f"⚠️ Plan rejected: {e}")
+        return {
+            "result": f"[sandbox error: {str(e)}]",
+            "tool_outputs": tool_outputs,
+            "tool_calls": []
+        }
+
+    sandbox_mcp = SandboxMCP(
+        dispatcher,
+        tool_outputs,
+        max_concurrency=getattr(limits, "max_concurrent_tool_calls", MAX_CONCURRENT_TOOL_CALLS_PER_PLAN),
+        call_timeout=getattr(limits, "tool_call_timeout_seconds", TOOL_CALL_TIMEOUT_SECONDS),
+        session_id=session_id,
+    )
+
+    try:
+        if isolation == "pool":
+            pool = await get_worker_pool(limits)
+            formatted_result = await pool.run_plan(code, sandbox_mcp, timeout=plan_timeout)
+        elif isolation == "process":
+            formatted_result = await _run_in_worker(code, sandbox_mcp, plan_timeout, limits)
         else:
-            formatted_result = f"{result}"
+            formatted_result = await asyncio.wait_for(
+                _run_in_process(compiled, sandbox_mcp),
+                timeout=plan_timeout
+            )
 
         # Return both result and tool outputs
         return {
             "result": formatted_result,
-            "tool_outputs": tool_outputs
+            "tool_outputs": tool_outputs,
+            "tool_calls": sandbox_mcp.tool_calls
         }
 
-
-
-
-
+    except asyncio.TimeoutError:
+        # wait_for has already cancelled the plan and any in-flight tool calls
+        log("sandbox", f"⏱️ Plan exceeded {plan_timeout}s deadline")
+        return {
+            "result": f"[sandbox error: Plan exceeded {plan_timeout}s deadline]",
+            "tool_outputs": tool_outputs,
+            "tool_calls": sandbox_mcp.tool_calls
+        }
 
     except Exception as e:
         log("sandbox", f"⚠️ Execution error: {e}")
         return {
             "result": f"[sandbox error: {str(e)}]",
-            "tool_outputs": tool_outputs
+            "tool_outputs": tool_outputs,
+            "tool_calls": sandbox_mcp.tool_calls
         }
+
+
+async def _run_in_process(compiled: Any, sandbox_mcp: SandboxMCP) -> str:
+    # Create a fresh module scope
+    sandbox = types.ModuleType("sandbox")
+    sandbox.mcp = sandbox_mcp
+
+    # Preload safe built-ins into the sandbox
+    sandbox.__dict__["json"] = json
+    sandbox.__dict__["re"] = re
+
+    # Execute solve fn dynamically
+    exec(compiled.code, sandbox.__dict__)
+
+    solve_fn = sandbox.__dict__.get("solve")
+    if solve_fn is None:
+        raise ValueError("No solve() function found in plan.")
+
+    if asyncio.iscoroutinefunction(solve_fn):
+        result = await solve_fn()
+    else:
+        result = solve_fn()
+
+    return format_solve_result(result)
+
+
+async def _run_in_worker(code: str, sandbox_mcp: SandboxMCP, plan_timeout: float, limits: Any) -> str:
+    """Run the plan in a separate interpreter with CPU/memory limits"""
+    worker = SandboxWorker(
+        cpu_seconds=getattr(limits, "cpu_seconds", None),
+        memory_mb=getattr(limits, "memory_mb", None),
+    )
+    await worker.start()
+    try:
+        return await worker.run_plan(code, sandbox_mcp, timeout=plan_timeout)
+    except (asyncio.TimeoutError, asyncio.CancelledError):
+        worker.kill()
+        raise
+    finally:
+        await worker.close()
+
+
+async def get_worker_pool(limits: Optional[Any] = None) -> SandboxWorkerPool:
+    """Create and pre-warm the shared worker pool on first use"""
+    global _worker_pool
+    if _worker_pool is None:
+        _worker_pool = SandboxWorkerPool(
+            size=getattr(limits, "pool_size", 2),
+            max_plans_per_worker=getattr(limits, "max_plans_per_worker", 50),
+            cpu_seconds=getattr(limits, "cpu_seconds", None),
+            memory_mb=getattr(limits, "memory_mb", None),
+        )
+        await _worker_pool.start()
+    return _worker_pool
+
+
+def get_sandbox_stats() -> Dict[str, Any]:
+    """Plan cache and worker pool stats (queue_depth = plans waiting for a worker)"""
+    return {
+        "plan_cache": plan_compiler.get_stats(),
+        "worker_pool": _worker_pool.get_stats() if _worker_pool is not None else None,
+    }
+
+
+PLAN_CACHE_STATS = registry.gauge("agent_sandbox_plan_cache", "Compiled plan cache stats (get_sandbox_stats)", ["stat"])
+WORKER_POOL_STATS = registry.gauge("agent_sandbox_worker_pool", "Sandbox worker pool stats (get_sandbox_stats)", ["stat"])
+
+
+def _collect_sandbox_metrics():
+    stats = get_sandbox_stats()
+    for name, value in stats["plan_cache"].items():
+        PLAN_CACHE_STATS.set(value, stat=name)
+    for name, value in (stats["worker_pool"] or {}).items():
+        WORKER_POOL_STATS.set(value, stat=name)
+
+
+registry.add_collector(_collect_sandbox_metrics)
+
+
+async def shutdown_worker_pool():
+    global _worker_pool
+    if _worker_pool is not None:
+        await _worker_pool.close()
+        _worker_pool = None
@@ -1,8 +1,10 @@
-from typing import List, Optional
+from typing import Any, List, Optional
 from modules.perception import PerceptionResult
 from modules.memory import MemoryItem
 from modules.model_manager import ModelManager
-from modules.tools import load_prompt
+from modules.prompts import render_prompt
+from modules.tools import SolvePlanParser
+from core.tracing import traced
 import re
 
 # Optional logging fallback
@@ -42,6 +44,7 @@ def format_conversation_history(context) -> str:
     return "\n".join(history_lines)
 
 
+@traced("plan")
 async def generate_plan(
     user_input: str,
     perception: PerceptionResult,
@@ -51,6 +54,8 @@ async def generate_plan(
     step_num: int = 1,
     max_steps: int = 3,
     context = None,  # Add context parameter
+    model_manager: Optional[Any] = None,  # e.g. a different model for speculative planning
+    temperature: Optional[float] = None,
 ) -> str:
 
     """Generates the full solve() function plan for the agent."""
@@ -62,9 +67,11 @@ async def generate_plan(
     if context:
         conversation_history_section = format_conversation_history(context)
 
-    prompt_template = load_prompt(prompt_path)
+    budget_config = context.agent_profile.prompt_budget_config if context else None
 
-    prompt = prompt_template.format(
+    prompt = render_prompt(
+        prompt_path,
+        budget_config,
         tool_descriptions=tool_descriptions,
         user_input=user_input,
         conversation_history_section=conversation_history_section
@@ -72,7 +79,9 @@ async def generate_plan(
 
 
     try:
-        raw = (await model.generate_text(prompt)).strip()
+        # Streams when enabled: generation stops once a complete solve() has arrived
+        llm = model_manager or model
+        raw = (await llm.generate_until(prompt, SolvePlanParser(), temperature=temperature)).strip()
         log("plan", f"LLM output: {raw}")
 
         # If fenced in ```python ... ```, extract
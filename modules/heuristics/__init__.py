@@ -1,6 +1,8 @@
 # modules/heuristics/__init__.py
 
-from .base import BaseHeuristic, HeuristicResult, HeuristicPipeline
+from .base import BaseHeuristic, HeuristicResult, HeuristicPipeline, HeuristicCache
+from .keyword_matcher import KeywordMatcher, KeywordMatch, get_keyword_matcher
+from .grounding import GroundingEngine, GroundingIndex
 from .query_heuristics import (
     QueryLengthFilter,
     PIIRedaction,
@@ -23,6 +25,12 @@ __all__ = [
     'BaseHeuristic',
     'HeuristicResult',
     'HeuristicPipeline',
+    'HeuristicCache',
+    'KeywordMatcher',
+    'KeywordMatch',
+    'get_keyword_matcher',
+    'GroundingEngine',
+    'GroundingIndex',
     'QueryLengthFilter',
     'PIIRedaction',
     'QueryDeduplication',
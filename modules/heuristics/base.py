@@ -1,10 +1,18 @@
 # modules/heuristics/base.py
 
+import json
+import hashlib
 from abc import ABC, abstractmethod
+from collections import OrderedDict
 from typing import Any, Dict, List, Optional
 from pydantic import BaseModel
 from enum import Enum
 
+from core.metrics import registry
+
+HEURISTIC_RUNS = registry.counter("agent_heuristic_runs_total", "Heuristic executions by outcome", ["heuristic", "status"])
+HEURISTIC_CACHE = registry.counter("agent_heuristic_cache_total", "Heuristic memoization lookups", ["heuristic", "result"])
+
 
 class HeuristicStatus(str, Enum):
     """Status of heuristic execution"""
@@ -25,6 +33,57 @@ class HeuristicResult(BaseModel):
         use_enum_values = True
 
 
+class HeuristicCache:
+    """
+    Bounded LRU cache of heuristic results.
+
+    Keyed on a content hash of the input and the context values the
+    heuristic depends on, so identical re-runs (e.g. lifeline retries that
+    produce the same result and tool outputs) skip re-evaluation.
+    """
+
+    def __init__(self, max_entries: int = 128):
+        self.max_entries = max_entries
+        self.entries: "OrderedDict[str, HeuristicResult]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def make_key(input_data: Any, context_values: Dict[str, Any]) -> str:
+        """Content hash of input and relevant context"""
+        payload = json.dumps([input_data, context_values], sort_keys=True, default=str)
+        return hashlib.sha256(payload.encode("utf-8", errors="ignore")).hexdigest()
+
+    def get(self, key: str) -> Optional[HeuristicResult]:
+        result = self.entries.get(key)
+        if result is None:
+            self.misses += 1
+            return None
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return result
+
+    def put(self, key: str, result: HeuristicResult):
+        self.entries[key] = result
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+            self.evictions += 1
+
+    def clear(self):
+        self.entries.clear()
+
+    def get_stats(self) -> Dict[str, int]:
+        return {
+            "size": len(self.entries),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions
+        }
+
+
 class BaseHeuristic(ABC):
     """
     Base class for all heuristics.
@@ -33,8 +92,19 @@ class BaseHeuristic(ABC):
     - Validate input/output
     - Modify input/output
     - Provide metadata for decision making
+
+    Pure heuristics can opt into result memoization with `cache: true` in
+    their config; `cache_context_keys` names the context values that are
+    part of the cache key.
+
+    Heuristics that may rewrite the input (e.g. redaction) set
+    `rewrites_input = True` so they can run as a stage before anything
+    else consumes the input.
     """
 
+    cache_context_keys: tuple = ()
+    rewrites_input: bool = False
+
     def __init__(self, enabled: bool = True, config: Optional[Dict[str, Any]] = None):
         self.enabled = enabled
         self.config = config or {}
@@ -46,6 +116,10 @@ class BaseHeuristic(ABC):
             "warnings": 0
         }
 
+        self.result_cache: Optional[HeuristicCache] = None
+        if self.config.get("cache", False):
+            self.result_cache = HeuristicCache(max_entries=self.config.get("cache_size", 128))
+
     @abstractmethod
     async def check(self, input_data: Any, context: Optional[Dict[str, Any]] = None) -> HeuristicResult:
         """
@@ -72,7 +146,23 @@ class BaseHeuristic(ABC):
             )
 
         self.stats["total_runs"] += 1
-        result = await self.check(input_data, context)
+
+        cache_key = None
+        cached = None
+        if self.result_cache is not None:
+            context_values = {key: (context or {}).get(key) for key in self.cache_context_keys}
+            cache_key = HeuristicCache.make_key(input_data, context_values)
+            cached = self.result_cache.get(cache_key)
+
+        if self.result_cache is not None:
+            HEURISTIC_CACHE.inc(heuristic=self.__class__.__name__, result="hit" if cached is not None else "miss")
+
+        if cached is not None:
+            result = cached.model_copy(deep=True)
+        else:
+            result = await self.check(input_data, context)
+            if cache_key is not None:
+                self.result_cache.put(cache_key, result.model_copy(deep=True))  # callers may mutate metadata
 
         # Update stats
         if result.status == HeuristicStatus.PASSED:
@@ -83,12 +173,17 @@ class BaseHeuristic(ABC):
             self.stats["modified"] += 1
         elif result.status == HeuristicStatus.WARNING:
             self.stats["warnings"] += 1
+        HEURISTIC_RUNS.inc(heuristic=self.__class__.__name__, status=result.status)
 
         return result
 
     def get_stats(self) -> Dict[str, int]:
         """Get statistics for this heuristic"""
-        return self.stats.copy()
+        stats = self.stats.copy()
+        if self.result_cache is not None:
+            stats["cache_hits"] = self.result_cache.hits
+            stats["cache_misses"] = self.result_cache.misses
+        return stats
 
     def reset_stats(self):
         """Reset statistics"""
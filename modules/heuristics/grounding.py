@@ -0,0 +1,229 @@
+# modules/heuristics/grounding.py
+
+import re
+import math
+import asyncio
+import hashlib
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+
+
+TOKEN_PATTERN = re.compile(r"\w+")
+
+STOPWORDS = {"the", "a", "an", "is", "are", "was", "were", "in", "on", "at"}
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase word tokens"""
+    return TOKEN_PATTERN.findall(text.lower())
+
+
+def _ngrams(tokens: List[str], n: int) -> Set[Tuple[str, ...]]:
+    return {tuple(tokens[i:i + n]) for i in range(len(tokens) - n + 1)}
+
+
+def _cosine(a: Any, b: Any) -> float:
+    dot = sum(float(x) * float(y) for x, y in zip(a, b))
+    norm_a = math.sqrt(sum(float(x) * float(x) for x in a))
+    norm_b = math.sqrt(sum(float(y) * float(y) for y in b))
+    if not norm_a or not norm_b:
+        return 0.0
+    return dot / (norm_a * norm_b)
+
+
+class GroundingIndex:
+    """
+    Token and n-gram index over the tool outputs of one step.
+
+    Built once, then every claim is scored with set lookups instead of
+    substring scans over the concatenated outputs.
+    """
+
+    def __init__(self, tool_outputs: List[str], ngram_size: int = 2, chunk_size: int = 64):
+        self.ngram_size = ngram_size
+        self.tokens: Set[str] = set()
+        self.ngrams: Set[Tuple[str, ...]] = set()
+
+        # Fixed-size token windows with inverted indexes (tokens and n-grams),
+        # used to pick candidate passages for the optional embedding pass
+        self.chunks: List[List[str]] = []
+        self.postings: Dict[str, Set[int]] = {}
+        self.ngram_postings: Dict[Tuple[str, ...], Set[int]] = {}
+        self.passage_vectors: Dict[str, Any] = {}  # passage → embedding, filled by the embedding pass
+
+        for output in tool_outputs:
+            output_tokens = tokenize(str(output))
+            self.tokens.update(output_tokens)
+            self.ngrams.update(_ngrams(output_tokens, ngram_size))
+
+            for start in range(0, len(output_tokens), chunk_size):
+                chunk_id = len(self.chunks)
+                chunk = output_tokens[start:start + chunk_size]
+                self.chunks.append(chunk)
+                for token in set(chunk):
+                    self.postings.setdefault(token, set()).add(chunk_id)
+                for ngram in _ngrams(chunk, ngram_size):
+                    self.ngram_postings.setdefault(ngram, set()).add(chunk_id)
+
+    @staticmethod
+    def key_for(tool_outputs: List[str]) -> str:
+        """Content hash used to reuse an index for identical outputs"""
+        digest = hashlib.sha1()
+        for output in tool_outputs:
+            digest.update(str(output).encode("utf-8", errors="ignore"))
+            digest.update(b"\x00")
+        return digest.hexdigest()
+
+    def score_claim(self, claim: str) -> Dict[str, float]:
+        """
+        Score a claim against the index.
+
+        Returns:
+            {"word_overlap": float, "ngram_overlap": float}
+
+        A claim shorter than ngram_size has no phrases to check (ngram_overlap 1.0).
+        """
+        claim_tokens = tokenize(claim)
+        content_words = {token for token in claim_tokens if token not in STOPWORDS}
+        claim_ngrams = _ngrams(claim_tokens, self.ngram_size)
+
+        word_overlap = (
+            len(content_words & self.tokens) / len(content_words) if content_words else 0.0
+        )
+        ngram_overlap = (
+            len(claim_ngrams & self.ngrams) / len(claim_ngrams) if claim_ngrams else 1.0
+        )
+        return {"word_overlap": word_overlap, "ngram_overlap": ngram_overlap}
+
+    def candidate_passages(self, claim: str, limit: int = 3) -> List[str]:
+        """Passages sharing the most phrases with the claim, then the most content words"""
+        claim_tokens = tokenize(claim)
+        hits: Dict[int, List[int]] = {}  # chunk_id → [ngram hits, token hits]
+        for ngram in _ngrams(claim_tokens, self.ngram_size):
+            for chunk_id in self.ngram_postings.get(ngram, ()):
+                hits.setdefault(chunk_id, [0, 0])[0] += 1
+        for token in set(claim_tokens) - STOPWORDS:
+            for chunk_id in self.postings.get(token, ()):
+                hits.setdefault(chunk_id, [0, 0])[1] += 1
+
+        ranked = sorted(hits.items(), key=lambda item: tuple(item[1]), reverse=True)[:limit]
+        return [" ".join(self.chunks[chunk_id]) for chunk_id, _ in ranked]
+
+
+class GroundingEngine:
+    """
+    Scores claims against tool outputs using a cached GroundingIndex,
+    with an optional embedding similarity pass for claims that fail the
+    lexical check (e.g. paraphrases).
+    """
+
+    def __init__(
+        self,
+        min_word_overlap: float = 0.5,
+        ngram_size: int = 2,
+        min_ngram_overlap: float = 0.2,
+        use_embeddings: bool = False,
+        embedding_threshold: float = 0.75,
+        embed_fn: Optional[Callable[[str], Any]] = None,
+    ):
+        self.min_word_overlap = min_word_overlap
+        self.ngram_size = ngram_size
+        self.min_ngram_overlap = min_ngram_overlap
+        self.use_embeddings = use_embeddings
+        self.embedding_threshold = embedding_threshold
+        self._embed_fn = embed_fn
+
+        # Last built index, keyed by content hash of the tool outputs
+        self._index_key: Optional[str] = None
+        self._index: Optional[GroundingIndex] = None
+
+    def index_for(self, tool_outputs: List[str]) -> GroundingIndex:
+        """Build the index once per distinct set of tool outputs"""
+        key = GroundingIndex.key_for(tool_outputs)
+        if key != self._index_key:
+            self._index = GroundingIndex(tool_outputs, ngram_size=self.ngram_size)
+            self._index_key = key
+        return self._index
+
+    def _get_embed_fn(self) -> Optional[Callable[[str], Any]]:
+        if self._embed_fn is None:
+            try:
+                from modules.memory import get_embedding
+                self._embed_fn = get_embedding
+            except ImportError:
+                self.use_embeddings = False
+        return self._embed_fn
+
+    @staticmethod
+    def _embed_all(embed: Callable[[str], Any], texts: List[str]) -> Dict[str, Any]:
+        """Embed each text; failures (exceptions or the zero-vector fallback) are left out"""
+        vectors = {}
+        for text in texts:
+            try:
+                vector = embed(text)
+            except Exception:
+                continue
+            if vector is not None and any(float(x) for x in vector):
+                vectors[text] = vector
+        return vectors
+
+    async def _embedding_similarities(self, index: GroundingIndex, claims: List[str]) -> Dict[str, float]:
+        """
+        Best cosine similarity between each claim and its candidate passages.
+
+        The embedder is blocking, so all missing vectors are fetched in one
+        thread hop; passage vectors are kept on the index and reused for every
+        later result scored against the same tool outputs.
+        """
+        embed = self._get_embed_fn()
+        if not embed:
+            return {}
+
+        candidates = {claim: index.candidate_passages(claim) for claim in claims}
+        missing = list(dict.fromkeys(
+            passage for passages in candidates.values() for passage in passages
+            if passage not in index.passage_vectors
+        ))
+        vectors = await asyncio.to_thread(self._embed_all, embed, [c for c in claims if candidates[c]] + missing)
+        index.passage_vectors.update({passage: vectors[passage] for passage in missing if passage in vectors})
+
+        similarities = {}
+        for claim, passages in candidates.items():
+            passage_vectors = [index.passage_vectors[p] for p in passages if p in index.passage_vectors]
+            if claim in vectors and passage_vectors:
+                similarities[claim] = max(_cosine(vectors[claim], vector) for vector in passage_vectors)
+        return similarities
+
+    async def score(self, claims: List[str], tool_outputs: List[str]) -> Dict[str, Any]:
+        """
+        Score all claims.
+
+        Returns:
+            {
+                "ungrounded_claims": List[str],
+                "claim_scores": List[Dict[str, float]]
+            }
+        """
+        index = self.index_for(tool_outputs)
+        claim_scores = [index.score_claim(claim) for claim in claims]
+        # Known words are not enough: some of the claim's phrases must occur too, so
+        # output vocabulary recombined into a new statement does not pass
+        grounded = [
+            scores["word_overlap"] >= self.min_word_overlap and scores["ngram_overlap"] >= self.min_ngram_overlap
+            for scores in claim_scores
+        ]
+
+        # Second pass only for claims failing the lexical check (e.g. paraphrases)
+        failed = [claim for claim, ok in zip(claims, grounded) if not ok]
+        if failed and self.use_embeddings:
+            similarities = await self._embedding_similarities(index, failed)
+            for i, claim in enumerate(claims):
+                if not grounded[i] and claim in similarities:
+                    claim_scores[i]["embedding_similarity"] = similarities[claim]
+                    grounded[i] = similarities[claim] >= self.embedding_threshold
+
+        ungrounded_claims = [claim for claim, ok in zip(claims, grounded) if not ok]
+
+        return {
+            "ungrounded_claims": ungrounded_claims,
+            "claim_scores": claim_scores
+        }
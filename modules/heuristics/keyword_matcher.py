@@ -0,0 +1,156 @@
+# modules/heuristics/keyword_matcher.py
+
+from collections import deque
+from functools import lru_cache
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple, Union
+
+
+class KeywordMatch(NamedTuple):
+    """A single keyword hit inside a text"""
+    keyword: str
+    labels: Tuple[str, ...]
+    start: int
+    end: int
+
+
+class KeywordMatcher:
+    """
+    Aho-Corasick multi-pattern matcher.
+
+    Compiles a set of keywords (optionally grouped under labels) into an automaton
+    once, then finds every hit in a text with a single linear pass. Matching is
+    case-insensitive and, by default, word-boundary aware so that "vs" does not
+    match inside "canvas".
+    """
+
+    def __init__(self, keywords: Union[Iterable[str], Dict[str, Iterable[str]]], word_boundary: bool = True):
+        self.word_boundary = word_boundary
+
+        # Trie as parallel lists: goto transitions, failure links, output keywords
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._output: List[List[str]] = [[]]
+        self._labels: Dict[str, List[str]] = {}
+
+        if isinstance(keywords, dict):
+            groups = keywords.items()
+        else:
+            groups = ((keyword, [keyword]) for keyword in keywords)
+
+        for label, words in groups:
+            for word in words:
+                normalized = str(word).lower()
+                if not normalized:
+                    continue
+                if normalized not in self._labels:
+                    self._labels[normalized] = []
+                    self._add(normalized)
+                if label not in self._labels[normalized]:
+                    self._labels[normalized].append(label)
+
+        self._build_failure_links()
+
+    def _add(self, keyword: str):
+        """Insert a keyword into the trie"""
+        state = 0
+        for char in keyword:
+            next_state = self._goto[state].get(char)
+            if next_state is None:
+                next_state = len(self._goto)
+                self._goto.append({})
+                self._fail.append(0)
+                self._output.append([])
+                self._goto[state][char] = next_state
+            state = next_state
+        self._output[state].append(keyword)
+
+    def _build_failure_links(self):
+        """Breadth-first construction of failure links and merged outputs"""
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, next_state in self._goto[state].items():
+                queue.append(next_state)
+                fallback = self._fail[state]
+                while fallback and char not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                target = self._goto[fallback].get(char, 0)
+                self._fail[next_state] = target if target != next_state else 0
+                self._output[next_state] = self._output[next_state] + self._output[self._fail[next_state]]
+
+    @staticmethod
+    def _is_word_char(char: str) -> bool:
+        return char.isalnum() or char == "_"
+
+    def find_all(self, text: str) -> List[KeywordMatch]:
+        """Return every keyword hit in the text, in order of end position"""
+        text = text.lower()
+        matches = []
+        state = 0
+        goto, fail, output = self._goto, self._fail, self._output
+
+        for index, char in enumerate(text):
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            if not output[state]:
+                continue
+
+            end = index + 1
+            for keyword in output[state]:
+                start = end - len(keyword)
+                if self.word_boundary:
+                    if start > 0 and self._is_word_char(text[start - 1]) and self._is_word_char(keyword[0]):
+                        continue
+                    if end < len(text) and self._is_word_char(text[end]) and self._is_word_char(keyword[-1]):
+                        continue
+                matches.append(KeywordMatch(keyword, tuple(self._labels[keyword]), start, end))
+
+        return matches
+
+    def count(self, text: str) -> int:
+        """Total number of keyword hits in the text"""
+        return len(self.find_all(text))
+
+    def matched_keywords(self, text: str) -> List[str]:
+        """Keywords found in the text, in order of first appearance"""
+        seen = []
+        for match in self.find_all(text):
+            if match.keyword not in seen:
+                seen.append(match.keyword)
+        return seen
+
+    def matched_labels(self, text: str, order: Optional[Iterable[str]] = None) -> List[str]:
+        """
+        Labels with at least one hit in the text.
+
+        If order is given (e.g. the intent order from config), labels are returned
+        in that order; otherwise in order of first appearance.
+        """
+        found = []
+        for match in self.find_all(text):
+            for label in match.labels:
+                if label not in found:
+                    found.append(label)
+        if order is None:
+            return found
+        return [label for label in order if label in found]
+
+
+@lru_cache(maxsize=64)
+def _compile(groups: Tuple[Tuple[str, Tuple[str, ...]], ...], word_boundary: bool) -> KeywordMatcher:
+    return KeywordMatcher({label: list(words) for label, words in groups}, word_boundary=word_boundary)
+
+
+def get_keyword_matcher(keywords: Union[Iterable[str], Dict[str, Iterable[str]]], word_boundary: bool = True) -> KeywordMatcher:
+    """
+    Get a compiled matcher for the given keywords.
+
+    Matchers are cached by their keyword set, so heuristics built from the same
+    heuristics_config.yaml share one automaton across HeuristicManager instances.
+    """
+    if isinstance(keywords, dict):
+        groups = tuple((str(label), tuple(str(w) for w in words)) for label, words in keywords.items())
+    else:
+        groups = tuple((str(word), (str(word),)) for word in keywords)
+    return _compile(groups, word_boundary)
@@ -1,5 +1,6 @@
 # modules/heuristics/manager.py
 
+import time
 import yaml
 from pathlib import Path
 from typing import Any, Dict, List, Optional
@@ -21,6 +22,10 @@ from .tool_heuristics import (
     RateLimitOptimization
 )
 
+from core.metrics import registry
+
+PIPELINE_SECONDS = registry.histogram("agent_heuristic_pipeline_seconds", "Heuristic pipeline latency", ["pipeline"])
+
 try:
     from agent import log
 except ImportError:
@@ -139,20 +144,34 @@ class HeuristicManager:
                           f"{len(self.tool_pipeline.heuristics)} tool, "
                           f"{len(self.result_pipeline.heuristics)} result heuristics")
 
-    async def process_query(self, query: str, context: Optional[Dict[str, Any]] = None) -> tuple[str, Dict[str, Any]]:
+    async def process_query(self, query: str, context: Optional[Dict[str, Any]] = None,
+                            stage: Optional[str] = None) -> tuple[str, Dict[str, Any]]:
         """
         Process query through query heuristics.
 
+        Args:
+            stage: None runs the full pipeline; "rewrite" runs only heuristics that
+                   may change the query (length filter, PII redaction); "analysis"
+                   runs the rest, which only inspect it
+
         Returns:
             (processed_query, metadata)
         """
         if not self.enabled:
             return query, {}
 
-        processed_query, results = await self.query_pipeline.run(query, context)
+        pipeline = self.query_pipeline
+        if stage == "rewrite":
+            pipeline = HeuristicPipeline([h for h in self.query_pipeline.heuristics if h.rewrites_input])
+        elif stage == "analysis":
+            pipeline = HeuristicPipeline([h for h in self.query_pipeline.heuristics if not h.rewrites_input])
+
+        start = time.perf_counter()
+        processed_query, results = await pipeline.run(query, context)
+        PIPELINE_SECONDS.observe(time.perf_counter() - start, pipeline=f"query_{stage}" if stage else "query")
 
         if self.log_results:
-            self._log_results("query", results)
+            self._log_results("query", results, pipeline.heuristics)
 
         # Extract metadata
         metadata = self._extract_metadata(results)
@@ -169,10 +188,12 @@ class HeuristicManager:
         if not self.enabled:
             return tools, {}
 
+        start = time.perf_counter()
         processed_tools, results = await self.tool_pipeline.run(tools, context)
+        PIPELINE_SECONDS.observe(time.perf_counter() - start, pipeline="tool")
 
         if self.log_results:
-            self._log_results("tool", results)
+            self._log_results("tool", results, self.tool_pipeline.heuristics)
 
         metadata = self._extract_metadata(results)
 
@@ -188,36 +209,22 @@ class HeuristicManager:
         if not self.enabled:
             return result, {}
 
+        start = time.perf_counter()
         processed_result, results = await self.result_pipeline.run(result, context)
+        PIPELINE_SECONDS.observe(time.perf_counter() - start, pipeline="result")
 
         if self.log_results:
-            self._log_results("result", results)
+            self._log_results("result", results, self.result_pipeline.heuristics)
 
         metadata = self._extract_metadata(results)
 
         return processed_result, metadata
 
-    def _log_results(self, stage: str, results: List[HeuristicResult]):
-        """Log heuristic results"""
-        for i, result in enumerate(results):
+    def _log_results(self, stage: str, results: List[HeuristicResult], heuristics: List[Any]):
+        """Log heuristic results (heuristics: the pipeline that produced them, in run order)"""
+        for heuristic, result in zip(heuristics, results):
             if result.status != "passed":
-                heuristic_name = self._get_heuristic_name(stage, i)
-                log("heuristics", f"[{stage}] {heuristic_name}: {result.status} - {result.message}")
-
-    def _get_heuristic_name(self, stage: str, index: int) -> str:
-        """Get heuristic name by stage and index"""
-        if stage == "query":
-            heuristics = self.query_pipeline.heuristics
-        elif stage == "tool":
-            heuristics = self.tool_pipeline.heuristics
-        elif stage == "result":
-            heuristics = self.result_pipeline.heuristics
-        else:
-            return "unknown"
-
-        if index < len(heuristics):
-            return heuristics[index].__class__.__name__
-        return "unknown"
+                log("heuristics", f"[{stage}] {heuristic.__class__.__name__}: {result.status} - {result.message}")
 
     def _extract_metadata(self, results: List[HeuristicResult]) -> Dict[str, Any]:
         """Extract combined metadata from all results"""
@@ -244,9 +251,19 @@ class HeuristicManager:
         return {
             "query_heuristics": self.query_pipeline.get_all_stats(),
             "tool_heuristics": self.tool_pipeline.get_all_stats(),
-            "result_heuristics": self.result_pipeline.get_all_stats()
+            "result_heuristics": self.result_pipeline.get_all_stats(),
+            "caches": self.get_cache_stats()
         }
 
+    def get_cache_stats(self) -> Dict[str, Dict[str, int]]:
+        """Get memoization stats for heuristics with caching enabled"""
+        stats = {}
+        for pipeline in (self.query_pipeline, self.tool_pipeline, self.result_pipeline):
+            for heuristic in pipeline.heuristics:
+                if heuristic.result_cache is not None:
+                    stats[heuristic.__class__.__name__] = heuristic.result_cache.get_stats()
+        return stats
+
     # Convenience methods for tracking (used by integration layer)
     def record_tool_usage(self, query_intent: str, tool_name: str, success: bool):
         """Record tool usage for affinity scoring"""
@@ -4,6 +4,7 @@ import re
 import hashlib
 from typing import Any, Dict, Optional, List
 from .base import BaseHeuristic, HeuristicResult, HeuristicStatus
+from .keyword_matcher import get_keyword_matcher
 
 
 class QueryLengthFilter(BaseHeuristic):
@@ -12,6 +13,8 @@ class QueryLengthFilter(BaseHeuristic):
     Prevents extremely long or overly complex queries.
     """
 
+    rewrites_input = True
+
     def __init__(self, enabled: bool = True, config: Optional[Dict[str, Any]] = None):
         default_config = {
             "max_words": 500,
@@ -89,6 +92,8 @@ class PIIRedaction(BaseHeuristic):
     Automatically detects and masks sensitive information.
     """
 
+    rewrites_input = True
+
     def __init__(self, enabled: bool = True, config: Optional[Dict[str, Any]] = None):
         default_config = {
             "redact_ssn": True,
@@ -256,6 +261,8 @@ class AmbiguityDetection(BaseHeuristic):
             "pronoun_threshold": 0.3
         }
         super().__init__(enabled, {**default_config, **(config or {})})
+        self.vague_matcher = get_keyword_matcher(self.config["vague_words"])
+        self.question_matcher = get_keyword_matcher(["what", "when", "where", "who", "why", "how", "which"])
 
     async def check(self, input_data: Any, context: Optional[Dict[str, Any]] = None) -> HeuristicResult:
         query = str(input_data)
@@ -274,9 +281,9 @@ class AmbiguityDetection(BaseHeuristic):
                 message="Query too short - may be ambiguous"
             )
 
-        # Check for vague words
-        vague_words = self.config["vague_words"]
-        vague_count = sum(1 for word in words if word in vague_words)
+        # Check for vague words (single pass, word-boundary aware)
+        vague_hits = self.vague_matcher.find_all(query)
+        vague_count = len(vague_hits)
         vague_ratio = vague_count / len(words) if words else 0
 
         if vague_ratio > self.config["pronoun_threshold"]:
@@ -287,14 +294,13 @@ class AmbiguityDetection(BaseHeuristic):
                     "ambiguous": True,
                     "reason": "too_vague",
                     "vague_word_ratio": vague_ratio,
-                    "vague_words_found": [w for w in words if w in vague_words]
+                    "vague_words_found": [hit.keyword for hit in vague_hits]
                 },
                 message=f"Query contains too many vague words ({vague_ratio:.1%})"
             )
 
         # Check for question words (good sign)
-        question_words = ["what", "when", "where", "who", "why", "how", "which"]
-        has_question = any(word in words for word in question_words)
+        has_question = bool(self.question_matcher.find_all(query))
 
         return HeuristicResult(
             status=HeuristicStatus.PASSED,
@@ -324,16 +330,14 @@ class QueryIntentClassification(BaseHeuristic):
             }
         }
         super().__init__(enabled, {**default_config, **(config or {})})
+        self.intent_matcher = get_keyword_matcher(self.config["intents"])
+
+    def classify(self, query: str) -> List[str]:
+        """Return all detected intents, in config order"""
+        return self.intent_matcher.matched_labels(query, order=self.config["intents"].keys())
 
     async def check(self, input_data: Any, context: Optional[Dict[str, Any]] = None) -> HeuristicResult:
-        query = str(input_data).lower()
-        detected_intents = []
-
-        for intent, keywords in self.config["intents"].items():
-            for keyword in keywords:
-                if keyword in query:
-                    detected_intents.append(intent)
-                    break
+        detected_intents = self.classify(str(input_data))
 
         # Determine primary intent
         if not detected_intents:
@@ -3,6 +3,8 @@
 import re
 from typing import Any, Dict, Optional, List
 from .base import BaseHeuristic, HeuristicResult, HeuristicStatus
+from .keyword_matcher import get_keyword_matcher
+from .grounding import GroundingEngine
 
 
 class ConfidenceThreshold(BaseHeuristic):
@@ -11,6 +13,8 @@ class ConfidenceThreshold(BaseHeuristic):
     Only return results that meet minimum confidence/quality criteria.
     """
 
+    cache_context_keys = ("confidence",)
+
     def __init__(self, enabled: bool = True, config: Optional[Dict[str, Any]] = None):
         default_config = {
             "min_confidence": 0.7,
@@ -22,6 +26,7 @@ class ConfidenceThreshold(BaseHeuristic):
             "hedging_threshold": 2
         }
         super().__init__(enabled, {**default_config, **(config or {})})
+        self.hedging_matcher = get_keyword_matcher(self.config["hedging_words"])
 
     def _calculate_confidence(self, result: str) -> float:
         """
@@ -31,11 +36,7 @@ class ConfidenceThreshold(BaseHeuristic):
         if not self.config["check_hedging_words"]:
             return 1.0
 
-        result_lower = result.lower()
-        hedging_count = 0
-
-        for word in self.config["hedging_words"]:
-            hedging_count += result_lower.count(word)
+        hedging_count = self.hedging_matcher.count(result)
 
         # More hedging = lower confidence
         # Simple heuristic: each hedging word reduces confidence by 0.15
@@ -101,6 +102,8 @@ class HallucinationDetection(BaseHeuristic):
     Catch when LLM generates ungrounded or fabricated information.
     """
 
+    cache_context_keys = ("tool_outputs",)
+
     def __init__(self, enabled: bool = True, config: Optional[Dict[str, Any]] = None):
         default_config = {
             "require_grounding": True,
@@ -111,9 +114,21 @@ class HallucinationDetection(BaseHeuristic):
                 r"as stated in",
                 r"the data shows",
                 r"research indicates"
-            ]
+            ],
+            "min_word_overlap": 0.5,
+            "ngram_size": 2,
+            "min_ngram_overlap": 0.2,
+            "use_embeddings": False,
+            "embedding_threshold": 0.75
         }
         super().__init__(enabled, {**default_config, **(config or {})})
+        self.grounding_engine = GroundingEngine(
+            min_word_overlap=self.config["min_word_overlap"],
+            ngram_size=self.config["ngram_size"],
+            min_ngram_overlap=self.config["min_ngram_overlap"],
+            use_embeddings=self.config["use_embeddings"],
+            embedding_threshold=self.config["embedding_threshold"]
+        )
 
     def _extract_claims(self, result: str) -> List[str]:
         """Extract specific factual claims from result"""
@@ -134,7 +149,7 @@ class HallucinationDetection(BaseHeuristic):
 
         return claims
 
-    def _check_grounding(self, result: str, tool_outputs: List[str]) -> Dict[str, Any]:
+    async def _check_grounding(self, result: str, tool_outputs: List[str]) -> Dict[str, Any]:
         """
         Check if claims in result are grounded in tool outputs.
 
@@ -164,22 +179,9 @@ class HallucinationDetection(BaseHeuristic):
                 "reason": "no_claims"
             }
 
-        # Check each claim against tool outputs
-        ungrounded_claims = []
-        combined_outputs = " ".join(tool_outputs).lower()
-
-        for claim in claims:
-            # Simple check: see if key phrases from claim appear in outputs
-            claim_words = set(claim.lower().split())
-            # Remove common words
-            claim_words = claim_words - {"the", "a", "an", "is", "are", "was", "were", "in", "on", "at"}
-
-            # Check if at least 50% of claim words appear in outputs
-            grounded_words = sum(1 for word in claim_words if word in combined_outputs)
-            grounding_ratio = grounded_words / len(claim_words) if claim_words else 0
-
-            if grounding_ratio < 0.5:
-                ungrounded_claims.append(claim)
+        # Score all claims against a token/n-gram index built once per set of outputs
+        scored = await self.grounding_engine.score(claims, tool_outputs)
+        ungrounded_claims = scored["ungrounded_claims"]
 
         grounding_score = 1.0 - (len(ungrounded_claims) / len(claims)) if claims else 1.0
 
@@ -187,7 +189,8 @@ class HallucinationDetection(BaseHeuristic):
             "grounded": len(ungrounded_claims) == 0,
             "ungrounded_claims": ungrounded_claims,
             "grounding_score": grounding_score,
-            "total_claims": len(claims)
+            "total_claims": len(claims),
+            "claim_scores": scored["claim_scores"]
         }
 
     async def check(self, input_data: Any, context: Optional[Dict[str, Any]] = None) -> HeuristicResult:
@@ -211,7 +214,7 @@ class HallucinationDetection(BaseHeuristic):
         if context and "tool_outputs" in context:
             tool_outputs = context["tool_outputs"]
 
-        grounding_check = self._check_grounding(result, tool_outputs)
+        grounding_check = await self._check_grounding(result, tool_outputs)
 
         if not grounding_check["grounded"]:
             return HeuristicResult(
@@ -2,10 +2,13 @@ from mcp.server.fastmcp import FastMCP, Context
 from typing import List, Optional, Dict, Any
 from datetime import datetime
 import yaml
-from memory import MemoryManager  # Import MemoryManager to use its path structure
 import json
 import os
 import sys
+
+# memory.py uses core/ (tracing, metrics): make the repo root importable when run as a script
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from memory import MemoryManager  # Import MemoryManager to use its path structure
 import signal
 from pydantic import BaseModel  # Add this import
 
@@ -18,7 +21,7 @@ BASE_MEMORY_DIR = "memory"
 # Get absolute path to config file
 SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
 ROOT_DIR = os.path.dirname(SCRIPT_DIR)  # Go up one level from modules to S9
-CONFIG_PATH = os.path.join(ROOT_DIR, "config", "profiles.yaml")
+CONFIG_PATH = os.getenv("AGENT_PROFILE_PATH") or os.path.join(ROOT_DIR, "config", "profiles.yaml")
 
 # Load config
 try:
@@ -2,6 +2,7 @@
 
 import json
 import os
+import threading
 import time
 import hashlib
 import numpy as np
@@ -27,6 +28,19 @@ except ImportError:
         now = datetime.datetime.now().strftime("%H:%M:%S")
         print(f"[{now}] [{stage}] {msg}")
 
+from core.tracing import traced
+from core.metrics import registry
+
+EMBEDDING_REQUESTS = registry.counter("agent_embedding_requests_total", "Embedding requests", ["status"])
+EMBEDDING_SECONDS = registry.histogram("agent_embedding_seconds", "Embedding request latency")
+MEMORY_SAVES = registry.counter("agent_memory_saves_total", "Memory writes to disk", ["kind"])
+MEMORY_SAVE_SECONDS = registry.histogram("agent_memory_save_seconds", "Memory write latency", ["kind"])
+CONVERSATION_SEARCHES = registry.counter("agent_conversation_searches_total", "Conversation history searches", ["outcome"])
+CONVERSATION_TURNS = registry.gauge("agent_conversation_history_turns", "Conversation turns in the history index")
+
+# Ollama embeddings endpoint (AGENT_EMBED_URL points it elsewhere, e.g. the benchmark stub)
+EMBED_URL = os.getenv("AGENT_EMBED_URL", "http://localhost:11434/api/embeddings")
+
 class MemoryItem(BaseModel):
     """Represents a single memory entry for a session."""
     timestamp: float
@@ -86,17 +100,29 @@ Result: {answer_preview}"""
         return f"{session_id}-turn-{step}"
 
 
-def get_embedding(text: str, embed_url: str = "http://localhost:11434/api/embeddings", model: str = "nomic-embed-text") -> np.ndarray:
+@traced("embedding")
+def get_embedding(text: str, embed_url: str = EMBED_URL, model: str = "nomic-embed-text") -> np.ndarray:
     """Generate embedding vector for text using Ollama."""
     try:
-        result = requests.post(embed_url, json={"model": model, "prompt": text}, timeout=30)
-        result.raise_for_status()
-        return np.array(result.json()["embedding"], dtype=np.float32)
+        with EMBEDDING_SECONDS.time():
+            result = requests.post(embed_url, json={"model": model, "prompt": text}, timeout=30)
+            result.raise_for_status()
+            vector = np.array(result.json()["embedding"], dtype=np.float32)
+        EMBEDDING_REQUESTS.inc(status="ok")
+        return vector
     except Exception as e:
+        EMBEDDING_REQUESTS.inc(status="error")
         log("memory", f"⚠️ Failed to generate embedding: {e}")
         return np.zeros(768, dtype=np.float32)  # Return zero vector as fallback
 
 
+def _collect_memory_metrics():
+    CONVERSATION_TURNS.set(len(MemoryManager._conversation_history or []))
+
+
+registry.add_collector(_collect_memory_metrics)
+
+
 class MemoryManager:
     """Manages session memory (read/write/append) and conversation history with FAISS vector search."""
 
@@ -107,6 +133,9 @@ class MemoryManager:
     _conversation_index_file = "memory/conversation_index/conversations.index"
     _conversation_metadata_file = "memory/conversation_index/conversations.json"
     _use_vectors = FAISS_AVAILABLE
+    # Guards the shared history + FAISS index: the server writes turns and searches
+    # them from worker threads for many sessions at once (embedding calls stay outside)
+    _conversation_lock = threading.RLock()
 
     def __init__(self, session_id: str, memory_dir: str = "memory"):
         self.session_id = session_id
@@ -121,7 +150,9 @@ class MemoryManager:
 
         # Load conversation history index (once per class)
         if MemoryManager._use_vectors and MemoryManager._conversation_index is None:
-            self._load_conversation_index()
+            with MemoryManager._conversation_lock:
+                if MemoryManager._conversation_index is None:
+                    self._load_conversation_index()
 
     def load(self):
         if os.path.exists(self.memory_path):
@@ -131,12 +162,15 @@ class MemoryManager:
         else:
             self.items = []
 
+    @traced("memory.save")
     def save(self):
         # Before opening the file for writing
         os.makedirs(os.path.dirname(self.memory_path), exist_ok=True)
-        with open(self.memory_path, "w", encoding="utf-8") as f:
-            raw = [item.dict() for item in self.items]
-            json.dump(raw, f, indent=2)
+        with MEMORY_SAVE_SECONDS.time(kind="session"):
+            with open(self.memory_path, "w", encoding="utf-8") as f:
+                raw = [item.dict() for item in self.items]
+                json.dump(raw, f, indent=2)
+        MEMORY_SAVES.inc(kind="session")
 
     def add(self, item: MemoryItem):
         self.items.append(item)
@@ -255,9 +289,11 @@ class MemoryManager:
                 log("memory", "🔧 Building conversation FAISS index...")
                 self._rebuild_conversation_index()
 
+    @traced("memory.save_conversation_index")
     def _save_conversation_index(self):
         """Save conversation history FAISS index and metadata to disk."""
         try:
+            stage_start = time.perf_counter()
             os.makedirs(MemoryManager._conversation_cache_dir, exist_ok=True)
 
             # Save metadata
@@ -269,6 +305,8 @@ class MemoryManager:
             if MemoryManager._conversation_index:
                 faiss.write_index(MemoryManager._conversation_index, MemoryManager._conversation_index_file)
 
+            MEMORY_SAVES.inc(kind="conversation_index")
+            MEMORY_SAVE_SECONDS.observe(time.perf_counter() - stage_start, kind="conversation_index")
             log("memory", f"💾 Saved {len(MemoryManager._conversation_history)} conversation turns + FAISS index")
         except Exception as e:
             log("memory", f"⚠️ Failed to save conversation index: {e}")
@@ -322,32 +360,42 @@ class MemoryManager:
             return
 
         try:
-            # Add to metadata
-            MemoryManager._conversation_history.append(turn)
-
-            # Generate and add vector
+            # Generate vector (network call, outside the lock)
             summary = turn.summarize()
             embedding = get_embedding(summary)
             embedding_normalized = embedding.reshape(1, -1).copy()
             faiss.normalize_L2(embedding_normalized)
-            MemoryManager._conversation_index.add(embedding_normalized)
+        except Exception as e:
+            log("memory", f"⚠️ Failed to add conversation turn: {e}")
+            return
 
-            new_idx = len(MemoryManager._conversation_history) - 1
-            log("memory", f"➕ Added conversation turn #{new_idx} to history index")
+        with MemoryManager._conversation_lock:
+            try:
+                # Add to metadata and index together
+                MemoryManager._conversation_history.append(turn)
+                MemoryManager._conversation_index.add(embedding_normalized)
 
-            # Verify alignment
-            if MemoryManager._conversation_index.ntotal != len(MemoryManager._conversation_history):
-                log("memory", f"⚠️ MISMATCH after add! Rebuilding...")
-                self._rebuild_conversation_index()
+                new_idx = len(MemoryManager._conversation_history) - 1
+                log("memory", f"➕ Added conversation turn #{new_idx} to history index")
 
-            # Save to disk
-            self._save_conversation_index()
+                # Verify alignment
+                if MemoryManager._conversation_index.ntotal != len(MemoryManager._conversation_history):
+                    log("memory", f"⚠️ MISMATCH after add! Rebuilding...")
+                    self._rebuild_conversation_index()
 
-        except Exception as e:
-            log("memory", f"⚠️ Failed to add conversation turn: {e}")
-            # Remove from metadata if vector add failed
-            if MemoryManager._conversation_history and MemoryManager._conversation_history[-1] == turn:
-                MemoryManager._conversation_history.pop()
+                # Save to disk
+                self._save_conversation_index()
+
+            except Exception as e:
+                log("memory", f"⚠️ Failed to add conversation turn: {e}")
+                # Remove from metadata if vector add failed
+                if MemoryManager._conversation_history and MemoryManager._conversation_history[-1] == turn:
+                    MemoryManager._conversation_history.pop()
+
+    @staticmethod
+    @traced("faiss.search")
+    def _search_conversation_index(query_vectors: np.ndarray, top_k: int):
+        return MemoryManager._conversation_index.search(query_vectors, top_k)
 
     def find_relevant_conversations(
         self,
@@ -384,26 +432,28 @@ class MemoryManager:
             query_normalized = query_embedding.reshape(1, -1).copy()
             faiss.normalize_L2(query_normalized)
 
-            # Search FAISS index
-            similarities, indices = MemoryManager._conversation_index.search(query_normalized, top_k)
-
             # Filter by threshold and optionally by age
             results = []
             current_time = time.time()
 
-            for similarity, idx in zip(similarities[0], indices[0]):
-                if idx >= 0 and idx < len(MemoryManager._conversation_history) and similarity >= threshold:
-                    turn = MemoryManager._conversation_history[idx]
+            with MemoryManager._conversation_lock:
+                # Search FAISS index
+                similarities, indices = self._search_conversation_index(query_normalized, top_k)
+
+                for similarity, idx in zip(similarities[0], indices[0]):
+                    if idx >= 0 and idx < len(MemoryManager._conversation_history) and similarity >= threshold:
+                        turn = MemoryManager._conversation_history[idx]
 
-                    # Check age filter if specified
-                    if max_age_days:
-                        age_seconds = current_time - turn.timestamp
-                        age_days = age_seconds / (24 * 3600)
-                        if age_days > max_age_days:
-                            continue
+                        # Check age filter if specified
+                        if max_age_days:
+                            age_seconds = current_time - turn.timestamp
+                            age_days = age_seconds / (24 * 3600)
+                            if age_days > max_age_days:
+                                continue
 
-                    results.append((turn, float(similarity)))
+                        results.append((turn, float(similarity)))
 
+            CONVERSATION_SEARCHES.inc(outcome="hit" if results else "miss")
             if results:
                 log("memory", f"🔍 Found {len(results)} relevant conversations (threshold: {threshold})")
                 for turn, score in results:
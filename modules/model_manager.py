@@ -1,44 +1,128 @@
 import os
 import json
+import asyncio
+import threading
+import time
 import yaml
 import requests
 from pathlib import Path
-from google import genai
 from dotenv import load_dotenv
+from typing import AsyncIterator, Iterator, Optional
+
+from core.metrics import registry
 
 load_dotenv()
 
 ROOT = Path(__file__).parent.parent
 MODELS_JSON = ROOT / "config" / "models.json"
-PROFILE_YAML = ROOT / "config" / "profiles.yaml"
+PROFILE_YAML = Path(os.getenv("AGENT_PROFILE_PATH") or ROOT / "config" / "profiles.yaml")
+
+_STREAM_END = object()
+
+LLM_REQUESTS = registry.counter("agent_llm_requests_total", "LLM calls", ["model", "mode", "status"])
+LLM_SECONDS = registry.histogram("agent_llm_request_seconds", "LLM call latency until the last chunk", ["model", "mode"])
+LLM_FIRST_CHUNK_SECONDS = registry.histogram("agent_llm_first_chunk_seconds", "Streaming LLM latency until the first chunk", ["model"])
+LLM_PROMPT_CHARS = registry.counter("agent_llm_prompt_chars_total", "Prompt characters sent to the LLM", ["model"])
+
+
+class ReplayModel:
+    """
+    Offline stand-in for an LLM, answering from a JSON fixture (models.json type "replay").
+
+    Fixture:
+        {"latency_ms": 0, "chunk_chars": 64, "default": "...",
+         "rules": [{"match": ["substring", ...], "response": "..."}]}
+    The first rule whose substrings all occur in the prompt answers; latency_ms
+    is slept once per call so benchmarks see a realistic, repeatable delay.
+    """
+
+    def __init__(self, fixture_path: Path, latency_ms: Optional[float] = None):
+        fixture = json.loads(Path(fixture_path).read_text(encoding="utf-8"))
+        self.rules = fixture.get("rules", [])
+        self.default = fixture.get("default", "")
+        self.latency_ms = fixture.get("latency_ms", 0) if latency_ms is None else latency_ms
+        self.chunk_chars = max(1, fixture.get("chunk_chars", 64))
+
+    def respond(self, prompt: str) -> str:
+        for rule in self.rules:
+            if all(fragment in prompt for fragment in rule.get("match", [])):
+                return rule["response"]
+        return self.default
+
+    def generate(self, prompt: str) -> str:
+        if self.latency_ms:
+            time.sleep(self.latency_ms / 1000)
+        return self.respond(prompt)
+
+    def stream(self, prompt: str) -> Iterator[str]:
+        text = self.generate(prompt)
+        for start in range(0, len(text), self.chunk_chars):
+            yield text[start:start + self.chunk_chars]
+
 
 class ModelManager:
-    def __init__(self):
+    def __init__(self, model_key: Optional[str] = None):
         self.config = json.loads(MODELS_JSON.read_text())
         self.profile = yaml.safe_load(PROFILE_YAML.read_text())
 
-        self.text_model_key = self.profile["llm"]["text_generation"]
+        self.text_model_key = model_key or self.profile["llm"]["text_generation"]
         self.model_info = self.config["models"][self.text_model_key]
         self.model_type = self.model_info["type"]
+        self.streaming = self.profile["llm"].get("streaming", False)
 
         # ✅ Gemini initialization (your style)
         if self.model_type == "gemini":
+            from google import genai  # slow to import; ollama/replay runs never need it
             api_key = os.getenv("GEMINI_API_KEY")
             self.client = genai.Client(api_key=api_key)
 
-    async def generate_text(self, prompt: str) -> str:
+        elif self.model_type == "replay":
+            self.replay = ReplayModel(ROOT / self.model_info["fixture"], self.model_info.get("latency_ms"))
+
+    def _record_call(self, mode: str, start: float, status: str):
+        LLM_REQUESTS.inc(model=self.text_model_key, mode=mode, status=status)
+        LLM_SECONDS.observe(time.perf_counter() - start, model=self.text_model_key, mode=mode)
+
+    async def generate_text(self, prompt: str, temperature: Optional[float] = None) -> str:
+        LLM_PROMPT_CHARS.inc(len(prompt), model=self.text_model_key)
+        start = time.perf_counter()
+        status = "error"
+        try:
+            text = await self._generate(prompt, temperature)
+            status = "ok"
+            return text
+        finally:
+            self._record_call("generate", start, status)
+
+    async def _generate(self, prompt: str, temperature: Optional[float] = None) -> str:
+        # Blocking SDK/HTTP calls run in a thread so other coroutines keep going
         if self.model_type == "gemini":
-            return self._gemini_generate(prompt)
+            return await asyncio.to_thread(self._gemini_generate, prompt, temperature)
 
         elif self.model_type == "ollama":
-            return self._ollama_generate(prompt)
+            return await asyncio.to_thread(self._ollama_generate, prompt, temperature)
+
+        elif self.model_type == "replay":
+            return await asyncio.to_thread(self.replay.generate, prompt)
 
         raise NotImplementedError(f"Unsupported model type: {self.model_type}")
 
-    def _gemini_generate(self, prompt: str) -> str:
+    @staticmethod
+    def _gemini_config(temperature: Optional[float]) -> Optional[dict]:
+        return {"temperature": temperature} if temperature is not None else None
+
+    @staticmethod
+    def _ollama_payload(model: str, prompt: str, stream: bool, temperature: Optional[float]) -> dict:
+        payload = {"model": model, "prompt": prompt, "stream": stream}
+        if temperature is not None:
+            payload["options"] = {"temperature": temperature}
+        return payload
+
+    def _gemini_generate(self, prompt: str, temperature: Optional[float] = None) -> str:
         response = self.client.models.generate_content(
             model=self.model_info["model"],
-            contents=prompt
+            contents=prompt,
+            config=self._gemini_config(temperature)
         )
 
         # ✅ Safely extract response text
@@ -50,10 +134,124 @@ class ModelManager:
             except Exception:
                 return str(response)
 
-    def _ollama_generate(self, prompt: str) -> str:
+    def _ollama_generate(self, prompt: str, temperature: Optional[float] = None) -> str:
         response = requests.post(
             self.model_info["url"]["generate"],
-            json={"model": self.model_info["model"], "prompt": prompt, "stream": False}
+            json=self._ollama_payload(self.model_info["model"], prompt, False, temperature)
         )
         response.raise_for_status()
         return response.json()["response"].strip()
+
+    # === Streaming ===
+
+    async def stream_text(self, prompt: str, temperature: Optional[float] = None) -> AsyncIterator[str]:
+        """
+        Yield response chunks as they arrive.
+
+        The blocking SDK/HTTP stream is consumed in a thread; closing the iterator
+        early (break / cancellation) stops the generation.
+        """
+        if self.model_type == "gemini":
+            producer = self._gemini_stream
+        elif self.model_type == "ollama":
+            producer = self._ollama_stream
+        elif self.model_type == "replay":
+            producer = lambda prompt, temperature: self.replay.stream(prompt)
+        else:
+            raise NotImplementedError(f"Unsupported model type: {self.model_type}")
+
+        loop = asyncio.get_running_loop()
+        queue: asyncio.Queue = asyncio.Queue()
+        stop = threading.Event()
+
+        def deliver(item):
+            try:
+                loop.call_soon_threadsafe(queue.put_nowait, item)
+            except RuntimeError:
+                pass  # event loop already closed
+
+        def run():
+            try:
+                for chunk in producer(prompt, temperature):
+                    if stop.is_set():
+                        break
+                    if chunk:
+                        deliver(chunk)
+            except Exception as e:
+                deliver(e)
+            finally:
+                deliver(_STREAM_END)
+
+        LLM_PROMPT_CHARS.inc(len(prompt), model=self.text_model_key)
+        start = time.perf_counter()
+        first_chunk = True
+        status = "error"
+
+        loop.run_in_executor(None, run)
+        try:
+            while True:
+                item = await queue.get()
+                if item is _STREAM_END:
+                    break
+                if isinstance(item, Exception):
+                    raise item
+                if first_chunk:
+                    LLM_FIRST_CHUNK_SECONDS.observe(time.perf_counter() - start, model=self.text_model_key)
+                    first_chunk = False
+                yield item
+            status = "ok"
+        except GeneratorExit:
+            status = "ok"  # caller stopped early (complete plan/JSON already parsed)
+            raise
+        except asyncio.CancelledError:
+            status = "cancelled"
+            raise
+        finally:
+            stop.set()
+            self._record_call("stream", start, status)
+
+    async def generate_until(self, prompt: str, parser, temperature: Optional[float] = None) -> str:
+        """
+        Generate text, stopping as soon as `parser` has a complete result.
+
+        parser: object with feed(chunk) -> Optional[str] (complete result or None),
+                an `aborted` flag for obviously bad output, and `text` (all input so far)
+        Falls back to a single generate_text call when streaming is off.
+        """
+        if not self.streaming:
+            return await self.generate_text(prompt, temperature)
+
+        stream = self.stream_text(prompt, temperature)
+        try:
+            async for chunk in stream:
+                result = parser.feed(chunk)
+                if result is not None:
+                    return result
+                if parser.aborted:
+                    break
+        finally:
+            await stream.aclose()
+        return parser.text.strip()
+
+    def _gemini_stream(self, prompt: str, temperature: Optional[float] = None) -> Iterator[str]:
+        for chunk in self.client.models.generate_content_stream(
+            model=self.model_info["model"],
+            contents=prompt,
+            config=self._gemini_config(temperature)
+        ):
+            yield getattr(chunk, "text", None) or ""
+
+    def _ollama_stream(self, prompt: str, temperature: Optional[float] = None) -> Iterator[str]:
+        with requests.post(
+            self.model_info["url"]["generate"],
+            json=self._ollama_payload(self.model_info["model"], prompt, True, temperature),
+            stream=True
+        ) as response:
+            response.raise_for_status()
+            for line in response.iter_lines():
+                if not line:
+                    continue
+                data = json.loads(line)
+                yield data.get("response", "")
+                if data.get("done"):
+                    break
@@ -1,12 +1,17 @@
 # modules/perception.py
 
-from typing import List, Optional
+from typing import Any, Awaitable, Dict, List, Optional
 from pydantic import BaseModel
 from modules.model_manager import ModelManager
-from modules.tools import load_prompt, extract_json_block
+from modules.tools import extract_json_block, JsonObjectParser
+from modules.prompts import render_prompt
+from modules.router import get_router, RouteDecision, FastRouter
 from core.context import AgentContext
+from core.tracing import traced
 
 import json
+import time
+import asyncio
 
 
 # Optional logging fallback
@@ -30,7 +35,8 @@ class PerceptionResult(BaseModel):
     tags: List[str] = []
     selected_servers: List[str] = []  # 🆕 NEW field
 
-async def extract_perception(user_input: str, mcp_server_descriptions: dict) -> PerceptionResult:
+async def extract_perception(user_input: str, mcp_server_descriptions: dict,
+                             prompt_budget: Optional[dict] = None) -> PerceptionResult:
     """
     Extracts perception details and selects relevant MCP servers based on the user query.
     """
@@ -42,17 +48,17 @@ async def extract_perception(user_input: str, mcp_server_descriptions: dict) ->
 
     servers_text = "\n".join(server_list)
 
-    prompt_template = load_prompt(prompt_path)
-    
-
-    prompt = prompt_template.format(
+    prompt = render_prompt(
+        prompt_path,
+        prompt_budget,
         servers_text=servers_text,
         user_input=user_input
     )
     
 
     try:
-        raw = await model.generate_text(prompt)
+        # Streams when enabled: generation stops once the JSON object is complete
+        raw = await model.generate_until(prompt, JsonObjectParser())
         raw = raw.strip()
         log("perception", f"Raw output: {raw}")
 
@@ -79,47 +85,145 @@ async def extract_perception(user_input: str, mcp_server_descriptions: dict) ->
         )
 
 
+_audit_tasks = set()  # background LLM checks of fast-routed queries
+
+
+async def _audit_route(router: FastRouter, decision: RouteDecision, query: str, context: AgentContext):
+    """Run LLM perception off the critical path to measure router accuracy"""
+    perception = await extract_perception(user_input=query, mcp_server_descriptions=context.mcp_server_descriptions,
+                                          prompt_budget=context.agent_profile.prompt_budget_config)
+    if perception.intent != "unknown":
+        router.record_llm_decision(decision, perception.selected_servers, fallback=False)
+
+
+async def _perceive(context: AgentContext, query: str) -> PerceptionResult:
+    """Fast local routing; LLM perception only when the router is not confident"""
+    router = get_router(context)
+    if router is None:
+        return await extract_perception(user_input=query, mcp_server_descriptions=context.mcp_server_descriptions,
+                                          prompt_budget=context.agent_profile.prompt_budget_config)
+
+    try:
+        decision = await router.route(query)
+    except Exception as e:
+        log("perception", f"⚠️ Fast routing failed, using LLM: {e}")
+        return await extract_perception(user_input=query, mcp_server_descriptions=context.mcp_server_descriptions,
+                                          prompt_budget=context.agent_profile.prompt_budget_config)
+
+    if router.confident(decision):
+        router.record_fast_route()
+        log("perception", f"🧭 Fast-routed to {decision.selected_servers} "
+                          f"(confidence {decision.confidence:.2f}, tool_hint={decision.tool_hint})")
+        if router.should_audit():
+            task = asyncio.create_task(_audit_route(router, decision, query, context))
+            _audit_tasks.add(task)
+            task.add_done_callback(_audit_tasks.discard)
+        return PerceptionResult(
+            intent=decision.intent,
+            entities=[],
+            tool_hint=decision.tool_hint,
+            tags=["fast_route"],
+            selected_servers=decision.selected_servers
+        )
+
+    log("perception", f"🧭 Router confidence {decision.confidence:.2f} too low — using LLM perception")
+    perception = await extract_perception(user_input=query, mcp_server_descriptions=context.mcp_server_descriptions,
+                                          prompt_budget=context.agent_profile.prompt_budget_config)
+    if perception.intent != "unknown":
+        router.record_llm_decision(decision, perception.selected_servers, fallback=True)
+    return perception
+
+
+async def _timed(stage: str, timings: Dict[str, float], coro: Awaitable[Any]) -> Any:
+    """Await a perception stage and record its latency in ms"""
+    start = time.perf_counter()
+    try:
+        return await coro
+    finally:
+        timings[stage] = round((time.perf_counter() - start) * 1000, 1)
+
+
+async def _retrieve_history(context: AgentContext, query: str) -> list:
+    """Relevant past conversations (embedding + FAISS search, run in a thread)"""
+    conversation_config = context.agent_profile.memory_config.get("conversation_history", {})
+    if not conversation_config.get("enabled", True):
+        return []
+
+    return await asyncio.to_thread(
+        context.memory.find_relevant_conversations,
+        query=query,
+        top_k=conversation_config.get("top_k", 3),
+        threshold=conversation_config.get("threshold", 0.75),
+        max_age_days=conversation_config.get("max_age_days", None)
+    )
+
+
+@traced("perception")
 async def run_perception(context: AgentContext, user_input: Optional[str] = None):
 
     """
     Clean wrapper to call perception from context.
     Now with heuristics integration and conversation history retrieval.
+
+    Stages:
+        1. redaction  - query heuristics that may rewrite the query (PII, length)
+        2. concurrently, on the rewritten query:
+           history    - relevant conversation retrieval
+           heuristics - remaining (read-only) query heuristics
+           perception - fast router, or the perception LLM call when it is not confident
+    Per-stage latencies (ms) are stored in context.perception_timings.
     """
     query = user_input or context.user_input
+    timings: Dict[str, float] = {}
+    start = time.perf_counter()
 
-    # 🆕 STEP 1: Retrieve relevant conversation history
-    conversation_config = context.agent_profile.memory_config.get("conversation_history", {})
-    if conversation_config.get("enabled", True):
-        history_threshold = conversation_config.get("threshold", 0.75)
-        history_top_k = conversation_config.get("top_k", 3)
-        history_max_age_days = conversation_config.get("max_age_days", None)
-
-        relevant_conversations = context.memory.find_relevant_conversations(
-            query=query,
-            top_k=history_top_k,
-            threshold=history_threshold,
-            max_age_days=history_max_age_days
+    # STEP 1: Rewrite stage; everything below must see the redacted query
+    if context.heuristics:
+        query, rewrite_metadata = await _timed(
+            "redaction", timings, context.heuristics.process_query(query, stage="rewrite")
         )
 
-        if relevant_conversations:
-            log("perception", f"🧠 Found {len(relevant_conversations)} relevant past conversations:")
-            for turn, score in relevant_conversations:
-                log("perception", f"   - Session {turn.session_id[:20]}..., Step {turn.step_number}: '{turn.user_query[:40]}...' (score: {score:.3f})")
+    # STEP 2: Independent stages run concurrently
+    stages = {
+        "history": _retrieve_history(context, query),
+        "perception": _perceive(context, query),
+    }
+    if context.heuristics:
+        stages["heuristics"] = context.heuristics.process_query(query, stage="analysis")
+
+    names = list(stages)
+    outcomes = await asyncio.gather(
+        *(_timed(name, timings, stages[name]) for name in names),
+        return_exceptions=True
+    )
+    outcomes = dict(zip(names, outcomes))
+
+    relevant_conversations = outcomes["history"]
+    if isinstance(relevant_conversations, BaseException):
+        log("perception", f"⚠️ Conversation history retrieval failed: {relevant_conversations}")
+        relevant_conversations = []
 
-            # Store in context for decision module to use
-            context.relevant_conversation_history = relevant_conversations
+    if relevant_conversations:
+        log("perception", f"🧠 Found {len(relevant_conversations)} relevant past conversations:")
+        for turn, score in relevant_conversations:
+            log("perception", f"   - Session {turn.session_id[:20]}..., Step {turn.step_number}: '{turn.user_query[:40]}...' (score: {score:.3f})")
+
+    # Store in context for decision module to use
+    context.relevant_conversation_history = relevant_conversations
+
+    if "heuristics" in outcomes:
+        if isinstance(outcomes["heuristics"], BaseException):
+            log("perception", f"⚠️ Query heuristics failed: {outcomes['heuristics']}")
         else:
-            context.relevant_conversation_history = []
-    else:
-        context.relevant_conversation_history = []
+            _, heuristics_metadata = outcomes["heuristics"]
+            log("perception", f"Heuristics metadata: rewrite={rewrite_metadata}, analysis={heuristics_metadata}")
 
-    # Apply query heuristics if available
-    if context.heuristics:
-        query, heuristics_metadata = await context.heuristics.process_query(query)
-        log("perception", f"Heuristics metadata: {heuristics_metadata}")
+    perception = outcomes["perception"]
+    if isinstance(perception, BaseException):
+        raise perception
 
-    return await extract_perception(
-        user_input=query,
-        mcp_server_descriptions=context.mcp_server_descriptions
-    )
+    timings["total"] = round((time.perf_counter() - start) * 1000, 1)
+    context.perception_timings = timings
+    log("perception", f"⏱️ Stage timings (ms): {timings}")
 
+    return perception
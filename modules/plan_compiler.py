@@ -0,0 +1,152 @@
+# modules/plan_compiler.py
+
+import ast
+import hashlib
+from collections import OrderedDict
+from dataclasses import dataclass
+from types import CodeType
+from typing import Dict, List
+
+
+# Modules a solve() plan may not import
+BANNED_IMPORTS = {
+    "os", "sys", "subprocess", "shutil", "socket", "importlib", "ctypes",
+    "multiprocessing", "threading", "signal", "pathlib", "builtins", "pickle",
+}
+
+# Builtins a solve() plan may not call
+BANNED_CALLS = {
+    "exec", "eval", "compile", "__import__", "open", "input",
+    "globals", "locals", "vars", "breakpoint", "exit", "quit",
+}
+
+# Sandbox methods that dispatch one tool call / a batch of concurrent tool calls
+TOOL_CALL_METHODS = {"call_tool"}
+BATCH_TOOL_CALL_METHODS = {"call_tools"}
+
+PLAN_CACHE_SIZE = 256
+
+
+class PlanValidationError(ValueError):
+    """Raised when a plan fails static validation (before any tool I/O)."""
+
+
+@dataclass
+class CompiledPlan:
+    plan_hash: str
+    code: CodeType
+    is_async: bool
+    tool_call_sites: int
+
+
+class PlanValidator(ast.NodeVisitor):
+    """Walks a plan's AST collecting banned constructs and tool call sites."""
+
+    def __init__(self):
+        self.errors: List[str] = []
+        self.tool_call_sites = 0
+
+    def visit_Import(self, node: ast.Import):
+        for alias in node.names:
+            if alias.name.split(".")[0] in BANNED_IMPORTS:
+                self.errors.append(f"line {node.lineno}: import of '{alias.name}' is not allowed")
+        self.generic_visit(node)
+
+    def visit_ImportFrom(self, node: ast.ImportFrom):
+        module = (node.module or "").split(".")[0]
+        if module in BANNED_IMPORTS:
+            self.errors.append(f"line {node.lineno}: import from '{node.module}' is not allowed")
+        self.generic_visit(node)
+
+    def visit_Call(self, node: ast.Call):
+        func = node.func
+        if isinstance(func, ast.Name) and func.id in BANNED_CALLS:
+            self.errors.append(f"line {node.lineno}: call to '{func.id}()' is not allowed")
+        elif isinstance(func, ast.Attribute) and func.attr in TOOL_CALL_METHODS:
+            self.tool_call_sites += 1
+        elif isinstance(func, ast.Attribute) and func.attr in BATCH_TOOL_CALL_METHODS:
+            # A literal list of calls counts element by element
+            batch = node.args[0] if node.args else None
+            if isinstance(batch, (ast.List, ast.Tuple)):
+                self.tool_call_sites += len(batch.elts)
+            else:
+                self.tool_call_sites += 1
+        self.generic_visit(node)
+
+    def visit_Attribute(self, node: ast.Attribute):
+        if node.attr.startswith("__"):
+            self.errors.append(f"line {node.lineno}: access to '{node.attr}' is not allowed")
+        self.generic_visit(node)
+
+
+class PlanCompiler:
+    """
+    Parses, validates and compiles solve() plans once.
+
+    Code objects are cached by plan hash, so re-running an identical plan
+    (e.g. on a retry) skips parsing and compilation entirely.
+    """
+
+    def __init__(self, max_tool_calls: int, cache_size: int = PLAN_CACHE_SIZE):
+        self.max_tool_calls = max_tool_calls
+        self.cache_size = cache_size
+        self._cache: "OrderedDict[str, CompiledPlan]" = OrderedDict()
+        self.stats = {"hits": 0, "misses": 0, "rejected": 0}
+
+    @staticmethod
+    def plan_hash(code: str) -> str:
+        return hashlib.sha256(code.encode("utf-8", errors="ignore")).hexdigest()
+
+    def compile(self, code: str) -> CompiledPlan:
+        """Return a compiled plan or raise PlanValidationError."""
+        key = self.plan_hash(code)
+        cached = self._cache.get(key)
+        if cached is not None:
+            self._cache.move_to_end(key)
+            self.stats["hits"] += 1
+            return cached
+
+        self.stats["misses"] += 1
+        try:
+            compiled = self._compile(code, key)
+        except PlanValidationError:
+            self.stats["rejected"] += 1
+            raise
+
+        self._cache[key] = compiled
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+        return compiled
+
+    def _compile(self, code: str, key: str) -> CompiledPlan:
+        try:
+            tree = ast.parse(code, filename="<solve_plan>", mode="exec")
+        except SyntaxError as e:
+            raise PlanValidationError(f"Syntax error in plan at line {e.lineno}: {e.msg}")
+
+        solve_defs = [
+            node for node in tree.body
+            if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)) and node.name == "solve"
+        ]
+        if not solve_defs:
+            raise PlanValidationError("No solve() function found in plan.")
+
+        validator = PlanValidator()
+        validator.visit(tree)
+        if validator.errors:
+            raise PlanValidationError("Plan uses banned constructs: " + "; ".join(validator.errors))
+
+        if validator.tool_call_sites > self.max_tool_calls:
+            raise PlanValidationError(
+                f"Plan has {validator.tool_call_sites} tool call sites (max {self.max_tool_calls})."
+            )
+
+        return CompiledPlan(
+            plan_hash=key,
+            code=compile(tree, "<solve_plan>", "exec"),
+            is_async=isinstance(solve_defs[-1], ast.AsyncFunctionDef),
+            tool_call_sites=validator.tool_call_sites,
+        )
+
+    def get_stats(self) -> Dict[str, int]:
+        return {**self.stats, "size": len(self._cache)}
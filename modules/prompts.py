@@ -0,0 +1,153 @@
+# modules/prompts.py
+
+import os
+import string
+from typing import Any, Dict, List, Optional, Tuple
+
+
+# Optional logging fallback
+try:
+    from agent import log
+except ImportError:
+    import datetime
+    def log(stage: str, msg: str):
+        now = datetime.datetime.now().strftime("%H:%M:%S")
+        print(f"[{now}] [{stage}] {msg}")
+
+
+TRUNCATION_MARKER = "\n...[truncated]...\n"
+
+# Sections not listed in profiles.yaml `prompt_budget.sections` are never truncated
+DEFAULT_PROMPT_BUDGET = {
+    "max_prompt_tokens": 6000,
+    "sections": {},
+}
+
+_formatter = string.Formatter()
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (~4 characters per token)"""
+    return max(1, len(text) // 4)
+
+
+class PromptTemplate:
+    """
+    A prompt file parsed once into literal text and `{field}` slots.
+
+    Rendering joins the pre-split segments instead of re-parsing the template
+    with str.format on every call; the output is the same.
+    """
+
+    def __init__(self, path: str, text: str, mtime: float):
+        self.path = path
+        self.text = text
+        self.mtime = mtime
+        # (literal, field_name, format_spec, conversion) as yielded by string.Formatter
+        try:
+            self.segments: List[Tuple[str, Optional[str], str, Optional[str]]] = list(_formatter.parse(text))
+        except ValueError:
+            self.segments = [(text, None, "", None)]  # not a format template; only .text is usable
+        self.fields = [field for _, field, _, _ in self.segments if field is not None]
+        self.literal_tokens = estimate_tokens("".join(literal for literal, _, _, _ in self.segments))
+
+    def render(self, **values: Any) -> str:
+        parts = []
+        for literal, field, format_spec, conversion in self.segments:
+            parts.append(literal)
+            if field is None:
+                continue
+            value = values[field]  # KeyError for a missing field, like str.format
+            if conversion:
+                value = _formatter.convert_field(value, conversion)
+            parts.append(format(value, format_spec) if format_spec else str(value))
+        return "".join(parts)
+
+
+_templates: Dict[str, PromptTemplate] = {}
+
+
+def get_template(path: str) -> PromptTemplate:
+    """
+    Cached template for a prompt file.
+
+    The file is re-read only when its mtime changes, so edits to prompts/
+    are picked up without a restart.
+    """
+    mtime = os.stat(path).st_mtime
+    template = _templates.get(path)
+    if template is None or template.mtime != mtime:
+        with open(path, "r", encoding="utf-8") as f:
+            template = PromptTemplate(path, f.read(), mtime)
+        _templates[path] = template
+    return template
+
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    """Keep the head and the tail (instructions often sit at the end of a section)"""
+    if estimate_tokens(text) <= max_tokens:
+        return text
+    max_chars = max(0, max_tokens * 4 - len(TRUNCATION_MARKER))
+    head = (max_chars * 2) // 3
+    tail = max_chars - head
+    return text[:head] + TRUNCATION_MARKER + (text[-tail:] if tail else "")
+
+
+class PromptBudget:
+    """
+    Per-section token budgets with priority-based truncation.
+
+    Config (profiles.yaml `prompt_budget`):
+        max_prompt_tokens: whole rendered prompt
+        sections: {name: {max_tokens: int, priority: int}}; priority 1 is
+                  truncated last
+    """
+
+    def __init__(self, config: Optional[Dict[str, Any]] = None):
+        config = {**DEFAULT_PROMPT_BUDGET, **(config or {})}
+        self.max_prompt_tokens = config["max_prompt_tokens"]
+        self.sections = config.get("sections") or {}
+
+    def fit(self, values: Dict[str, Any], fixed_tokens: int = 0) -> Dict[str, Any]:
+        """Return values with budgeted sections truncated to fit"""
+        fitted = dict(values)
+        truncated = []
+
+        # 1. Per-section caps
+        for name, rules in self.sections.items():
+            if not isinstance(fitted.get(name), str) or not rules.get("max_tokens"):
+                continue
+            text = truncate_to_tokens(fitted[name], rules["max_tokens"])
+            if text != fitted[name]:
+                fitted[name] = text
+                truncated.append(name)
+
+        # 2. Whole-prompt budget: shrink lowest-priority sections first
+        total = fixed_tokens + sum(estimate_tokens(str(value)) for value in fitted.values())
+        overflow = total - self.max_prompt_tokens
+        by_priority = sorted(
+            (name for name in self.sections if isinstance(fitted.get(name), str)),
+            key=lambda name: self.sections[name].get("priority", 99),
+            reverse=True
+        )
+        for name in by_priority:
+            if overflow <= 0:
+                break
+            current = estimate_tokens(fitted[name])
+            target = max(0, current - overflow)
+            fitted[name] = truncate_to_tokens(fitted[name], target) if target else ""
+            remaining = estimate_tokens(fitted[name]) if fitted[name] else 0
+            overflow -= current - remaining
+            if name not in truncated:
+                truncated.append(name)
+
+        if truncated:
+            log("prompt", f"✂️ Truncated sections to fit budget: {truncated}")
+        return fitted
+
+
+def render_prompt(path: str, budget_config: Optional[Dict[str, Any]] = None, **values: Any) -> str:
+    """Render a prompt file with its sections fitted to the token budget"""
+    template = get_template(path)
+    budget = PromptBudget(budget_config)
+    return template.render(**budget.fit(values, fixed_tokens=template.literal_tokens))
@@ -0,0 +1,348 @@
+# modules/router.py
+
+import asyncio
+import random
+import time
+from collections import deque
+from typing import Any, Callable, Dict, List, NamedTuple, Optional
+
+import numpy as np
+
+
+# Optional logging fallback
+try:
+    from agent import log
+except ImportError:
+    import datetime
+    def log(stage: str, msg: str):
+        now = datetime.datetime.now().strftime("%H:%M:%S")
+        print(f"[{now}] [{stage}] {msg}")
+
+
+DEFAULT_ROUTING_CONFIG = {
+    "enabled": False,               # off until min_confidence is calibrated for the embedder (see calibrate())
+    "min_confidence": 0.65,         # below this, fall back to LLM perception
+    "multi_server_margin": 0.05,    # also select servers scoring within this of the best one
+    "intent_boost": 0.1,            # added when an intent rule agrees with the nearest server
+    "intent_only_confidence": 0.5,  # confidence when only intent rules match (no usable embeddings)
+    "audit_sample_rate": 0.1,       # share of fast-routed queries re-checked by the LLM in background
+    "embed_retry_seconds": 30,      # wait before re-embedding documents that failed (embedder down)
+    "calibration_target_accuracy": 0.95,  # agreement with the LLM that calibrate() aims for
+    "calibration_window": 500,      # most recent LLM-checked routes kept for calibration
+    "calibration_min_samples": 50,  # no suggestion (and no log) before this many
+    "intent_rules": {},             # intent → [server ids]
+}
+
+
+class RouteDecision(NamedTuple):
+    """Outcome of local routing for one query"""
+    selected_servers: List[str]
+    tool_hint: Optional[str]
+    intent: str
+    confidence: float
+    scores: Dict[str, float]
+
+
+class FastRouter:
+    """
+    Local perception router.
+
+    Server descriptions/capabilities and tool descriptions are embedded once;
+    a query is routed to the nearest servers, with intent rules from
+    profiles.yaml (`routing.intent_rules`) layered on top. Callers fall back to
+    LLM perception when `confident()` is False, and report the LLM decision via
+    `record_llm_decision` so routing accuracy can be tracked.
+
+    Confidence is a raw cosine similarity (plus the intent boost), so its scale
+    depends on the embedding model; min_confidence has to be calibrated against
+    LLM-checked routes (see calibrate()).
+    """
+
+    def __init__(
+        self,
+        server_descriptions: Dict[str, dict],
+        server_tools: Dict[str, List[Any]],
+        config: Optional[Dict[str, Any]] = None,
+        intent_classifier: Any = None,
+        embed_fn: Optional[Callable[[str], Any]] = None,
+        registry: Any = None,
+    ):
+        self.config = {**DEFAULT_ROUTING_CONFIG, **(config or {})}
+        self.server_descriptions = server_descriptions
+        self.server_tools = server_tools
+        self.intent_classifier = intent_classifier
+        self._embed_fn = embed_fn
+        self.registry = registry  # ToolRegistry: reuse its tool and query embeddings
+
+        # Parallel arrays: one row per routing document (server blurb or tool)
+        self._doc_servers: List[str] = []
+        self._doc_tools: List[Optional[str]] = []
+        self._doc_vectors: List[Optional[np.ndarray]] = []  # None until embedded successfully
+        self._doc_matrix: Optional[np.ndarray] = None
+        self._prepared = False
+        self._last_prepare: Optional[float] = None
+        self._prepare_lock = asyncio.Lock()
+
+        self.stats = {
+            "routed": 0,
+            "fast_routed": 0,
+            "llm_fallbacks": 0,
+            "audited": 0,
+            "agreements": 0,
+        }
+        self._calibration = deque(maxlen=int(self.config["calibration_window"]))  # (confidence, agreed)
+
+    def _get_embed_fn(self) -> Callable[[str], Any]:
+        if self._embed_fn is None:
+            from modules.memory import get_embedding
+            self._embed_fn = get_embedding
+        return self._embed_fn
+
+    def _documents(self) -> List[tuple]:
+        """(server_id, tool_name, text) for every server and tool"""
+        documents = []
+        for server_id, info in self.server_descriptions.items():
+            capabilities = ", ".join(info.get("capabilities", []))
+            documents.append((server_id, None, f"{info.get('description', '')} Capabilities: {capabilities}"))
+            for tool in self.server_tools.get(server_id, []):
+                description = getattr(tool, "description", "") or ""
+                documents.append((server_id, tool.name, f"{tool.name}: {description}"))
+        return documents
+
+    @staticmethod
+    def _normalize(matrix: np.ndarray) -> np.ndarray:
+        norms = np.linalg.norm(matrix, axis=-1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return matrix / norms
+
+    @staticmethod
+    def _usable(vector: Any) -> Optional[np.ndarray]:
+        """The vector, or None for a failed embedding (get_embedding returns zeros when the embedder is down)"""
+        if vector is None:
+            return None
+        vector = np.asarray(vector, dtype=np.float32).ravel()
+        if vector.size == 0 or not np.all(np.isfinite(vector)) or not np.any(vector):
+            return None
+        return vector
+
+    async def prepare(self):
+        """
+        Embed the routing documents (blocking embedding calls run in a thread).
+
+        Only documents that embedded successfully are kept. The router counts as
+        prepared once all of them have; until then, failed documents are retried
+        every `embed_retry_seconds`. With no usable rows, route_vector falls back
+        to intent rules, and below min_confidence perception asks the LLM.
+        """
+        async with self._prepare_lock:
+            if self._prepared:
+                return
+            if self._last_prepare is not None and time.monotonic() - self._last_prepare < self.config["embed_retry_seconds"]:
+                return
+            self._last_prepare = time.monotonic()
+
+            documents = self._documents()
+            if len(self._doc_vectors) != len(documents):
+                self._doc_vectors = [None] * len(documents)
+            embed = self._get_embed_fn()
+            known = getattr(self.registry, "embeddings", None) or {}
+            pending = [i for i, vector in enumerate(self._doc_vectors) if vector is None]
+
+            def embed_documents():
+                vectors = []
+                for i in pending:
+                    _, tool_name, text = documents[i]
+                    try:
+                        vectors.append(known[tool_name] if tool_name in known else embed(text))
+                    except Exception:
+                        vectors.append(None)
+                return vectors
+
+            for i, vector in zip(pending, await asyncio.to_thread(embed_documents)):
+                self._doc_vectors[i] = self._usable(vector)
+
+            self._doc_servers = [server_id for server_id, _, _ in documents]
+            self._doc_tools = [tool_name for _, tool_name, _ in documents]
+            embedded = [vector for vector in self._doc_vectors if vector is not None]
+            if embedded and len({vector.shape for vector in embedded}) == 1:
+                dimension = embedded[0].shape
+                self._doc_matrix = self._normalize(np.vstack([
+                    vector if vector is not None else np.zeros(dimension, dtype=np.float32)
+                    for vector in self._doc_vectors
+                ]))
+            else:
+                self._doc_matrix = None
+
+            self._prepared = len(embedded) == len(documents) and self._doc_matrix is not None
+            if self._prepared:
+                log("router", f"🧭 Router index ready ({len(documents)} documents, {len(self.server_descriptions)} servers)")
+            else:
+                log("router", f"⚠️ Router index incomplete ({len(embedded)}/{len(documents)} documents embedded), "
+                              f"retrying in {self.config['embed_retry_seconds']}s")
+
+    def _classify(self, query: str) -> List[str]:
+        if self.intent_classifier is None:
+            return []
+        return self.intent_classifier.classify(query)
+
+    def route_vector(self, query: str, query_vec: Any) -> RouteDecision:
+        """Route a query given its embedding"""
+        intents = self._classify(query)
+        intent = intents[0] if intents else "general"
+
+        rule_servers = []
+        for name in intents:
+            for server_id in self.config["intent_rules"].get(name, []) or []:
+                if server_id in self.server_descriptions and server_id not in rule_servers:
+                    rule_servers.append(server_id)
+
+        # Nearest documents per server (zero vectors mean embeddings are unavailable)
+        scores: Dict[str, float] = {}
+        tool_scores: Dict[str, float] = {}
+        query_vec = np.asarray(query_vec, dtype=np.float32)
+        if self._doc_matrix is not None and np.any(query_vec):
+            similarities = self._doc_matrix @ self._normalize(query_vec)
+            for server_id, tool_name, similarity in zip(self._doc_servers, self._doc_tools, similarities):
+                similarity = float(similarity)
+                scores[server_id] = max(scores.get(server_id, -1.0), similarity)
+                if tool_name is not None:
+                    tool_scores[tool_name] = max(tool_scores.get(tool_name, -1.0), similarity)
+
+        if scores:
+            ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)
+            best_server, best_score = ranked[0]
+            margin = self.config["multi_server_margin"]
+            selected = [server_id for server_id, score in ranked if score >= best_score - margin]
+            confidence = best_score
+            if best_server in rule_servers:
+                confidence += self.config["intent_boost"]
+            for server_id in rule_servers:
+                if server_id not in selected:
+                    selected.append(server_id)
+        elif rule_servers:
+            selected = rule_servers
+            confidence = self.config["intent_only_confidence"]
+        else:
+            selected = list(self.server_descriptions.keys())
+            confidence = 0.0
+
+        tool_hint = None
+        candidate_tools = {
+            tool.name for server_id in selected for tool in self.server_tools.get(server_id, [])
+        }
+        ranked_tools = sorted(
+            ((name, score) for name, score in tool_scores.items() if name in candidate_tools),
+            key=lambda item: item[1], reverse=True
+        )
+        if ranked_tools:
+            tool_hint = ranked_tools[0][0]
+
+        return RouteDecision(
+            selected_servers=selected,
+            tool_hint=tool_hint,
+            intent=intent,
+            confidence=min(confidence, 1.0),
+            scores=scores,
+        )
+
+    async def route(self, query: str) -> RouteDecision:
+        """Embed the query and route it"""
+        await self.prepare()
+        if self.registry is not None:
+            query_vec = await self.registry.embed_query(query)
+        else:
+            query_vec = await asyncio.to_thread(self._get_embed_fn(), query)
+        decision = self.route_vector(query, query_vec)
+        self.stats["routed"] += 1
+        return decision
+
+    def confident(self, decision: RouteDecision) -> bool:
+        return decision.confidence >= self.config["min_confidence"]
+
+    def should_audit(self) -> bool:
+        return random.random() < self.config["audit_sample_rate"]
+
+    def record_fast_route(self):
+        self.stats["fast_routed"] += 1
+
+    def record_llm_decision(self, decision: RouteDecision, llm_servers: List[str], fallback: bool):
+        """
+        Compare the router's choice with the LLM's.
+
+        A route counts as correct when its best server is one the LLM selected.
+        """
+        if fallback:
+            self.stats["llm_fallbacks"] += 1
+        self.stats["audited"] += 1
+        agreed = bool(decision.selected_servers) and decision.selected_servers[0] in llm_servers
+        if agreed:
+            self.stats["agreements"] += 1
+
+        self._calibration.append((decision.confidence, agreed))
+        min_samples = self.config["calibration_min_samples"]
+        if len(self._calibration) >= min_samples and self.stats["audited"] % min_samples == 0:
+            suggested = self.calibrate()
+            log("router", f"🎯 Calibration over {len(self._calibration)} checked routes: "
+                          f"min_confidence {suggested if suggested is None else round(suggested, 3)} "
+                          f"reaches {self.config['calibration_target_accuracy']:.0%} agreement "
+                          f"(configured {self.config['min_confidence']})")
+
+    def calibrate(self) -> Optional[float]:
+        """
+        Lowest min_confidence at which the router agrees with the LLM on at least
+        `calibration_target_accuracy` of the checked routes scoring that high.
+
+        Checked routes come from LLM fallbacks (below min_confidence) and audits
+        (above it). To calibrate from scratch, run with min_confidence above 1.0:
+        every query then goes to the LLM and is recorded. None until
+        `calibration_min_samples` routes were checked, or when no threshold
+        reaches the target.
+        """
+        if len(self._calibration) < self.config["calibration_min_samples"]:
+            return None
+        target = self.config["calibration_target_accuracy"]
+        suggested = None
+        agreements = 0
+        ranked = sorted(self._calibration, key=lambda sample: sample[0], reverse=True)
+        for count, (confidence, agreed) in enumerate(ranked, 1):
+            agreements += agreed
+            if agreements / count >= target:
+                suggested = confidence
+        return suggested
+
+    def get_stats(self) -> Dict[str, Any]:
+        audited = self.stats["audited"]
+        routed = self.stats["routed"]
+        return {
+            **self.stats,
+            "accuracy": self.stats["agreements"] / audited if audited else None,
+            "fast_route_rate": self.stats["fast_routed"] / routed if routed else None,
+            "suggested_min_confidence": self.calibrate(),
+        }
+
+
+_router: Optional[FastRouter] = None
+_router_key: Optional[tuple] = None
+
+
+def get_router(context: Any) -> Optional[FastRouter]:
+    """
+    Shared router for the context's servers and dispatcher, or None when routing
+    is disabled in profiles.yaml.
+    """
+    global _router, _router_key
+    config = getattr(context.agent_profile, "routing_config", None) or {}
+    if not config.get("enabled", DEFAULT_ROUTING_CONFIG["enabled"]):
+        return None
+
+    key = (id(context.dispatcher), tuple(context.mcp_server_descriptions.keys()))
+    if _router is None or _router_key != key:
+        _router = FastRouter(
+            server_descriptions=context.mcp_server_descriptions,
+            server_tools=getattr(context.dispatcher, "server_tools", {}) or {},
+            config=config,
+            intent_classifier=getattr(context.heuristics, "query_intent_classifier", None),
+            registry=getattr(context.dispatcher, "tool_registry", None),
+        )
+        _router_key = key
+    return _router
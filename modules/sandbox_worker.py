@@ -0,0 +1,404 @@
+# modules/sandbox_worker.py
+#
+# Isolated execution of solve() plans in a separate interpreter.
+#
+# Parent side: SandboxWorker starts `python -m modules.sandbox_worker`, sends it a
+# plan and serves its tool calls through the parent's SandboxMCP (so call limits,
+# timeouts and the session tool cache all still apply).
+# Child side: worker_main() executes plans under CPU/memory limits and proxies
+# every mcp.call_tool() back to the parent over a JSON-lines protocol.
+# SandboxWorkerPool keeps pre-warmed workers around so a plan does not pay for
+# interpreter startup, and recycles them after a number of plans.
+
+import asyncio
+import datetime
+import json
+import os
+import re
+import signal
+import sys
+import types
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+try:
+    import resource  # POSIX only
+except ImportError:
+    resource = None
+
+# Worker children import this module: no `from agent import log` (it would load the whole
+# agent into every worker), and stderr only (stdout is the worker's protocol channel)
+def log(stage: str, msg: str):
+    now = datetime.datetime.now().strftime("%H:%M:%S")
+    sys.stderr.write(f"[{now}] [{stage}] {msg}\n")
+    sys.stderr.flush()
+
+ROOT = Path(__file__).parent.parent.resolve()
+STREAM_LIMIT = 16 * 1024 * 1024  # max bytes per protocol line
+
+
+class WorkerCrashed(RuntimeError):
+    """Raised when the worker process exits while running a plan."""
+
+
+def format_solve_result(result: Any) -> str:
+    """Clean result formatting shared by in-process and isolated execution"""
+    if isinstance(result, dict) and "result" in result:
+        return f"{result['result']}"
+    elif isinstance(result, dict):
+        return f"{json.dumps(result)}"
+    elif isinstance(result, list):
+        return f"{' '.join(str(r) for r in result)}"
+    return f"{result}"
+
+
+def serialize_tool_result(result: Any) -> Dict[str, Any]:
+    """Turn an MCP CallToolResult (pydantic) or plain value into JSON"""
+    if hasattr(result, "model_dump"):
+        return {"kind": "object", "data": result.model_dump(mode="json")}
+    if isinstance(result, (dict, list, str, int, float, bool)) or result is None:
+        return {"kind": "value", "data": result}
+    return {"kind": "value", "data": str(result)}
+
+
+def _to_namespace(data: Any) -> Any:
+    if isinstance(data, dict):
+        return types.SimpleNamespace(**{key: _to_namespace(value) for key, value in data.items()})
+    if isinstance(data, list):
+        return [_to_namespace(item) for item in data]
+    return data
+
+
+def deserialize_tool_result(payload: Dict[str, Any]) -> Any:
+    """Rebuild a tool result so plans can keep using result.content[0].text"""
+    if payload.get("kind") == "object":
+        return _to_namespace(payload["data"])
+    return payload.get("data")
+
+
+# ==================== PARENT SIDE ====================
+
+class SandboxWorker:
+    """One isolated interpreter that runs solve() plans."""
+
+    def __init__(self, cpu_seconds: Optional[float] = None, memory_mb: Optional[int] = None):
+        self.cpu_seconds = cpu_seconds
+        self.memory_mb = memory_mb
+        self.process: Optional[asyncio.subprocess.Process] = None
+        self.plans_run = 0
+        self._starting: Optional[asyncio.Future] = None
+
+    @property
+    def alive(self) -> bool:
+        return self.process is not None and self.process.returncode is None
+
+    async def start(self):
+        self.process = await asyncio.create_subprocess_exec(
+            sys.executable, "-m", "modules.sandbox_worker",
+            stdin=asyncio.subprocess.PIPE,
+            stdout=asyncio.subprocess.PIPE,
+            cwd=str(ROOT),
+            limit=STREAM_LIMIT,
+        )
+        self._send({"type": "configure", "memory_mb": self.memory_mb})
+
+    async def ensure_started(self):
+        """Start once; concurrent callers wait on the same startup"""
+        if self._starting is None:
+            self._starting = asyncio.ensure_future(self.start())
+        await self._starting
+
+    def _send(self, message: Dict[str, Any]):
+        self.process.stdin.write((json.dumps(message, default=str) + "\n").encode("utf-8"))
+
+    async def run_plan(self, code: str, sandbox_mcp: Any, timeout: Optional[float] = None) -> str:
+        """
+        Run a plan and return its formatted result.
+
+        Raises asyncio.TimeoutError on deadline, WorkerCrashed if the process dies
+        (e.g. CPU limit), RuntimeError for errors raised inside the plan.
+        """
+        self.plans_run += 1
+        plan_id = self.plans_run
+        self._send({"type": "run", "plan_id": plan_id, "code": code, "cpu_seconds": self.cpu_seconds})
+        tool_tasks = set()
+
+        async def serve():
+            while True:
+                line = await self.process.stdout.readline()
+                if not line:
+                    await self.process.wait()
+                    raise WorkerCrashed(self._exit_reason())
+
+                message = json.loads(line)
+                if message.get("plan_id") != plan_id:
+                    continue  # late message from an earlier plan on this worker
+                if message["type"] == "tool_call":
+                    task = asyncio.create_task(self._handle_tool_call(message, sandbox_mcp))
+                    tool_tasks.add(task)
+                    task.add_done_callback(tool_tasks.discard)
+                elif message["type"] == "done":
+                    return message["result"]
+                elif message["type"] == "error":
+                    raise RuntimeError(message["error"])
+
+        try:
+            return await asyncio.wait_for(serve(), timeout=timeout)
+        finally:
+            # Cancellation reaches in-flight MCP calls started on behalf of the plan
+            for task in list(tool_tasks):
+                task.cancel()
+
+    async def _handle_tool_call(self, message: Dict[str, Any], sandbox_mcp: Any):
+        try:
+            result = await sandbox_mcp.call_tool(message["tool"], message["input"])
+            reply = {"type": "tool_result", "call_id": message["call_id"], "ok": True,
+                     "result": serialize_tool_result(result)}
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            reply = {"type": "tool_result", "call_id": message["call_id"], "ok": False, "error": str(e)}
+
+        if self.alive:
+            self._send(reply)
+
+    def _exit_reason(self) -> str:
+        code = self.process.returncode
+        if code is not None and code < 0 and hasattr(signal, "SIGXCPU") and -code == signal.SIGXCPU:
+            return f"Plan exceeded CPU limit ({self.cpu_seconds}s)"
+        return f"Sandbox worker exited unexpectedly (code {code})"
+
+    def kill(self):
+        if self.alive:
+            self.process.kill()
+
+    async def close(self):
+        if not self.alive:
+            return
+        try:
+            self._send({"type": "shutdown"})
+            await asyncio.wait_for(self.process.wait(), timeout=2)
+        except Exception:
+            self.kill()
+
+
+class SandboxWorkerPool:
+    """
+    Fixed-size pool of pre-warmed SandboxWorkers.
+
+    Each worker runs one plan at a time. A worker is replaced after
+    max_plans_per_worker plans, or right away if it was killed (deadline, CPU
+    limit, crash). Plans wait in FIFO order for a free worker; queue_depth is the
+    number of plans currently waiting.
+    """
+
+    def __init__(
+        self,
+        size: int = 2,
+        max_plans_per_worker: int = 50,
+        cpu_seconds: Optional[float] = None,
+        memory_mb: Optional[int] = None,
+    ):
+        self.size = max(1, int(size))
+        self.max_plans_per_worker = max_plans_per_worker
+        self.cpu_seconds = cpu_seconds
+        self.memory_mb = memory_mb
+        self._idle: "asyncio.Queue[SandboxWorker]" = asyncio.Queue()
+        self._workers: List[SandboxWorker] = []
+        self._background: set = set()
+        self.queue_depth = 0
+        self.stats = {"plans": 0, "recycled": 0, "replaced": 0, "max_queue_depth": 0}
+
+    def _new_worker(self) -> SandboxWorker:
+        worker = SandboxWorker(cpu_seconds=self.cpu_seconds, memory_mb=self.memory_mb)
+        self._workers.append(worker)
+        self._spawn_background(worker.ensure_started())
+        return worker
+
+    def _spawn_background(self, coro):
+        task = asyncio.ensure_future(coro)
+        self._background.add(task)
+        task.add_done_callback(self._background.discard)
+        # Startup failures surface to the plan that picks the worker up
+        task.add_done_callback(lambda t: t.cancelled() or t.exception())
+
+    async def start(self):
+        """Pre-warm every worker"""
+        for _ in range(self.size - len(self._workers)):
+            self._idle.put_nowait(self._new_worker())
+        await asyncio.gather(*(worker.ensure_started() for worker in self._workers), return_exceptions=True)
+        log("sandbox", f"🏊 Sandbox worker pool ready ({self.size} workers)")
+
+    async def run_plan(self, code: str, sandbox_mcp: Any, timeout: Optional[float] = None) -> str:
+        self.queue_depth += 1
+        self.stats["max_queue_depth"] = max(self.stats["max_queue_depth"], self.queue_depth)
+        try:
+            worker = await self._idle.get()
+        finally:
+            self.queue_depth -= 1
+
+        reusable = False
+        try:
+            await worker.ensure_started()
+            self.stats["plans"] += 1
+            result = await worker.run_plan(code, sandbox_mcp, timeout=timeout)
+            reusable = True
+            return result
+        except WorkerCrashed:
+            raise
+        except RuntimeError:
+            # Error raised inside the plan; the worker itself is fine
+            reusable = worker.alive
+            raise
+        finally:
+            self._release(worker, reusable)
+
+    def _release(self, worker: SandboxWorker, reusable: bool):
+        if reusable and worker.alive and worker.plans_run < self.max_plans_per_worker:
+            self._idle.put_nowait(worker)
+            return
+
+        if reusable:
+            self.stats["recycled"] += 1
+            self._spawn_background(worker.close())
+        else:
+            # Deadline, CPU limit or crash: the worker may still be running the plan
+            self.stats["replaced"] += 1
+            worker.kill()
+            self._spawn_background(worker.close())  # reap the process
+        self._workers.remove(worker)
+        self._idle.put_nowait(self._new_worker())
+
+    async def close(self):
+        workers, self._workers = self._workers, []
+        await asyncio.gather(*(worker.close() for worker in workers), return_exceptions=True)
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            **self.stats,
+            "size": self.size,
+            "idle": self._idle.qsize(),
+            "queue_depth": self.queue_depth,
+        }
+
+
+# ==================== CHILD SIDE ====================
+
+class ProxyMCP:
+    """`mcp` object inside the worker; forwards every tool call to the parent."""
+
+    def __init__(self, send, pending: Dict[int, asyncio.Future], plan_id: Any = None):
+        self._send = send
+        self._pending = pending
+        self._plan_id = plan_id
+        self._next_id = 0
+
+    async def call_tool(self, tool_name: str, input_dict: dict):
+        self._next_id += 1
+        call_id = (self._plan_id, self._next_id)
+        future = asyncio.get_running_loop().create_future()
+        self._pending[call_id] = future
+        self._send({"type": "tool_call", "plan_id": self._plan_id, "call_id": call_id,
+                    "tool": tool_name, "input": input_dict})
+        try:
+            return await future
+        finally:
+            self._pending.pop(call_id, None)
+
+    async def call_tools(self, calls, return_exceptions: bool = False):
+        normalized = []
+        for call in calls:
+            if isinstance(call, dict):
+                normalized.append((call["tool"], call.get("input", {})))
+            else:
+                tool_name, input_dict = call
+                normalized.append((tool_name, input_dict))
+        return await asyncio.gather(
+            *(self.call_tool(tool_name, input_dict) for tool_name, input_dict in normalized),
+            return_exceptions=return_exceptions
+        )
+
+
+def _apply_memory_limit(memory_mb: Optional[int]):
+    if resource is None or not memory_mb:
+        return
+    limit = int(memory_mb) * 1024 * 1024
+    _, hard = resource.getrlimit(resource.RLIMIT_AS)
+    if hard != resource.RLIM_INFINITY:
+        limit = min(limit, hard)
+    resource.setrlimit(resource.RLIMIT_AS, (limit, hard))
+
+
+def _apply_cpu_limit(cpu_seconds: Optional[float]):
+    """CPU limit is cumulative per process, so budget from current usage"""
+    if resource is None or not cpu_seconds:
+        return
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    used = int(usage.ru_utime + usage.ru_stime)
+    _, hard = resource.getrlimit(resource.RLIMIT_CPU)
+    soft = used + int(cpu_seconds) + 1
+    if hard != resource.RLIM_INFINITY:
+        soft = min(soft, hard)
+    resource.setrlimit(resource.RLIMIT_CPU, (soft, hard))
+
+
+async def worker_main():
+    from modules.plan_compiler import PlanCompiler
+
+    # Protocol goes to the original stdout; anything the plan prints goes to stderr
+    protocol_out = os.fdopen(os.dup(sys.stdout.fileno()), "wb", buffering=0)
+    os.dup2(sys.stderr.fileno(), sys.stdout.fileno())
+    sys.stdout = sys.stderr
+
+    def send(message: Dict[str, Any]):
+        protocol_out.write((json.dumps(message, default=str) + "\n").encode("utf-8"))
+
+    # Blocking reads in a thread work on every platform's event loop
+    loop = asyncio.get_running_loop()
+    stdin = sys.stdin.buffer
+
+    compiler = PlanCompiler(max_tool_calls=sys.maxsize)
+    pending: Dict[Any, asyncio.Future] = {}
+
+    async def run_plan(plan_id: Any, code: str):
+        try:
+            compiled = compiler.compile(code)
+            sandbox = types.ModuleType("sandbox")
+            sandbox.mcp = ProxyMCP(send, pending, plan_id)
+            sandbox.__dict__["json"] = json
+            sandbox.__dict__["re"] = re
+            exec(compiled.code, sandbox.__dict__)
+
+            solve_fn = sandbox.__dict__.get("solve")
+            if asyncio.iscoroutinefunction(solve_fn):
+                result = await solve_fn()
+            else:
+                result = solve_fn()
+            send({"type": "done", "plan_id": plan_id, "result": format_solve_result(result)})
+        except Exception as e:
+            send({"type": "error", "plan_id": plan_id, "error": str(e)})
+
+    while True:
+        line = await loop.run_in_executor(None, stdin.readline)
+        if not line:
+            break
+        message = json.loads(line)
+
+        if message["type"] == "configure":
+            _apply_memory_limit(message.get("memory_mb"))
+        elif message["type"] == "run":
+            _apply_cpu_limit(message.get("cpu_seconds"))
+            asyncio.create_task(run_plan(message.get("plan_id"), message["code"]))
+        elif message["type"] == "tool_result":
+            future = pending.get(tuple(message["call_id"]))
+            if future is not None and not future.done():
+                if message["ok"]:
+                    future.set_result(deserialize_tool_result(message["result"]))
+                else:
+                    future.set_exception(RuntimeError(message["error"]))
+        elif message["type"] == "shutdown":
+            break
+
+
+if __name__ == "__main__":
+    asyncio.run(worker_main())
@@ -2,6 +2,10 @@
 
 from typing import List, Dict, Optional, Any
 import re
+import ast
+import json
+import builtins
+from modules.prompts import get_template
 
 def extract_json_block(text: str) -> str:
     match = re.search(r"```json\n(.*?)```", text, re.DOTALL)
@@ -10,6 +14,148 @@ def extract_json_block(text: str) -> str:
     return text.strip()
 
 
+SOLVE_DEF_PATTERN = re.compile(r"^([ \t]*)(async[ \t]+)?def[ \t]+solve[ \t]*\(", re.MULTILINE)
+
+# Names the sandbox provides to every plan (modules/action.py, modules/sandbox_worker.py)
+SANDBOX_GLOBALS = {"mcp", "json", "re"}
+
+
+def _unresolved_names(tree: ast.AST) -> set:
+    """Names read in the code but bound nowhere in it, in builtins or by the sandbox"""
+    loaded, bound = set(), set(dir(builtins)) | SANDBOX_GLOBALS
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Name):
+            (loaded if isinstance(node.ctx, ast.Load) else bound).add(node.id)
+        elif isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+            bound.add(node.name)
+        elif isinstance(node, ast.arg):
+            bound.add(node.arg)
+        elif isinstance(node, ast.alias):
+            bound.add((node.asname or node.name).split(".")[0])
+        elif isinstance(node, ast.ExceptHandler) and node.name:
+            bound.add(node.name)
+    return loaded - bound
+
+
+class SolvePlanParser:
+    """
+    Incremental parser for streamed planning output.
+
+    feed() returns the plan as soon as a complete solve() function has arrived,
+    so generation can stop there: at the closing fence, or at the next dedented
+    line once the code so far parses and every name it uses is defined (helpers
+    and constants may follow solve()). Unfenced code that still needs more is
+    returned whole by the caller at end of stream. Sets `aborted` when no solve()
+    shows up within max_preamble_chars.
+    """
+
+    def __init__(self, max_preamble_chars: int = 2000):
+        self.max_preamble_chars = max_preamble_chars
+        self.text = ""
+        self.aborted = False
+
+    def _code_starts(self, def_start: int) -> List[int]:
+        """Where the code may begin: after an opening fence, at the top, or at the def itself"""
+        starts = []
+        fence = self.text.rfind("```", 0, def_start)
+        if fence != -1:
+            starts.append(self.text.find("\n", fence) + 1)
+        starts.append(0)
+        starts.append(self.text.rfind("\n", 0, def_start) + 1)
+        return starts
+
+    def feed(self, chunk: str) -> Optional[str]:
+        self.text += chunk
+        match = SOLVE_DEF_PATTERN.search(self.text)
+        if not match:
+            if len(self.text) > self.max_preamble_chars:
+                self.aborted = True
+            return None
+
+        indent = len(match.group(1))
+        line_end = self.text.find("\n", match.end())
+        if line_end == -1:
+            return None
+
+        code_starts = self._code_starts(match.start())
+        offset = line_end + 1
+        # Only complete lines; the last piece may still be growing
+        for line in self.text[offset:].split("\n")[:-1]:
+            stripped = line.strip()
+            dedented = stripped and not stripped.startswith("#") and len(line) - len(line.lstrip()) <= indent
+            if stripped.startswith("```") or dedented:
+                for code_start in code_starts:
+                    candidate = self.text[code_start:offset].strip()
+                    try:
+                        tree = ast.parse(candidate)
+                    except SyntaxError:
+                        continue  # e.g. multi-line signature or string; keep reading
+                    # A dedented line may start a helper solve() needs; only the fence is final
+                    if stripped.startswith("```") or not _unresolved_names(tree):
+                        return candidate
+                    break
+            offset += len(line) + 1
+        return None
+
+
+class JsonObjectParser:
+    """
+    Incremental parser for streamed JSON output (e.g. perception).
+
+    feed() returns the first complete, valid JSON object as soon as its closing
+    brace arrives. Sets `aborted` when no object starts within max_preamble_chars.
+    """
+
+    def __init__(self, max_preamble_chars: int = 1000):
+        self.max_preamble_chars = max_preamble_chars
+        self.text = ""
+        self.aborted = False
+        self._pos = 0
+        self._start: Optional[int] = None
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+
+    def feed(self, chunk: str) -> Optional[str]:
+        self.text += chunk
+        text = self.text
+        while self._pos < len(text):
+            char = text[self._pos]
+            self._pos += 1
+
+            if self._start is None:
+                if char == "{":
+                    self._start = self._pos - 1
+                    self._depth = 1
+                continue
+
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif char == "\\":
+                    self._escape = True
+                elif char == '"':
+                    self._in_string = False
+            elif char == '"':
+                self._in_string = True
+            elif char == "{":
+                self._depth += 1
+            elif char == "}":
+                self._depth -= 1
+                if self._depth == 0:
+                    candidate = text[self._start:self._pos]
+                    self._start = None
+                    try:
+                        json.loads(candidate)
+                        return candidate
+                    except ValueError:
+                        continue  # not JSON after all; look for the next object
+
+        if self._start is None and len(text) > self.max_preamble_chars:
+            self.aborted = True
+        return None
+
+
 def summarize_tools(tools: List[Any]) -> str:
     """
     Generate a string summary of tools for LLM prompt injection.
@@ -49,5 +195,5 @@ def tool_expects_input(self, tool_name: str) -> bool:
 
 
 def load_prompt(path: str) -> str:
-    with open(path, "r", encoding="utf-8") as f:
-        return f.read()
+    """Prompt file contents (cached; re-read when the file changes)"""
+    return get_template(path).text
@@ -0,0 +1,280 @@
+# server.py
+#
+# Multi-session agent server: many AgentLoops at once over one shared MultiMCP
+# and one shared ModelManager.
+#
+#   python server.py            (host/port and limits from profiles.yaml `server:`)
+#
+#   POST /query   {"query": "...", "session_id": "optional"} → {"session_id", "answer", "status", "latency_ms"}
+#   WS   /ws      send {"query": ..., "session_id": ...}, receive the same JSON as /query
+#   GET  /metrics Prometheus text format (core/metrics.py registry)
+#   GET  /stats   admission, queue-depth, cache, sandbox and tracing stats as JSON
+#   GET  /health
+
+import asyncio
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Any, Dict, Optional
+
+import yaml
+import uvicorn
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse, PlainTextResponse
+from starlette.routing import Route, WebSocketRoute
+from starlette.websockets import WebSocket, WebSocketDisconnect
+
+from agent import log, load_mcp_servers, run_query
+from core.context import PROFILE_PATH, is_valid_session_id
+from core.metrics import registry
+from core.session import MultiMCP
+from core.tracing import tracer
+from modules.action import shutdown_worker_pool, get_sandbox_stats
+from modules.model_manager import ModelManager
+
+DEFAULT_SERVER_CONFIG = {
+    "host": "127.0.0.1",
+    "port": 8000,
+    "max_concurrent_queries": 8,     # AgentLoops running at once
+    "max_queue": 32,                 # queries waiting for a slot; beyond this → 503
+    "request_timeout_seconds": 300,
+}
+
+
+REQUESTS = registry.counter("agent_server_requests_total", "Queries by admission outcome", ["outcome"])
+REQUEST_SECONDS = registry.histogram("agent_server_request_seconds", "End-to-end query latency including queueing")
+QUEUE_WAIT_SECONDS = registry.histogram("agent_server_queue_wait_seconds", "Time spent waiting for a query slot")
+IN_FLIGHT = registry.gauge("agent_server_in_flight", "Queries running")
+QUEUE_DEPTH = registry.gauge("agent_server_queue_depth", "Queries waiting for a slot")
+
+
+class ServerBusy(Exception):
+    """Raised when the admission queue is full."""
+
+
+class AdmissionController:
+    """
+    Bounds concurrent queries and the queue in front of them.
+
+    Queries beyond max_concurrent wait (queue_depth); once max_queue are
+    waiting, new queries are rejected instead of piling up.
+    """
+
+    def __init__(self, max_concurrent: int, max_queue: int, latency_window: int = 1000):
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self._slots = asyncio.Semaphore(max_concurrent)
+        self.queue_depth = 0
+        self.in_flight = 0
+        self.stats = {"accepted": 0, "rejected": 0, "completed": 0, "failed": 0, "timeouts": 0}
+        self._latencies = deque(maxlen=latency_window)    # end-to-end seconds
+        self._queue_waits = deque(maxlen=latency_window)  # seconds spent waiting for a slot
+
+    @asynccontextmanager
+    async def admit(self):
+        if self.queue_depth >= self.max_queue:
+            self.stats["rejected"] += 1
+            REQUESTS.inc(outcome="rejected")
+            raise ServerBusy(f"Server busy ({self.in_flight} running, {self.queue_depth} queued)")
+
+        self.stats["accepted"] += 1
+        REQUESTS.inc(outcome="accepted")
+        start = time.perf_counter()
+        self.queue_depth += 1
+        try:
+            await self._slots.acquire()
+        finally:
+            self.queue_depth -= 1
+        self._queue_waits.append(time.perf_counter() - start)
+        QUEUE_WAIT_SECONDS.observe(self._queue_waits[-1])
+
+        self.in_flight += 1
+        try:
+            yield
+        finally:
+            self.in_flight -= 1
+            self._slots.release()
+            self._latencies.append(time.perf_counter() - start)
+            REQUEST_SECONDS.observe(self._latencies[-1])
+
+    def collect_metrics(self):
+        IN_FLIGHT.set(self.in_flight)
+        QUEUE_DEPTH.set(self.queue_depth)
+
+    @staticmethod
+    def _percentiles(samples) -> Dict[str, Optional[float]]:
+        if not samples:
+            return {"p50": None, "p95": None, "p99": None}
+        ordered = sorted(samples)
+        pick = lambda q: round(ordered[min(len(ordered) - 1, int(q * len(ordered)))] * 1000, 1)
+        return {"p50": pick(0.50), "p95": pick(0.95), "p99": pick(0.99)}
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            **self.stats,
+            "in_flight": self.in_flight,
+            "queue_depth": self.queue_depth,
+            "max_concurrent": self.max_concurrent,
+            "max_queue": self.max_queue,
+            "latency_ms": self._percentiles(self._latencies),
+            "queue_wait_ms": self._percentiles(self._queue_waits),
+        }
+
+
+class AgentServer:
+    """Shared resources plus per-session serialization."""
+
+    def __init__(self, config: Dict[str, Any]):
+        self.config = {**DEFAULT_SERVER_CONFIG, **(config or {})}
+        self.mcp_servers = load_mcp_servers()
+        self.multi_mcp = MultiMCP(server_configs=list(self.mcp_servers.values()))
+        self.model = ModelManager()
+        self.admission = AdmissionController(
+            self.config["max_concurrent_queries"], self.config["max_queue"]
+        )
+        registry.add_collector(self.admission.collect_metrics)
+        # One query at a time per session: session memory is a single file
+        self._session_locks: Dict[str, asyncio.Lock] = {}
+        self._session_users: Dict[str, int] = {}
+
+    async def startup(self):
+        await self.multi_mcp.initialize()
+        log("server", f"🚀 Agent server ready ({len(self.multi_mcp.tool_map)} tools)")
+
+    async def shutdown(self):
+        await shutdown_worker_pool()
+
+    async def answer(self, query: str, session_id: Optional[str] = None) -> Dict[str, Any]:
+        start = time.perf_counter()
+
+        async with self.admission.admit():
+            try:
+                if session_id:
+                    async with self._session_lock(session_id):
+                        outcome = await self._run(query, session_id)
+                else:
+                    outcome = await self._run(query, session_id)
+                self.admission.stats["completed"] += 1
+                REQUESTS.inc(outcome="completed")
+            except asyncio.TimeoutError:
+                self.admission.stats["timeouts"] += 1
+                REQUESTS.inc(outcome="timeout")
+                raise
+            except Exception:
+                self.admission.stats["failed"] += 1
+                REQUESTS.inc(outcome="failed")
+                raise
+
+        outcome["latency_ms"] = round((time.perf_counter() - start) * 1000, 1)
+        return outcome
+
+    @asynccontextmanager
+    async def _session_lock(self, session_id: str):
+        """Per-session lock, dropped once no request for the session is left"""
+        lock = self._session_locks.setdefault(session_id, asyncio.Lock())
+        self._session_users[session_id] = self._session_users.get(session_id, 0) + 1
+        try:
+            async with lock:
+                yield
+        finally:
+            self._session_users[session_id] -= 1
+            if not self._session_users[session_id]:
+                del self._session_users[session_id]
+                del self._session_locks[session_id]
+
+    async def _run(self, query: str, session_id: Optional[str]) -> Dict[str, Any]:
+        return await asyncio.wait_for(
+            run_query(query, self.multi_mcp, self.mcp_servers, session_id=session_id, model=self.model),
+            timeout=self.config["request_timeout_seconds"]
+        )
+
+    def get_metrics(self) -> Dict[str, Any]:
+        return {
+            "admission": self.admission.get_stats(),
+            "tool_cache": self.multi_mcp.tool_cache.get_stats(),
+            "sandbox": get_sandbox_stats(),
+            "tracing": tracer.summary() if tracer.enabled else None,
+        }
+
+
+def load_server_config(profile_path: str = PROFILE_PATH) -> Dict[str, Any]:
+    with open(profile_path, "r") as f:
+        return (yaml.safe_load(f) or {}).get("server") or {}
+
+
+def create_app(config: Optional[Dict[str, Any]] = None) -> Starlette:
+    agent_server = AgentServer(config if config is not None else load_server_config())
+
+    async def handle(payload: Dict[str, Any]) -> tuple:
+        if not isinstance(payload, dict):
+            return 400, {"error": "Body must be a JSON object"}
+        query = payload.get("query")
+        if not isinstance(query, str) or not query.strip():
+            return 400, {"error": "Field 'query' is required"}
+        session_id = payload.get("session_id")
+        if session_id is not None and not is_valid_session_id(session_id):
+            # Only ids this server handed out: they name the session's memory file
+            return 400, {"error": "Field 'session_id' must be a session_id returned by a previous query"}
+        try:
+            return 200, await agent_server.answer(query, session_id)
+        except ServerBusy as e:
+            return 503, {"error": str(e)}
+        except asyncio.TimeoutError:
+            return 504, {"error": f"Query exceeded {agent_server.config['request_timeout_seconds']}s"}
+        except Exception as e:
+            log("server", f"⚠️ Query failed: {e}")
+            return 500, {"error": str(e)}
+
+    async def query_endpoint(request: Request):
+        try:
+            payload = await request.json()
+        except ValueError:
+            return JSONResponse({"error": "Body must be JSON"}, status_code=400)
+        status, body = await handle(payload)
+        return JSONResponse(body, status_code=status)
+
+    async def websocket_endpoint(websocket: WebSocket):
+        await websocket.accept()
+        try:
+            while True:
+                payload = await websocket.receive_json()
+                status, body = await handle(payload)
+                await websocket.send_json({"status_code": status, **body})
+        except WebSocketDisconnect:
+            pass
+
+    async def metrics_endpoint(request: Request):
+        return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+    async def stats_endpoint(request: Request):
+        return JSONResponse(agent_server.get_metrics())
+
+    async def health_endpoint(request: Request):
+        return JSONResponse({"status": "ok"})
+
+    @asynccontextmanager
+    async def lifespan(app):
+        await agent_server.startup()
+        try:
+            yield
+        finally:
+            await agent_server.shutdown()
+
+    app = Starlette(
+        routes=[
+            Route("/query", query_endpoint, methods=["POST"]),
+            WebSocketRoute("/ws", websocket_endpoint),
+            Route("/metrics", metrics_endpoint, methods=["GET"]),
+            Route("/stats", stats_endpoint, methods=["GET"]),
+            Route("/health", health_endpoint, methods=["GET"]),
+        ],
+        lifespan=lifespan,
+    )
+    app.state.agent_server = agent_server
+    return app
+
+
+if __name__ == "__main__":
+    server_config = {**DEFAULT_SERVER_CONFIG, **load_server_config()}
+    uvicorn.run(create_app(server_config), host=server_config["host"], port=server_config["port"])